@@ -0,0 +1,57 @@
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# THIS CODE CHECKS HOW LONG IT TAKES TO IMPORT functions.py AND plotting_preferences.py
+#   - EVERY WORKER PROCESS (run_polyfit_sample(), fit_SED_across_lightcurve with n_jobs != 1) IMPORTS functions.py AGAIN, SO THIS IS PAID THOUSANDS OF TIMES ON A BIG SAMPLE
+#   - EACH IMPORT IS TIMED IN A FRESH PYTHON PROCESS, SO NOTHING IS ALREADY IMPORTED
+#   - IT ALSO CHECKS THAT THE SLOW MODULES (MATPLOTLIB, ASTROPY, SCIPY.OPTIMIZE, TQDM, COLORAMA, SQLITE3) AREN'T IMPORTED UNTIL THEY'RE USED. IF ONE OF THESE SHOWS UP, SOMEONE HAS ADDED AN
+#     IMPORT AT THE TOP OF THE FILE WHICH SHOULD GO THROUGH lazy_module() (or inside the function which needs it) INSTEAD
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+import subprocess
+import sys
+import os
+import json
+import numpy as np
+from colorama import Fore, Style
+
+
+YoRiS_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # the folder containing functions.py and plotting_preferences.py
+n_repeats = 5 # take the median of this many imports, since the first import after the files change also has to compile them
+time_budgets = {'functions': 1.0, 'plotting_preferences': 1.0} # seconds. Before the slow modules were made lazy, these were ~1.8s and ~1.4s
+slow_modules = ['matplotlib', 'astropy', 'scipy.optimize', 'mpl_toolkits', 'tqdm', 'colorama', 'sqlite3']
+
+
+
+
+def time_import(module_name):
+    """
+    imports module_name in a fresh python process
+
+    OUTPUTS
+    ---------------
+    import_time: (float) how long the import took in seconds
+
+    slow_modules_imported: (list) which of slow_modules were imported along with it
+    """
+    code = (f"import sys, time, json; sys.path.insert(0, {YoRiS_folder!r}); t = time.perf_counter(); import {module_name}; t = time.perf_counter() - t; "
+            f"print(json.dumps([t, [m for m in {slow_modules!r} if m in sys.modules]]))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output = True, text = True, check = True).stdout
+    import_time, slow_modules_imported = json.loads(output.strip().splitlines()[-1])
+
+    return import_time, slow_modules_imported
+
+
+
+
+for module_name, time_budget in time_budgets.items():
+    results = [time_import(module_name) for _ in range(n_repeats)]
+    median_time = np.median([import_time for import_time, _ in results])
+    slow_modules_imported = results[-1][1]
+
+    if (median_time > time_budget) or (len(slow_modules_imported) > 0):
+        print(f'{Fore.RED}import {module_name}: {median_time:.3f}s (budget {time_budget}s), slow modules imported: {slow_modules_imported} {Style.RESET_ALL}')
+    else:
+        print(f'{Fore.GREEN}import {module_name}: {median_time:.3f}s (budget {time_budget}s) {Style.RESET_ALL}')
@@ -0,0 +1,129 @@
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# THIS CODE TIMES HOW LONG EACH CALL TO THE BLACKBODY SED MODELS TAKES, BEFORE AND AFTER THEY WERE MOVED ONTO planck_kernel.py
+#   - 'BEFORE' IS THE OLD blackbody(), WHICH GOT c, h AND k_B FROM astropy.constants (A UNIT CONVERSION EACH) AND REBUILT THE CONSTANT COEFFICIENT ON EVERY CALL
+#   - 'AFTER' IS functions.blackbody() ETC. WHICH USE THE CONSTANTS WORKED OUT ONCE IN planck_kernel.py
+#   - THE CALLS ARE THE SIZES THE PIPELINE ACTUALLY USES: ONE WAVELENGTH AT A TIME (HOW THE CURVE_FIT CHI SQUAREDS USED TO BE WORKED OUT), ONE EPOCH'S WAVELENGTHS
+#     (EACH CURVE_FIT MODEL EVALUATION) AND A BRUTE FORCE GRID
+#   - IT ALSO CHECKS THAT THE NEW MODELS GIVE THE SAME VALUES AS THE OLD ONES
+#   - THEN IT COMPARES THE BRUTE FORCE CHI SQUARED GRIDS FROM planck_engine = 'numpy' AND planck_engine = 'fused' (fused_BB_chi() AND fused_DBB_chi(), WHICH USE NUMBA
+#     IF IT'S INSTALLED). THE FIRST FUSED CALL IS TIMED SEPARATELY SINCE IT INCLUDES COMPILING (OR LOADING THE CACHED COMPILATION)
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+import sys
+import os
+import timeit
+import numpy as np
+from astropy import constants as const
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the YoRiS folder, which has functions.py in it
+from functions import blackbody, double_blackbody, vectorised_blackbody, chunked_double_blackbody_chi
+from planck_kernel import planck_F_lam, fused_BB_chi, fused_DBB_chi, numba_installed
+
+
+
+
+def old_blackbody(lam_cm, R_cm, T_K): # blackbody() as it was before planck_kernel.py
+    c_cgs = const.c.cgs.value
+    h_cgs = const.h.cgs.value
+    k_cgs = const.k_B.cgs.value
+
+    C = 8 * (np.pi**2) * h_cgs * (c_cgs**2) * 1e-8 # the constant coefficient of the equation
+    denom = np.exp((h_cgs * c_cgs) / (lam_cm * k_cgs * T_K)) - 1
+
+    L = C * ((R_cm**2) / (lam_cm**5)) * (1 / (denom)) # ergs/s/Angstrom
+
+    return L
+
+
+
+def old_double_blackbody(lam, R1, T1, R2, T2):
+    return old_blackbody(lam, R1, T1) + old_blackbody(lam, R2, T2)
+
+
+
+def old_vectorised_blackbody(lam_cm, R_cm, T_K): # vectorised_blackbody() as it was before planck_kernel.py
+    lam_cm = lam_cm[:, np.newaxis, np.newaxis]
+    R_cm, T_K = np.meshgrid(R_cm, T_K, indexing = 'ij')
+
+    C = 8 * (np.pi**2) * const.h.cgs.value * (const.c.cgs.value**2) * 1e-8
+    exponent = (const.h.cgs.value * const.c.cgs.value) / (lam_cm * const.k_B.cgs.value * T_K)
+
+    return C * ((R_cm**2) / (lam_cm**5)) / np.expm1(exponent)
+
+
+
+def old_blackbody_F_lam(lam_cm, T_K, R_cm, D_cm): # sim_ALL_LSST_lc.blackbody_F_lam() as it was before planck_kernel.py
+    C = 2 * np.pi * const.h.cgs.value * (const.c.cgs.value**2) * 1e-8
+    denom = np.exp((const.h.cgs.value * const.c.cgs.value) / (lam_cm * const.k_B.cgs.value * T_K)) - 1
+
+    return C * ((R_cm / D_cm)**2) * (1/ (lam_cm**5)) * (1 / (denom))
+
+
+
+def new_blackbody_F_lam(lam_cm, T_K, R_cm, D_cm): # sim_ALL_LSST_lc.blackbody_F_lam() now (that script needs skysurvey to import, so it's copied here)
+    return ((R_cm / D_cm)**2) * planck_F_lam(lam_cm, T_K)
+
+
+
+
+def time_per_call(function, n_calls):
+    """ the best of 5 repeats of n_calls calls to function, in microseconds per call """
+    return min(timeit.repeat(function, number = n_calls, repeat = 5)) / n_calls * 1e6
+
+
+
+
+wl_cm = np.array([1928.0, 2246.0, 2600.0, 3465.0, 4770.0, 6231.0, 7625.0, 9134.0]) * 1e-8 # one epoch's emitted central wavelengths (UVOT + optical)
+R_sc, T = 2.3, 1.7e4 # a scaled radius and temperature in the middle of the fitting bounds
+R_grid = np.logspace(-2, 3, 100)
+T_grid = np.logspace(3, np.log10(5e5), 100)
+D_cm = 1e27
+
+comparisons = [('blackbody, one wavelength at a time', lambda: [old_blackbody(wl, R_sc, T) for wl in wl_cm], lambda: [blackbody(wl, R_sc, T) for wl in wl_cm], 2000),
+               ('blackbody, one epoch', lambda: old_blackbody(wl_cm, R_sc, T), lambda: blackbody(wl_cm, R_sc, T), 20000),
+               ('double_blackbody, one epoch', lambda: old_double_blackbody(wl_cm, R_sc, 3e3, R_sc, T), lambda: double_blackbody(wl_cm, R_sc, 3e3, R_sc, T), 20000),
+               ('vectorised_blackbody, 100x100 grid', lambda: old_vectorised_blackbody(wl_cm, R_grid, T_grid), lambda: vectorised_blackbody(wl_cm, R_grid, T_grid), 200),
+               ('blackbody_F_lam, one epoch', lambda: old_blackbody_F_lam(wl_cm, T, 1e15, D_cm), lambda: new_blackbody_F_lam(wl_cm, T, 1e15, D_cm), 20000)]
+
+print(f"{'':<40}{'before (us/call)':>20}{'after (us/call)':>20}{'speed up':>12}{'max rel diff':>16}")
+for label, old_function, new_function, n_calls in comparisons:
+    old_time = time_per_call(old_function, n_calls)
+    new_time = time_per_call(new_function, n_calls)
+    old_values = np.asarray(old_function())
+    new_values = np.asarray(new_function())
+    max_rel_diff = np.max(np.abs(new_values - old_values) / np.abs(old_values), where = (old_values != 0), initial = 0.0)
+    print(f"{label:<40}{old_time:>20.2f}{new_time:>20.2f}{old_time / new_time:>11.1f}x{max_rel_diff:>16.1e}")
+
+
+
+
+# the brute force chi squared grids
+L_rf = blackbody(wl_cm, R_sc, T) * (1 + 0.05 * np.random.default_rng(1).standard_normal(len(wl_cm))) # a noisy epoch
+L_rf_err = 0.05 * L_rf
+DBB_R = np.logspace(-2, 3, 20)
+DBB_T1 = np.logspace(2, 4, 20)
+DBB_T2 = np.logspace(3, np.log10(5e5), 20)
+
+def numpy_BB_chi():
+    BB_L_sc = blackbody(wl_cm[:, np.newaxis, np.newaxis], R_grid[np.newaxis, :, np.newaxis], T_grid[np.newaxis, np.newaxis, :])
+    return np.sum((L_rf[:, np.newaxis, np.newaxis] - BB_L_sc)**2 / L_rf_err[:, np.newaxis, np.newaxis]**2, axis = 0)
+
+grid_comparisons = [('BB chi grid, 100x100', numpy_BB_chi, lambda: fused_BB_chi(wl_cm, L_rf, L_rf_err, R_grid, T_grid), 200),
+                    ('DBB chi grid, 20^4', lambda: chunked_double_blackbody_chi(wl_cm, L_rf, L_rf_err, DBB_R, DBB_T1, DBB_R, DBB_T2), 
+                     lambda: fused_DBB_chi(wl_cm, L_rf, L_rf_err, DBB_R, DBB_T1, DBB_R, DBB_T2), 10)]
+
+print()
+print(f"numba installed: {numba_installed}")
+print(f"{'':<40}{'numpy (us/call)':>20}{'fused (us/call)':>20}{'speed up':>12}{'max rel diff':>16}{'first fused call (s)':>24}")
+for label, numpy_function, fused_function, n_calls in grid_comparisons:
+    first_call_time = timeit.timeit(fused_function, number = 1)
+    numpy_time = time_per_call(numpy_function, n_calls)
+    fused_time = time_per_call(fused_function, n_calls)
+    numpy_values = numpy_function()
+    fused_values = fused_function()
+    max_rel_diff = np.max(np.abs(fused_values - numpy_values) / np.abs(numpy_values))
+    print(f"{label:<40}{numpy_time:>20.2f}{fused_time:>20.2f}{numpy_time / fused_time:>11.1f}x{max_rel_diff:>16.1e}{first_call_time:>24.2f}")
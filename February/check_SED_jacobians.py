@@ -0,0 +1,92 @@
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# THIS CODE CHECKS THE ANALYTIC JACOBIANS OF THE SED MODELS (blackbody_jacobian, double_blackbody_jacobian, power_law_SED_jacobian) AGAINST FINITE DIFFERENCES
+#   - THESE ARE GIVEN TO curve_fit AS jac WHEN analytic_jacobian = True, AND USED BY batched_levenberg_marquardt(), SO IF ONE OF THEM IS WRONG THE FITS QUIETLY GO WRONG
+#   - EACH DERIVATIVE IS COMPARED WITH A CENTRAL DIFFERENCE, (f(p + h) - f(p - h)) / 2h, WITH A SMALL RELATIVE STEP h IN EACH PARAMETER. THEY'RE COMPARED AS 
+#     (p / L) * dL/dp, I.E. HOW MUCH THE MODEL CHANGES FOR A FRACTIONAL CHANGE IN p, SINCE A TINY DERIVATIVE (E.G. dL/dT1 WHERE THE COOL BLACKBODY IS ~0 BUT THE HOT 
+#     ONE ISN'T) CAN'T BE RESOLVED BY FINITE DIFFERENCES AND DOESN'T AFFECT THE FIT ANYWAY
+#   - THE PARAMETERS ARE SPREAD OVER THE FITTING BOUNDS (INCLUDING THE COOL DBB TEMPERATURES WHERE THE PLANCK FUNCTION UNDERFLOWS TO 0 AT THE UV WAVELENGTHS), AND ARE
+#     ALSO CHECKED WITH THE (N_epochs, N_wl) BROADCAST SHAPES WHICH batched_levenberg_marquardt() USES
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+import sys
+import os
+import numpy as np
+from colorama import Fore, Style
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the YoRiS folder, which has functions.py in it
+from functions import blackbody, blackbody_jacobian, double_blackbody, double_blackbody_jacobian, power_law_SED, power_law_SED_jacobian
+
+
+
+
+rel_step = 1e-6 # the finite difference step in each parameter, relative to the parameter's value
+tolerance = 1e-6 # the largest difference allowed between the analytic and finite difference (p / L) * dL/dp
+
+
+
+def finite_difference_jacobian(SED_function, lam, params):
+    """
+    The central difference Jacobian of SED_function(lam, *params) with respect to params. The params can be floats or broadcastable arrays (like the analytic
+    Jacobians), and the derivatives are stacked along the last axis in the same way
+    """
+    columns = []
+    for i, p in enumerate(params):
+        h = rel_step * np.abs(p)
+        params_up = list(params)
+        params_down = list(params)
+        params_up[i] = p + h
+        params_down[i] = p - h
+        columns.append((SED_function(lam, *params_up) - SED_function(lam, *params_down)) / (2 * h))
+
+    return np.stack(columns, axis = -1)
+
+
+
+def max_sensitivity_diff(analytic_jac, numerical_jac, L, params):
+    """ 
+    the largest difference between the two Jacobians, as (p / L) * dL/dp. Wavelengths where the model is exactly 0 (where the planck function underflows) are skipped, 
+    since both Jacobians are 0 there too 
+    """
+    param_values = np.stack(np.broadcast_arrays(*params), axis = -1) # shape (n_params, ) or (N_epochs, 1, n_params)
+    nonzero = np.broadcast_to((L != 0)[..., np.newaxis], analytic_jac.shape)
+    safe_L = np.where(L != 0, L, 1.0)[..., np.newaxis]
+    diff = np.abs(analytic_jac - numerical_jac) * np.abs(param_values) / np.abs(safe_L)
+
+    return np.max(diff, where = nonzero, initial = 0.0)
+
+
+
+
+wl_A = np.array([1928.0, 2246.0, 2600.0, 3465.0, 4770.0, 6231.0, 7625.0, 9134.0]) # one epoch's emitted central wavelengths (UVOT + optical)
+wl_cm = wl_A * 1e-8
+rng = np.random.default_rng(0)
+n_samples = 200
+
+# the parameters are drawn log-uniformly within the fitting bounds, with the (scaled) radii which the fits actually use
+BB_params = [(10**rng.uniform(-3, 3), 10**rng.uniform(3, np.log10(5e5))) for _ in range(n_samples)]
+DBB_params = [(10**rng.uniform(-3, 3), 10**rng.uniform(2, 4), 10**rng.uniform(-3, 3), 10**rng.uniform(4, np.log10(5e5))) for _ in range(n_samples)]
+PL_params = [(10**rng.uniform(-5, 5), rng.uniform(-5.0, 0.0)) for _ in range(n_samples)]
+
+checks = [('blackbody_jacobian', blackbody, blackbody_jacobian, wl_cm, BB_params),
+          ('double_blackbody_jacobian', double_blackbody, double_blackbody_jacobian, wl_cm, DBB_params),
+          ('power_law_SED_jacobian', power_law_SED, power_law_SED_jacobian, wl_A, PL_params)]
+
+for label, SED_function, SED_jacobian, lam, param_list in checks:
+    # one epoch at a time, like curve_fit
+    worst = max(max_sensitivity_diff(SED_jacobian(lam, *params), finite_difference_jacobian(SED_function, lam, params), SED_function(lam, *params), params) for params in param_list)
+
+    # all epochs at once, like batched_levenberg_marquardt(): lam has shape (N_epochs, N_wl) and each parameter has shape (N_epochs, 1)
+    batched_lam = np.broadcast_to(lam, (len(param_list), len(lam)))
+    batched_params = [np.array(p)[:, np.newaxis] for p in zip(*param_list)]
+    batched_jac = SED_jacobian(batched_lam, *batched_params)
+    worst_batched = max_sensitivity_diff(batched_jac, finite_difference_jacobian(SED_function, batched_lam, batched_params), SED_function(batched_lam, *batched_params), batched_params)
+    same_as_unbatched = np.array_equal(batched_jac, np.stack([SED_jacobian(lam, *params) for params in param_list], axis = 0))
+
+    if (max(worst, worst_batched) > tolerance) or (not same_as_unbatched):
+        print(f'{Fore.RED}{label}: max diff {worst:.1e} (one epoch), {worst_batched:.1e} (batched), batched == one epoch at a time: {same_as_unbatched} {Style.RESET_ALL}')
+    else:
+        print(f'{Fore.GREEN}{label}: max diff {worst:.1e} (one epoch), {worst_batched:.1e} (batched) {Style.RESET_ALL}')
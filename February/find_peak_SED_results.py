@@ -4,6 +4,9 @@ import sys
 import os
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the YoRiS folder, which has functions.py in it
+from functions import load_dataframe
+
 
 pd.options.display.float_format = '{:.4e}'.format # from chatGPT - formats all floats in the dataframe in standard form to 4 decimal places
 
@@ -32,7 +35,7 @@ for ANT_folder in os.listdir(SED_fits_path): # we're essentially iterating throu
         print(ANT_SED_fit_file, '==================================================================')
         
         SED_file_path = os.path.join(ANT_folder_path, ANT_SED_fit_file)
-        SED_fit_df = pd.read_csv(SED_file_path, delimiter = ',')
+        SED_fit_df = load_dataframe(SED_file_path) # the SED fit results are saved as feather files if pyarrow is installed, otherwise as csv files
 
         # only take the peak data from a 'good' fit
         if SED_model in ['PL', 'SBB']:
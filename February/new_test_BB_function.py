@@ -191,6 +191,7 @@ if fitting_process == 'compare_SEDs':
         DBB_brute_gridsize = 10
         error_sampling_size = 9 # the number of times to sample the error in the data points to get a distribution of chi squared values for each fit. This is used to calculate the reduced chi squared value and the goodness of fit metric D_sigma
 
+        SED_fit_cache_path = base_path + "data/SED_fits/SED_fit_cache.sqlite" # each epoch's SED fits are cached here so re-running the comparison only refits the epochs whose inputs changed. Set to None to always refit
 
         # SAVING PLOTS
         save_BB_plot = True
@@ -255,7 +256,7 @@ if fitting_process == 'compare_SEDs':
                                                 brute_delchi = brute_delchi,  brute_gridsize = brute_gridsize, DBB_brute_gridsize = DBB_brute_gridsize, error_sampling_size = error_sampling_size, individual_BB_plot = individual_BB_plot_type, 
                                                 no_indiv_SED_plots = no_indiv_SED_plots, show_plots = show_plots, save_SED_fit_file = save_SED_fit_file,
                                                 save_indiv_BB_plot = save_indiv_BB_plot, save_param_vs_time_plot = save_param_vs_time_plot,
-                                                plot_chi_contour = plot_chi_contour, no_chi_contours = no_chi_contours)
+                                                plot_chi_contour = plot_chi_contour, no_chi_contours = no_chi_contours, SED_fit_cache_path = SED_fit_cache_path)
                 
 
                 def median_absolute_deviation(median, data): # need to maybe handle the possibility that data is empty and median is None?
@@ -406,7 +407,7 @@ if fitting_process == 'compare_SEDs':
                                                 brute_delchi = brute_delchi,  brute_gridsize = brute_gridsize, DBB_brute_gridsize = DBB_brute_gridsize, error_sampling_size = error_sampling_size, individual_BB_plot = individual_BB_plot_type, 
                                                 no_indiv_SED_plots = no_indiv_SED_plots, show_plots = show_plots, save_SED_fit_file = save_SED_fit_file,
                                                 save_indiv_BB_plot = save_indiv_BB_plot, save_param_vs_time_plot = save_param_vs_time_plot,
-                                                plot_chi_contour = plot_chi_contour, no_chi_contours = no_chi_contours)
+                                                plot_chi_contour = plot_chi_contour, no_chi_contours = no_chi_contours, SED_fit_cache_path = SED_fit_cache_path)
                 
 
                 def median_absolute_deviation(median, data): # need to maybe handle the possibility that data is empty and median is None?
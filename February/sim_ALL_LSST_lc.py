@@ -1,5 +1,6 @@
 import skysurvey
 import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.cm import ScalarMappable
@@ -14,6 +15,11 @@ import astropy.units as u
 from colorama import Fore, Style
 from astropy import constants as const
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the YoRiS folder, which has planck_kernel.py and functions.py in it
+from physical_constants import c_cgs, h_cgs
+from planck_kernel import planck_L_lam, planck_F_lam
+from functions import load_dataframe
+
 max_sig_dist = 3.0
 
 
@@ -85,14 +91,7 @@ def blackbody_L_lam_rf(lam_cm, R_cm, T_K):
     L: blackbody luminosity per unit wavelength for the wavelength input. Units: ergs/s/Angstrom
     """
 
-    c_cgs = const.c.cgs.value
-    h_cgs = const.h.cgs.value
-    k_cgs = const.k_B.cgs.value
-
-    C = 8 * (np.pi**2) * h_cgs * (c_cgs**2) * 1e-8 # the constant coefficient of the equation 
-    denom = np.exp((h_cgs * c_cgs) / (lam_cm * k_cgs * T_K)) - 1
-
-    L = C * ((R_cm**2) / (lam_cm**5)) * (1 / (denom)) # ergs/s/Angstrom
+    L = (R_cm**2) * planck_L_lam(lam_cm, T_K) # ergs/s/Angstrom, the constants are worked out once in planck_kernel.py
 
     return L
 
@@ -118,15 +117,7 @@ def blackbody_F_lam(lam_cm, T_K, R_cm, D_cm):
     B_lam: blackbody flux density for the wavelength input. Units:  ergs/ (s cm^2 Angstrom)
     """
 
-    c_cgs = const.c.cgs.value
-    h_cgs = const.h.cgs.value
-    k_cgs = const.k_B.cgs.value
-
-    C = 2 * np.pi * h_cgs * (c_cgs**2) * 1e-8 # the constant coefficient of the equation - the 10^-8 is what converts this from ergs/ (s cm^2 cm) to ergs/ (s cm^2 Angstrom)
-
-    denom = np.exp((h_cgs * c_cgs) / (lam_cm * k_cgs * T_K)) - 1
-
-    F_lam = C * ((R_cm / D_cm)**2) * (1/ (lam_cm**5)) * (1 / (denom)) # ergs/s/Angstrom
+    F_lam = ((R_cm / D_cm)**2) * planck_F_lam(lam_cm, T_K) # ergs/ (s cm^2 Angstrom), the constants are worked out once in planck_kernel.py
 
     return F_lam
 
@@ -169,7 +160,7 @@ def sim_ANY_LSST_lc(SED_filename, SED_filepath, max_sig_dist, size, model, mysur
                     name for the type of SED fit which was taken. These abbreviations include 'SBB' for single blackbody, 'DBB' for double blackbody and 'PL'
                     for power-law. 
     
-    SED_filepath: (str) the file path to the csv file containing the SED fit evolution data
+    SED_filepath: (str) the file path to the csv (or feather or parquet) file containing the SED fit evolution data
 
     max_sig_dist: (float) the maximum value of the reduced chi squared sigma distance of an SED which is still considered to be a good fit. SEDs with sigma distances
                     above this value will be considered to be bad fits and will not be used for simulation
@@ -206,7 +197,7 @@ def sim_ANY_LSST_lc(SED_filename, SED_filepath, max_sig_dist, size, model, mysur
     ANT_z = ANT_redshift_dict[ANT_name]
     ANT_max_simulation_z = ANT_z # SHOULD CALCULATE THE ACTUAL ZMAX AND ZMIN
     ANT_D_cm = ANT_luminosity_dist_cm_dict[ANT_name]
-    ANT_SED_df = pd.read_csv(SED_filepath, delimiter = ',', index_col = 'MJD')
+    ANT_SED_df = load_dataframe(SED_filepath, index_col = 'MJD') # the SED fit results are saved as feather files if pyarrow is installed, otherwise as csv files
 
     lbda_A = np.linspace(1000, 12000, 1000) # wavelength values to compute the flux at, in Angstrom
     
@@ -483,8 +474,6 @@ def sim_ANY_LSST_lc(SED_filename, SED_filepath, max_sig_dist, size, model, mysur
                         'lssty': 9712}
     
     # get the conversion from photons/s/cm^2 to ergs/s/cm^2/Angstrom
-    c_cgs = const.c.cgs.value
-    h_cgs = const.h.cgs.value
     F_density_conversion = c_cgs * h_cgs
 
     band_conversion = [(F_density_conversion / wl) for wl in b_obs_cent_wl_dict.values()]
@@ -1,17 +1,57 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator
 import os
-from astropy import constants as const
-import astropy.units as u
-from astropy.cosmology import FlatLambdaCDM
-import scipy.optimize as opt
-from matplotlib.colors import Normalize
-from colorama import Fore, Style
-from tqdm import tqdm
-from matplotlib.ticker import FuncFormatter
-from mpl_toolkits.axes_grid1 import make_axes_locatable
+import copy
+import glob
+import hashlib
+import importlib
+import importlib.util
+import pickle # pandas has already imported this, so there's nothing to gain from making it lazy
+from contextlib import closing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from planck_kernel import L_lam_coeff, planck_exponent, planck_L_lam, overflow_safe_expm1, fused_BB_chi, fused_DBB_chi, numba_installed
+
+
+
+class lazy_module:
+    """
+    Stands in for a module which is slow to import, and only imports it the first time one of its attributes is used, e.g. with plt = lazy_module('matplotlib.pyplot'), 
+    matplotlib.pyplot is imported when plt.subplots() is first called. This keeps importing functions.py quick, which matters since it's imported again by every worker 
+    process in run_polyfit_sample() and fit_SED_across_lightcurve(n_jobs != 1), and most of these never plot anything. If attribute_name is given, it stands in for that
+    attribute of the module instead, e.g. Fore = lazy_module('colorama', 'Fore') or tqdm = lazy_module('tqdm', 'tqdm'), which can be called like the real tqdm.
+
+    The numerical core (the SED models, fitting and interpolation) hasn't been split out of functions.py into its own lightweight module. Every script imports from 
+    functions.py, so the slow imports are made lazy here instead, which gives the same saving without breaking those imports.
+    """
+    def __init__(self, module_name, attribute_name = None):
+        self.module_name = module_name
+        self.attribute_name = attribute_name
+        self.module = None # the module (or its attribute) once it has been imported
+
+    def load(self):
+        if self.module is None:
+            module = importlib.import_module(self.module_name)
+            self.module = module if self.attribute_name is None else getattr(module, self.attribute_name)
+        return self.module
+
+    def __getattr__(self, name): # only called for attributes which the lazy_module doesn't have itself, i.e. the module's attributes
+        if name in ['module_name', 'attribute_name', 'module']: # not set yet (e.g. while being copied), so don't go looking for them in the module
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+plt = lazy_module('matplotlib.pyplot')
+ticker = lazy_module('matplotlib.ticker')
+axes_grid1 = lazy_module('mpl_toolkits.axes_grid1')
+opt = lazy_module('scipy.optimize')
+sqlite3 = lazy_module('sqlite3') # only needed by the SED fit cache
+tqdm = lazy_module('tqdm', 'tqdm')
+Fore = lazy_module('colorama', 'Fore')
+Style = lazy_module('colorama', 'Style')
 
 
 
@@ -78,6 +118,352 @@ def load_ANT_data():
 
 
 
+ANT_data_dtypes = {'MJD': 'float64', 'mag': 'float32', 'magerr': 'float32', 'band': 'category'} # the dtypes which load_ANT_catalogue() parses the light curve files with
+
+
+
+
+def find_ANT_files(root = None, pattern = '*.csv', manifest = None):
+    """
+    Finds the light curve files of an archive of ANTs, either with a glob pattern inside one or more root folders, or from a manifest. This is how load_ANT_catalogue() and
+    iter_ANT_light_curves() know which files to read.
+
+    INPUTS
+    ---------------
+    root: (str, list or None) the folder (or list of folders) to search for light curve files in. Each ANT's name is taken from its file name up to the first underscore,
+          e.g. 'ZTF18aczpgwm_lc.csv' is ZTF18aczpgwm. Either root or manifest must be given
+
+    pattern: (str) the glob pattern of the light curve files within root. Use e.g. '**/*.csv' to also search the subfolders
+
+    manifest: (dict, str or None) the light curve file of each ANT, either as a dictionary where the keys are the ANT names and the values are the file paths, or the path of
+              a csv file with the columns ANT_name and file_path (relative file paths are taken to be relative to the manifest's folder)
+
+
+    OUTPUTS
+    ---------------
+    ANT_names: (list) the ANT names, in the same order as file_paths
+
+    file_paths: (list) the light curve file of each ANT. When found with root, these are sorted
+    """
+    if (root is None) == (manifest is None):
+        raise ValueError('exactly one of root and manifest must be given')
+
+    if manifest is not None:
+        if isinstance(manifest, str):
+            manifest_folder = os.path.dirname(manifest)
+            manifest_df = pd.read_csv(manifest, delimiter = ',', dtype = str)
+            manifest = {name: os.path.join(manifest_folder, file_path) for name, file_path in zip(manifest_df['ANT_name'], manifest_df['file_path'])} # os.path.join leaves absolute file paths as they are
+        ANT_names = list(manifest.keys())
+        file_paths = list(manifest.values())
+
+    else:
+        root_folders = [root] if isinstance(root, str) else list(root)
+        file_paths = sorted([file_path for folder in root_folders for file_path in glob.glob(os.path.join(folder, pattern), recursive = True)])
+        ANT_names = [os.path.splitext(os.path.basename(file_path))[0].split('_')[0] for file_path in file_paths]
+
+    name_counts = pd.Series(ANT_names).value_counts()
+    if (name_counts > 1).any():
+        raise ValueError(f'some ANTs have more than one light curve file: {list(name_counts[name_counts > 1].index)}')
+
+    return ANT_names, file_paths
+
+
+
+
+def load_ANT_catalogue(root = None, pattern = '*.csv', manifest = None, n_threads = 8, dtypes = None):
+    """
+    Loads the light curve files of a whole archive of ANTs into one long table, reading the files at the same time with a pool of threads (reading the files is mostly
+    waiting on the disk, so threads are enough here and we don't need worker processes). Unlike load_ANT_data(), the data folders aren't hardcoded: the files are either
+    found with a glob pattern inside one or more root folders, or listed in a manifest.
+
+    The columns are parsed with explicit dtypes (ANT_data_dtypes by default) rather than letting pandas guess them, and the band and ANT name columns are categorical, so the
+    table of a large archive takes up much less memory. The long table can be given straight to ANT_table_L_rf(). To get the list of per-ANT dataframes which load_ANT_data()
+    gives, use split_ANT_catalogue().
+
+    INPUTS
+    ---------------
+    root: (str, list or None) the folder (or list of folders) to search for light curve files in. Each ANT's name is taken from its file name up to the first underscore,
+          e.g. 'ZTF18aczpgwm_lc.csv' is ZTF18aczpgwm. Either root or manifest must be given
+
+    pattern: (str) the glob pattern of the light curve files within root. Use e.g. '**/*.csv' to also search the subfolders
+
+    manifest: (dict, str or None) the light curve file of each ANT, either as a dictionary where the keys are the ANT names and the values are the file paths, or the path of
+              a csv file with the columns ANT_name and file_path (relative file paths are taken to be relative to the manifest's folder)
+
+    n_threads: (int) the number of threads reading the files
+
+    dtypes: (dict or None) the dtype of each column. If None, ANT_data_dtypes is used (MJD float64, mag and magerr float32, band categorical). Columns which aren't in
+            dtypes are parsed as pandas sees fit. Pass {'MJD': 'float64', 'mag': 'float64', 'magerr': 'float64', 'band': 'category'} to keep the full precision of the magnitudes
+            given in the files
+
+
+    OUTPUTS
+    ---------------
+    ANT_table: (DataFrame) all of the ANTs' light curves concatenated together, one ANT after the other, with an added categorical column ANT_name
+
+    ANT_offsets: (DataFrame) indexed by ANT name, with the columns start, stop and file_path. The rows of ANT's light curve are ANT_table.iloc[start:stop]
+
+    failed_files: (dict) the keys are the names of the ANTs whose files couldn't be read, the values are the error messages. These ANTs are left out of ANT_table
+    """
+    ANT_names, file_paths = find_ANT_files(root = root, pattern = pattern, manifest = manifest)
+    dtypes = ANT_data_dtypes if dtypes is None else dtypes
+
+    # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # read the files, parsing each column straight into its dtype so the float64 columns of the whole archive never all have to be in memory at once
+    def read_ANT_file(file_path): # returns the file's columns as a dict of arrays (Categoricals for the categorical columns), which are quicker to join together than thousands of small dataframes
+        ANT_df = pd.read_csv(file_path, delimiter = ',', dtype = dtypes) # columns in dtypes which aren't in the file are ignored
+        return len(ANT_df), {col: ANT_df[col].array if isinstance(ANT_df[col].dtype, pd.CategoricalDtype) else ANT_df[col].to_numpy() for col in ANT_df.columns}
+
+    ANT_file_columns = []
+    ANT_lengths = []
+    loaded_names = []
+    loaded_file_paths = []
+    failed_files = {}
+    with ThreadPoolExecutor(max_workers = n_threads) as executor:
+        futures = [executor.submit(read_ANT_file, file_path) for file_path in file_paths]
+        for name, file_path, future in zip(ANT_names, file_paths, futures): # keep the ANTs in the same order as file_paths
+            try:
+                ANT_length, ANT_columns = future.result()
+            except Exception as e:
+                failed_files[name] = f'{type(e).__name__}: {e}'
+                print(f'{Fore.RED} WARNING: loading {name} from {file_path} failed with {failed_files[name]} {Style.RESET_ALL}')
+                continue
+
+            ANT_file_columns.append(ANT_columns)
+            ANT_lengths.append(ANT_length)
+            loaded_names.append(name)
+            loaded_file_paths.append(file_path)
+
+    # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # put the files together into one long table, with the offset index saying where each ANT's rows are
+    ANT_lengths = np.array(ANT_lengths, dtype = int)
+    if len(ANT_file_columns) == 0:
+        ANT_table = pd.DataFrame(columns = list(dtypes.keys())).astype(dtypes)
+    else:
+        ANT_table_columns = {}
+        for col in dict.fromkeys([col for ANT_columns in ANT_file_columns for col in ANT_columns.keys()]): # every column in any of the files, in the order they first appear
+            first_array = next(ANT_columns[col] for ANT_columns in ANT_file_columns if col in ANT_columns.keys())
+            col_arrays = []
+            for ANT_columns, ANT_length in zip(ANT_file_columns, ANT_lengths):
+                if col in ANT_columns.keys():
+                    col_arrays.append(ANT_columns[col])
+                elif isinstance(first_array, pd.Categorical): # this file doesn't have the column, so it's filled with NaNs for its rows
+                    col_arrays.append(pd.Categorical([np.nan] * ANT_length))
+                else:
+                    col_arrays.append(np.full(ANT_length, np.nan, dtype = first_array.dtype if first_array.dtype.kind in 'fO' else 'float64'))
+
+            if isinstance(first_array, pd.Categorical): # each file's categorical column has its own categories, so these are combined rather than going through object arrays
+                ANT_table_columns[col] = pd.api.types.union_categoricals(col_arrays)
+            else:
+                ANT_table_columns[col] = np.concatenate(col_arrays)
+        ANT_table = pd.DataFrame(ANT_table_columns)
+    ANT_table['ANT_name'] = pd.Categorical.from_codes(np.repeat(np.arange(len(loaded_names)), ANT_lengths), categories = loaded_names)
+
+    ANT_stops = np.cumsum(ANT_lengths)
+    ANT_offsets = pd.DataFrame({'start': ANT_stops - ANT_lengths, 'stop': ANT_stops, 'file_path': loaded_file_paths}, index = pd.Index(loaded_names, name = 'ANT_name'))
+
+    return ANT_table, ANT_offsets, failed_files
+
+
+
+
+def split_ANT_catalogue(ANT_table, ANT_offsets):
+    """
+    Splits the long table from load_ANT_catalogue() back up into one dataframe per ANT, giving the same outputs as load_ANT_data() so the table can be used with the
+    functions which take a list of ANT dataframes (e.g. ANT_data_L_rf(), bin_lc()). The ANT_name column is dropped, the categorical columns are turned back into
+    strings and the float32 columns back into float64, since these functions work on the ANTs one row or one band at a time and expect the same dtypes as a csv
+    read by pd.read_csv (e.g. restframe_luminosity() would overflow in float32).
+
+    INPUTS
+    ---------------
+    ANT_table, ANT_offsets: the outputs of load_ANT_catalogue()
+
+
+    OUTPUTS
+    ---------------
+    dataframes: a list of the ANT data in dataframes
+    names: a list of the ANT names
+    ANT_bands: a list of lists, each inner list is a list of all of the bands which are present in the light curve
+    """
+    ANT_table = ANT_table.drop(columns = 'ANT_name')
+    ANT_table = ANT_table.astype({col: (str if isinstance(dtype, pd.CategoricalDtype) else 'float64') for col, dtype in ANT_table.dtypes.items()
+                                  if isinstance(dtype, pd.CategoricalDtype) or (dtype == 'float32')})
+
+    dataframes = []
+    for start, stop in zip(ANT_offsets['start'], ANT_offsets['stop']):
+        dataframes.append(ANT_table.iloc[start:stop].reset_index(drop = True))
+    names = list(ANT_offsets.index)
+    ANT_bands = [file_df['band'].unique() for file_df in dataframes]
+
+    return dataframes, names, ANT_bands
+
+
+
+
+def iter_ANT_light_curves(root = None, pattern = '*.csv', manifest = None, prefetch = 4):
+    """
+    A generator which yields the ANTs' light curves one at a time, rather than loading the whole archive into memory at once like load_ANT_data() or load_ANT_catalogue().
+    While you're working on one ANT, the next few files are read ahead by a pool of threads, but never more than prefetch of them, so the memory used stays the same however
+    many ANTs there are. The files are found the same way as in load_ANT_catalogue() (see find_ANT_files()) and are read with load_dataframe(), so this can also be used to
+    stream the interpolated light curves, e.g. with pattern = '*_interp_lc.feather'.
+
+    Each ANT's dataframe is the same as the one load_ANT_data() would give for it, so it can go straight into ANT_data_L_rf(), bin_lc(), etc. (as a list of one dataframe).
+    If an ANT's file can't be read, a warning is printed and the ANT is skipped.
+
+    INPUTS
+    ---------------
+    root, pattern, manifest: where to find the light curve files, see find_ANT_files()
+
+    prefetch: (int) the most files which are read ahead of the ANT that's been yielded. This is also the number of threads reading the files
+
+
+    OUTPUTS
+    ---------------
+    yields (ANT_name, ANT_df) for each ANT, in the same order as find_ANT_files() gives them
+    """
+    if prefetch < 1:
+        raise ValueError(f'prefetch must be at least 1, not {prefetch}')
+
+    ANT_names, file_paths = find_ANT_files(root = root, pattern = pattern, manifest = manifest)
+
+    with ThreadPoolExecutor(max_workers = prefetch) as executor:
+        pending = deque() # the files which have been sent to the threads but not yielded yet, in order
+        next_idx = 0
+        while (next_idx < len(file_paths)) or (len(pending) > 0):
+            while (next_idx < len(file_paths)) and (len(pending) < prefetch): # top the read-ahead queue back up
+                pending.append((ANT_names[next_idx], file_paths[next_idx], executor.submit(load_dataframe, file_paths[next_idx])))
+                next_idx += 1
+
+            name, file_path, future = pending.popleft()
+            try:
+                ANT_df = future.result()
+            except Exception as e:
+                print(f'{Fore.RED} WARNING: loading {name} from {file_path} failed with {type(e).__name__}: {e} {Style.RESET_ALL}')
+                continue
+
+            yield name, ANT_df
+
+
+
+
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+##################################################################################################################################################################
+##################################################################################################################################################################
+# SAVING AND LOADING THE PIPELINE'S DATAFRAMES (INTERPOLATED LIGHT CURVES AND SED FIT RESULTS)
+
+
+pyarrow_installed = importlib.util.find_spec('pyarrow') is not None # pandas needs pyarrow to read and write parquet and feather files. We only check whether it's installed here rather than importing it, since pandas imports it when it's needed
+default_file_format = 'feather' if pyarrow_installed else 'csv'
+dataframe_file_extensions = {'feather': '.feather', 'parquet': '.parquet', 'csv': '.csv'} # in order of preference when the same dataframe has been saved in more than one format
+list_columns = ['bands', 'em_cent_wls'] # the columns which hold a list at each epoch
+
+
+
+
+def check_file_format(file_format):
+    """
+    Checks that file_format is one of the formats which save_dataframe() can write. None gives default_file_format. If pyarrow isn't installed, 'feather' and 'parquet'
+    fall back on 'csv' with a warning.
+    """
+    if file_format is None:
+        return default_file_format
+
+    if file_format not in dataframe_file_extensions:
+        raise ValueError(f"file_format must be 'feather', 'parquet' or 'csv', not '{file_format}'")
+
+    if (file_format != 'csv') and (not pyarrow_installed):
+        print(f"{Fore.RED} WARNING: pyarrow isn't installed so the {file_format} file can't be written, saving it as a csv instead {Style.RESET_ALL}")
+        return 'csv'
+
+    return file_format
+
+
+
+
+def save_dataframe(df, path, file_format = None, index = False):
+    """
+    Saves one of the pipeline's dataframes (e.g. an interpolated light curve or the SED fit results). The binary formats keep the column dtypes, so the 'band' column is saved as a
+    categorical column and the 'bands' and 'em_cent_wls' columns are saved as typed lists rather than as strings of python lists like in a csv. Feather files are the fastest to load
+    back in, since they don't need to be parsed like a csv.
+
+    INPUTS
+    ---------------
+    df: (DataFrame) the dataframe to save
+
+    path: (str) the path to save it to, without the file extension (this is added according to file_format)
+
+    file_format: (str or None) options: 'feather', 'parquet', 'csv'. If None, default_file_format is used ('feather' if pyarrow is installed, otherwise 'csv'). 'csv' is the
+                 format the pipeline used to save everything in, which is still useful for looking at the files by eye
+
+    index: (bool) whether to save the index of df as columns, like the (MJD, sample) index of the sampled SED parameters
+
+
+    OUTPUTS
+    ---------------
+    savepath: (str) the path of the saved file, including the file extension
+    """
+    file_format = check_file_format(file_format)
+    savepath = path + dataframe_file_extensions[file_format]
+
+    if file_format == 'csv':
+        df.to_csv(savepath, index = index)
+        return savepath
+
+    df = df.reset_index(drop = not index) # neither format can store a MultiIndex, so it is saved as columns
+    df = df.infer_objects() # e.g. the SED fit results are filled into object columns, which would otherwise have to be saved as python objects rather than floats
+    if 'band' in df.columns:
+        df['band'] = df['band'].astype('category')
+
+    if file_format == 'feather':
+        df.to_feather(savepath)
+    else:
+        df.to_parquet(savepath, index = False)
+
+    return savepath
+
+
+
+
+def load_dataframe(path, index_col = None):
+    """
+    Loads a dataframe saved by save_dataframe() (or any csv), choosing how to read it from its file extension. The list columns ('bands', 'em_cent_wls') are loaded back in as python lists, but these are left as strings
+    if the file is a csv.
+
+    INPUTS
+    ---------------
+    path: (str) the path of the file, including the file extension
+
+    index_col: (str, list or None) the column(s) to set as the index, e.g. ['MJD', 'sample'] for the sampled SED parameters
+
+
+    OUTPUTS
+    ---------------
+    df: (DataFrame) the loaded dataframe
+    """
+    file_extension = os.path.splitext(path)[1]
+    if file_extension == '.feather':
+        df = pd.read_feather(path)
+    elif file_extension == '.parquet':
+        df = pd.read_parquet(path)
+    elif file_extension == '.csv':
+        df = pd.read_csv(path, delimiter = ',')
+    else:
+        raise ValueError(f"the file extension must be '.feather', '.parquet' or '.csv', not '{file_extension}'")
+
+    for col in list_columns: # pyarrow gives back each list as a numpy array
+        if (col in df.columns) and (file_extension != '.csv'):
+            df[col] = [list(value) if isinstance(value, np.ndarray) else value for value in df[col]]
+
+    if index_col is not None:
+        df = df.set_index(index_col)
+
+    return df
+
+
+
+
 
 ##################################################################################################################################################################
 ##################################################################################################################################################################
@@ -149,7 +535,71 @@ def obs_wl_to_em_wl(obs_wavelength, z):
 
 
 
-def ANT_data_L_rf(ANT_df_list, ANT_names, dict_ANT_z, dict_ANT_D_lum, dict_band_ZP, dict_band_obs_cent_wl):
+def ANT_table_L_rf(ANT_table, dict_ANT_z, dict_ANT_D_lum, dict_band_ZP, dict_band_obs_cent_wl, ANT_name_column = 'ANT_name'):
+    """
+    A columnar version of ANT_data_L_rf() which calculates the rest frame luminosity, its error and the emitted central wavelength for a whole table at once. The table
+    can contain the light curves of many ANTs concatenated together, with a column giving the ANT name of each row.
+
+    The bands and ANT names are each factorised into integer codes once, which index into small lookup arrays of the band zeropoints/observed central wavelengths
+    and the ANT redshifts/luminosity distances, so L_rf and L_rf_err are calculated for every row in one broadcast expression rather than calling
+    restframe_luminosity() one row at a time. The terms are multiplied together in the same order as in restframe_luminosity(), so the results agree to within floating
+    point rounding (numpy's array power can differ from its scalar power in the last bit).
+
+    INPUTS
+    ---------------
+    ANT_table: (DataFrame) the light curve data of one or more ANTs, with the columns: MJD, mag, magerr, band and ANT_name_column
+
+    dict_ANT_z: (dict) dictionary of ANT redshift values (found in plotting preferences as 'ANT_redshift_dict')
+
+    dist_ANT_D_lum: (dict) dictioanry of ANT luminosity distances in cm (found in plotting_preferences as 'ANT_luminosity_dist_cm_dict')
+
+    dict_band_ZP: (dict) dictioanry of the zeropoints of each of the bands present for any ANT (found in plotting_preferences)
+
+    dict_band_obs_cent_wl: (dict) dictionary of the observed central wavelengths of the bands present for each of the ANTs (found in plotting_preferences)
+
+    ANT_name_column: (str) the name of the column in ANT_table which gives the ANT name of each row
+
+
+    OUTPUTS
+    ---------------
+    ANT_table: (DataFrame) the same table with the columns em_cent_wl (in Angstrom), L_rf (in ergs/s/Angstrom), L_rf_err (in ergs/s/Angstrom) added to it
+    """
+    # the lookup tables, built once for the whole table
+    band_codes, bands = pd.factorize(ANT_table['band'])
+    band_ZPs = np.array([dict_band_ZP[b] for b in bands], dtype = float)
+    band_obs_wls = np.array([dict_band_obs_cent_wl.get(b, np.nan) for b in bands], dtype = float) # like .map(), give NaN for a band without a central wavelength
+
+    ANT_codes, ANT_names = pd.factorize(ANT_table[ANT_name_column])
+    ANT_zs = np.array([dict_ANT_z[name] for name in ANT_names], dtype = float)
+    ANT_L_prefactors = np.array([4 * np.pi * (dict_ANT_D_lum[name]**2) for name in ANT_names], dtype = float) # the 4 * pi * (d_l_cm**2) part of restframe_luminosity(), worked out in the same way
+
+    # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    z = ANT_zs[ANT_codes]
+    mag = ANT_table['mag'].to_numpy(dtype = float)
+    magerr = ANT_table['magerr'].to_numpy(dtype = float)
+
+    L_rf = ANT_L_prefactors[ANT_codes] * band_ZPs[band_codes] * (1 + z) * (10**(-0.4 * mag)) # in ergs/s/Angstrom
+    L_rf_err = 0.4 * np.log(10) * L_rf * magerr # in ergs/s/Angstrom
+
+    ANT_table['em_cent_wl'] = obs_wl_to_em_wl(band_obs_wls[band_codes], z) # the band's central wavelength converted into the rest-frame
+    ANT_table['L_rf'] = L_rf
+    ANT_table['L_rf_err'] = L_rf_err
+
+    return ANT_table
+
+
+
+
+
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+##################################################################################################################################################################
+
+
+
+
+def ANT_data_L_rf(ANT_df_list, ANT_names, dict_ANT_z, dict_ANT_D_lum, dict_band_ZP, dict_band_obs_cent_wl, engine = 'loop'):
     """
 
     INPUTS
@@ -166,15 +616,37 @@ def ANT_data_L_rf(ANT_df_list, ANT_names, dict_ANT_z, dict_ANT_D_lum, dict_band_
     dict_band_ZP: (dict) dictioanry of the zeropoints of each of the bands present for any ANT (found in plotting_preferences)
 
     dict_band_obs_cent_wl: (dict) dictionary of the observed central wavelengths of the bands present for each of the ANTs (found in plotting_preferences)
-    
+
+    engine: (str) options: 'loop', 'vectorised'. If 'loop', restframe_luminosity() is called for each row of each ANT's dataframe. If 'vectorised', the ANTs' dataframes are
+    concatenated into one long table and converted all at once using ANT_table_L_rf(), which gives the same results (to within floating point rounding) but is much faster
+
 
 
     OUTPUTS
     ---------------
     new_ANT_df_list: (list) a list of dataframes of the ANTs, in the same order as ANT_df_list and ANT_names. Each dataframe will have the columns:
                     MJD, mag, magerr, band, em_cent_wl (in Angstrom), L_rf (in ergs/(s * cm^2 * Angstrom)), L_rf_err (in ergs/(s * cm^2 * Angstrom)).
-    
+
     """
+    if engine == 'vectorised':
+        ANT_table = pd.concat([ANT_df[['band', 'mag', 'magerr']] for ANT_df in ANT_df_list], ignore_index = True)
+        ANT_table['ANT_name'] = np.repeat(ANT_names, [len(ANT_df) for ANT_df in ANT_df_list])
+        ANT_table = ANT_table_L_rf(ANT_table, dict_ANT_z, dict_ANT_D_lum, dict_band_ZP, dict_band_obs_cent_wl, ANT_name_column = 'ANT_name')
+
+        # split the long table back up into the ANTs' dataframes
+        new_ANT_df_list = []
+        start = 0
+        for ANT_df in ANT_df_list:
+            end = start + len(ANT_df)
+            for col in ['em_cent_wl', 'L_rf', 'L_rf_err']:
+                ANT_df[col] = ANT_table[col].to_numpy()[start:end]
+            new_ANT_df_list.append(ANT_df)
+            start = end
+
+        return new_ANT_df_list
+
+    elif engine != 'loop':
+        raise ValueError(f"engine must be 'loop' or 'vectorised', not '{engine}'")
 
     band_names = list(dict_band_obs_cent_wl.keys()) # a list of the band names for all ANTs
     observed_wl_list = list(dict_band_obs_cent_wl.values())
@@ -272,9 +744,143 @@ def weighted_mean(data, errors):
 
 
 
-def bin_lc(list_lc_df, MJD_binsize, drop_na_bins = True):
+def vectorised_bin_band(b_df, MJD_bins, drop_na_bins = True):
+    """
+    A groupby-free version of the per-band binning done in bin_lc(). Instead of grouping by MJD_bin and calling weighted_mean() three times per bin,
+    each datapoint is given the index of its MJD bin with np.searchsorted, the datapoints are (stably) sorted by this bin index and the weighted sums
+    are taken over each contiguous run of datapoints in the same bin. The stable sort keeps the datapoints within each bin in their original order, and
+    the bins are summed in batches of bins with the same number of datapoints using np.sum(axis = 1), which adds up the values in the same (pairwise)
+    order as np.sum() does in weighted_mean(), so the results are bit-for-bit the same as the groupby version.
+
+    INPUTS
+    -----------
+    b_df: (DataFrame) a single band's light curve data. Must contain the columns: MJD, L_rf, L_rf_err, band, em_cent_wl
+
+    MJD_bins: (range) the MJD bin edges, as created in bin_lc(). The bins are closed on the right, like pd.cut(), so a datapoint at MJD = x goes into the
+    bin (edge_i, edge_i+1] which contains it
+
+    drop_na_bins: (bool) if True, only the bins containing data are returned. If False, the empty bins are also returned with NaN values
+
+
+    OUTPUTS
+    -----------
+    b_binned_df: (DataFrame) the binned band data with the columns: MJD_bin, wm_L_rf, wm_L_rf_err, wm_MJD, band, em_cent_wl, MJD_lower_err, MJD_upper_err
+    """
+    bin_edges = np.asarray(MJD_bins)
+    no_bins = len(bin_edges) - 1
+    MJD = b_df['MJD'].to_numpy(dtype = float)
+    L_rf = b_df['L_rf'].to_numpy(dtype = float)
+    L_rf_err = b_df['L_rf_err'].to_numpy(dtype = float)
+
+    # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # give each datapoint the index of its MJD bin. Datapoints which fall outside of the bins (or have NaN MJDs) are dropped, the same as pd.cut() gives them a NaN bin
+    bin_idx = np.searchsorted(bin_edges, MJD, side = 'left') - 1
+    in_bins = (bin_idx >= 0) & (bin_idx < no_bins)
+    row_idx = np.flatnonzero(in_bins)
+    row_idx = row_idx[np.argsort(bin_idx[row_idx], kind = 'stable')] # stable sort so that the datapoints within a bin keep their original order
+    sorted_bin_idx = bin_idx[row_idx]
+
+    MJD = MJD[row_idx]
+    L_rf = L_rf[row_idx]
+    L_rf_err = L_rf_err[row_idx]
+
+    # the start of each contiguous run of datapoints in the same bin
+    seg_starts = np.flatnonzero(np.diff(sorted_bin_idx)) + 1
+    seg_starts = np.concatenate(([0], seg_starts)).astype(np.intp) if len(row_idx) > 0 else np.array([], dtype = np.intp)
+    occupied_bins = sorted_bin_idx[seg_starts]
+    count = np.diff(np.append(seg_starts, len(row_idx)))
+
+    def bin_sum(values):
+        # sum the values within each bin. np.add.reduceat() adds the values up sequentially, which can differ from np.sum() in the last bit, so instead
+        # take all of the bins with n datapoints at once as an (N_bins, n) array and sum along its rows
+        sums = np.empty(len(seg_starts))
+        for n in np.unique(count):
+            bins_with_n = np.flatnonzero(count == n)
+            bin_rows = seg_starts[bins_with_n][:, np.newaxis] + np.arange(n)[np.newaxis, :]
+            sums[bins_with_n] = np.sum(values[bin_rows], axis = 1)
+        return sums
+
+    # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # the weighted means, done in the same way as weighted_mean(). If the errors in the bin all == 0.0 (like with Gaia_G) then just take the regular mean and set its error to NA
+    if len(row_idx) > 0:
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            weights = 1/(L_rf_err**2)
+            zero_err = bin_sum(L_rf_err) == 0.0
+            sum_weights = bin_sum(weights)
+            wm_L_rf = bin_sum(L_rf * weights) / sum_weights
+            wm_L_rf_err = np.sqrt( 1/sum_weights )
+            wm_MJD = bin_sum(MJD * weights) / sum_weights
+
+            if zero_err.any():
+                wm_L_rf[zero_err] = (bin_sum(L_rf) / count)[zero_err]
+                wm_MJD[zero_err] = (bin_sum(MJD) / count)[zero_err]
+
+        min_MJD = np.minimum.reduceat(MJD, seg_starts)
+        max_MJD = np.maximum.reduceat(MJD, seg_starts)
+        first_row = b_df.iloc[row_idx[seg_starts]]
+        band = first_row['band'].to_numpy()
+        em_cent_wl = first_row['em_cent_wl'].to_numpy()
+
+    else:
+        zero_err = np.zeros(0, dtype = bool)
+        wm_L_rf, wm_L_rf_err, wm_MJD, min_MJD, max_MJD, em_cent_wl = [np.zeros(0) for _ in range(6)]
+        band = np.zeros(0, dtype = object)
+
+    # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # creating the upper and lower MJD errorbars. If we have one datapoint in the bin, the MJD range within the bin = 0.0. Negative errors can only come from floating point errors
+    # (a - (~a)), so set them to 0.0. NOTE: this keeps the if/elif of the groupby version, so the upper error is only clipped if the lower one wasn't
+    MJD_lower_err = np.where(count == 1, 0.0, wm_MJD - min_MJD)
+    MJD_upper_err = np.where(count == 1, 0.0, max_MJD - wm_MJD)
+    lower_negative = MJD_lower_err < 0.0
+    MJD_upper_err = np.where(~lower_negative & (MJD_upper_err < 0.0), 0.0, MJD_upper_err)
+    MJD_lower_err = np.where(lower_negative, 0.0, MJD_lower_err)
+
+    if zero_err.any(): # weighted_mean() gives pd.NA as the error for these bins, so we do the same here
+        wm_L_rf_err = wm_L_rf_err.astype(object)
+        wm_L_rf_err[zero_err] = pd.NA
+
+    # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # if we want to keep the empty bins too, put the binned values into arrays for every bin, with NaN for the empty ones
+    if not drop_na_bins:
+        bin_codes = np.arange(no_bins)
+        def all_bins(values, fill):
+            full = np.full(no_bins, fill, dtype = values.dtype if values.dtype != object else object)
+            full[occupied_bins] = values
+            return full
+
+        wm_L_rf, wm_L_rf_err, wm_MJD, MJD_lower_err, MJD_upper_err = [all_bins(v, np.nan) for v in [wm_L_rf, wm_L_rf_err, wm_MJD, MJD_lower_err, MJD_upper_err]]
+        band = np.full(no_bins, b_df['band'].iloc[0], dtype = object)
+        em_cent_wl = np.full(no_bins, b_df['em_cent_wl'].iloc[0], dtype = float)
+    else:
+        bin_codes = occupied_bins
+
+    MJD_bin = pd.Categorical.from_codes(bin_codes, categories = pd.IntervalIndex.from_breaks(bin_edges, closed = 'right'), ordered = True) # the same categories as pd.cut() gives
+    b_binned_df = pd.DataFrame({'MJD_bin': MJD_bin,
+                                'wm_L_rf': wm_L_rf,
+                                'wm_L_rf_err': wm_L_rf_err,
+                                'wm_MJD': wm_MJD,
+                                'band': band,
+                                'em_cent_wl': em_cent_wl,
+                                'MJD_lower_err': MJD_lower_err,
+                                'MJD_upper_err': MJD_upper_err})
+
+    return b_binned_df
+
+
+
+
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+##################################################################################################################################################################
+
+
+
+
+
+def bin_lc(list_lc_df, MJD_binsize, drop_na_bins = True, engine = 'groupby'):
     """
-    Takes each band within the light curve data provided and puts it into MJD bins, taking the weighted mean of the rest frame luminosity, its error and the weighted mean 
+    Takes each band within the light curve data provided and puts it into MJD bins, taking the weighted mean of the rest frame luminosity, its error and the weighted mean
     MJD to match this, with the upper and lower errors on the MJD indicating the range of MJD values within the bin.
 
     INPUTS
@@ -283,13 +889,21 @@ def bin_lc(list_lc_df, MJD_binsize, drop_na_bins = True):
 
     MJD_binsize: (int or float) the size of the MJD bins that you want
 
-    
+    drop_na_bins: (bool) if True, the empty MJD bins are not included in the binned light curve
+
+    engine: (str) options: 'groupby', 'vectorised'. If 'groupby', each band is binned using pandas' groupby. If 'vectorised', each band is binned using vectorised_bin_band(),
+    which gives the same binned light curve but is much faster for light curves with lots of data (e.g. ATLAS/ZTF)
+
+
     OUTPUTS
     -----------
     list_binned_lc_dfs: (list) a list of dataframes of the whole ANT light curve binned into bin size = MJD_binsize. Each band within the light curve is binned separately.
                         Each df contains the columns:  MJD_bin, wm_L_rf (ergs/s/cm^2/Angstrom), wm_L_rf_err (args/s/cm^2/Angstrom), wm_MJD, band, em_cent_wl, MJD_lower_err, MJD_upper_err
 
     """
+    if engine not in ['groupby', 'vectorised']:
+        raise ValueError(f"engine must be 'groupby' or 'vectorised', not '{engine}'")
+
     list_binned_lc_dfs = []
     for idx, lc_df in enumerate(list_lc_df):
         #print(f'index = {idx}')
@@ -309,6 +923,14 @@ def bin_lc(list_lc_df, MJD_binsize, drop_na_bins = True):
             MJD_bin_max = int( round(b_df['MJD'].max(), -1) + 10 )
             MJD_bins = range(MJD_bin_min, MJD_bin_max + MJD_binsize, MJD_binsize) # create the bins
 
+            if engine == 'vectorised':
+                b_binned_df = vectorised_bin_band(b_df, MJD_bins, drop_na_bins = drop_na_bins)
+                if i == 0:
+                    whole_lc_binned_df = b_binned_df
+                else:
+                    whole_lc_binned_df = pd.concat([whole_lc_binned_df, b_binned_df], ignore_index = True)
+                continue
+
             # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
             # binning the data
             # data frame for the binned band data  - just adds a column of MJD_bin to the data, then we can group by all datapoints in the same MJD bin
@@ -860,31 +1482,87 @@ def allow_interpolation(interp_x, all_data_x, b_coverage_quality, local_density_
 
 
 
-def check_lightcurve_coverage(b_df, mjd_binsize = 50):
+def vectorised_allow_interpolation(interp_x, all_data_x, b_coverage_quality, local_density_region = 50, interp_cap = 150, gapsize = 100, factor = 100, simple_cutoff = False, simple_cut = 50):
     """
-    Bins the light curve into mjd bins and counts the number of dapoints in each bin. Can be used as a measure of the light curve data coverage for the band. It's an improvement on just doing 
-    (number of datapoints in the band)/(MJD span of the band) because a lot of the data could be densely packed in a particular region and sparsely distributed across the rest, and this would give the 
-    impression that the light curve was quite well sampled when it's not really. 
-
-    coverage_term = mean(count of datapoints in mjd_binsize bin) * (no datapoints across the lightcurve) / (1 + std dev(count of datapoints in mjd_binsize bin)) as a calculation of the light curve coverage. 
+    An array version of allow_interpolation() which decides whether or not to interpolate the band at many x values at once, using the same criteria. Rather than 
+    rescanning all_data_x for every interp_x, all_data_x is sorted once and searchsorted() is used to find the closest datapoints before and after each interp_x, as well as 
+    the number of datapoints within local_density_region of each interp_x. 
 
     INPUTS
-    -------------
-    b_df: a dataframe containing the band's data. We only actually look at the column 'wm_MJD'
+    ------------
+    interp_x: array of the x values at which we're trying to interpolate
 
-    mjd_binsize: int. The size of the bins within which we would like to count the number of datapoints in. This is to test how well-distributed the light curve's data is
+    all_data_x: array of the x values of teh actual data that we're interpolating
 
+    b_coverage_quality, local_density_region, interp_cap, gapsize, factor, simple_cutoff, simple_cut: the same as in allow_interpolation()
 
     RETURNS
-    ----------
-    
-    coverage_term = A score based on light curve coverage. The higher, the better. Higher scores will come from lightcurves which have well-distributed data across the light curve and lots of data in general. 
+    ------------
+    interp_allowed: array of bools, the same length as interp_x. If True, then interpolation is allowed at that interp_x, if False, interpolation is not allowed there. If there 
+    are no datapoints on one side of interp_x, interpolation isn't allowed there
 
     """
+    interp_x = np.asarray(interp_x, dtype = float)
+    sorted_data_x = np.sort(np.asarray(all_data_x, dtype = float))
 
-    MJD_bin_min = int( round(b_df['wm_MJD'].min(), -1) - mjd_binsize )
-    MJD_bin_max = int( round(b_df['wm_MJD'].max(), -1) + mjd_binsize )
-    MJD_bins = range(MJD_bin_min, (MJD_bin_max + mjd_binsize), mjd_binsize) # create the bins
+    # the closest datapoints before and after interp_x. Like in allow_interpolation(), a datapoint at interp_x counts as being both before and after it
+    idx_after = np.searchsorted(sorted_data_x, interp_x, side = 'left') # the index of the first datapoint >= interp_x
+    idx_before = np.searchsorted(sorted_data_x, interp_x, side = 'right') - 1 # the index of the last datapoint <= interp_x
+    has_after = idx_after < len(sorted_data_x)
+    has_before = idx_before >= 0
+
+    closest_MJD_diff_before = np.full(interp_x.shape, np.inf)
+    closest_MJD_diff_before[has_before] = interp_x[has_before] - sorted_data_x[idx_before[has_before]]
+    closest_MJD_diff_after = np.full(interp_x.shape, np.inf)
+    closest_MJD_diff_after[has_after] = sorted_data_x[idx_after[has_after]] - interp_x[has_after]
+    closest_MJD_diff = np.minimum(closest_MJD_diff_before, closest_MJD_diff_after)
+
+    not_over_gap = (closest_MJD_diff_before < gapsize) & (closest_MJD_diff_after < gapsize)
+
+    if simple_cutoff == False:
+        local_density = np.searchsorted(sorted_data_x, interp_x + local_density_region, side = 'right') - np.searchsorted(sorted_data_x, interp_x - local_density_region, side = 'left') # counts the number of datapoints within local_density_region days' of interp_x
+        interp_lim = np.minimum(interp_cap, (b_coverage_quality * local_density * factor)) # caps the interpolation limit at interp_cap
+        interp_allowed = (closest_MJD_diff < interp_lim) & not_over_gap
+
+    else:
+        interp_allowed = (closest_MJD_diff <= simple_cut) & not_over_gap
+
+    return interp_allowed
+
+
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+
+
+
+def check_lightcurve_coverage(b_df, mjd_binsize = 50):
+    """
+    Bins the light curve into mjd bins and counts the number of dapoints in each bin. Can be used as a measure of the light curve data coverage for the band. It's an improvement on just doing 
+    (number of datapoints in the band)/(MJD span of the band) because a lot of the data could be densely packed in a particular region and sparsely distributed across the rest, and this would give the 
+    impression that the light curve was quite well sampled when it's not really. 
+
+    coverage_term = mean(count of datapoints in mjd_binsize bin) * (no datapoints across the lightcurve) / (1 + std dev(count of datapoints in mjd_binsize bin)) as a calculation of the light curve coverage. 
+
+    INPUTS
+    -------------
+    b_df: a dataframe containing the band's data. We only actually look at the column 'wm_MJD'
+
+    mjd_binsize: int. The size of the bins within which we would like to count the number of datapoints in. This is to test how well-distributed the light curve's data is
+
+
+    RETURNS
+    ----------
+    
+    coverage_term = A score based on light curve coverage. The higher, the better. Higher scores will come from lightcurves which have well-distributed data across the light curve and lots of data in general. 
+
+    """
+
+    MJD_bin_min = int( round(b_df['wm_MJD'].min(), -1) - mjd_binsize )
+    MJD_bin_max = int( round(b_df['wm_MJD'].max(), -1) + mjd_binsize )
+    MJD_bins = range(MJD_bin_min, (MJD_bin_max + mjd_binsize), mjd_binsize) # create the bins
 
     # binning the data
     # data frame for the binned band data  - just adds a column of MJD_bin to the data, then we can group by all datapoints in the same MJD bin
@@ -906,7 +1584,65 @@ def check_lightcurve_coverage(b_df, mjd_binsize = 50):
 
 
 
-def polyfitting(b_df, band_coverage_quality, mjd_scale_C, L_rf_scalefactor, max_poly_order):
+def nested_weighted_polyfits(x, y, yerr, max_order):
+    """
+    Fits weighted least squares polynomials of every order from 1 up to max_order to the data using a single QR factorisation of the weighted Vandermonde matrix. 
+    Since a polynomial fit is linear in its coefficients, it minimises the same chi squared as curve_fit would, but without the iterative optimiser. The QR factorisation 
+    is done once for the full Vandermonde matrix (columns x^0, x^1, ..., x^max_order), and because QR doesn't reorder the columns, the leading (order + 1) columns of Q and R 
+    are the QR factorisation of the Vandermonde matrix for that order, so every lower order fit just needs a small triangular solve. 
+
+    INPUTS
+    ---------------
+    x: (array) the x values of the data, ideally scaled down so that they're close to 0 (e.g. MJD - mean MJD)
+
+    y: (array) the y values of the data
+
+    yerr: (array) the errors on the y values, used to weight the fit (in the same way as sigma in curve_fit)
+
+    max_order: (int) the maximum order of polynomial to fit. Orders which have as many (or more) coefficients as there are datapoints are not fit
+
+
+    OUTPUTS
+    ---------------
+    poly_coeffs_dict: (dict) the keys are the polynomial orders and the values are arrays of the fitted coefficients in descending order, so they can be put straight into np.polyval()
+
+    """
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    yerr = np.asarray(yerr, dtype = float)
+
+    # scale x to lie within [-1, 1] so that the columns of the Vandermonde matrix aren't so wildly different in size at high orders, then unscale the coefficients at the end
+    x_scale = np.max(np.abs(x))
+    if x_scale == 0.0:
+        x_scale = 1.0
+    
+    weights = 1.0 / yerr
+    weighted_vander = np.vander(x / x_scale, N = max_order + 1, increasing = True) * weights[:, np.newaxis] # columns go x^0, x^1, ..., x^max_order
+    Q, R = np.linalg.qr(weighted_vander, mode = 'reduced')
+    Qty = Q.T @ (y * weights)
+
+    poly_coeffs_dict = {}
+    for order in range(1, max_order + 1):
+        M = order + 1 # the number of coefficients
+        if M > len(x):
+            break
+
+        sc_coeffs = np.linalg.lstsq(R[:M, :M], Qty[:M], rcond = None)[0] # lstsq rather than a triangular solve so that repeated MJDs etc don't break the fit
+        coeffs = sc_coeffs / (x_scale ** np.arange(M)) # undo the x scaling, these are in ascending order
+        poly_coeffs_dict[order] = coeffs[::-1]
+
+    return poly_coeffs_dict
+
+
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+
+
+
+def polyfitting(b_df, band_coverage_quality, mjd_scale_C, L_rf_scalefactor, max_poly_order, engine = 'curve_fit'):
     """
     This function uses chi squred minimisation to optimise the choice of the polynomial order to fit to a band in a light curve, and also uses curve_fit to find
     the optimal parameters for each polynomial fit. Bands with little data are not allowed to use higher order polynomials to fit them
@@ -924,6 +1660,9 @@ def polyfitting(b_df, band_coverage_quality, mjd_scale_C, L_rf_scalefactor, max_
 
     max_poly_order: int between 3 <= max_poly_order <= 14. The maximum order of polynomial that you want to be allowed to fit. 
 
+    engine: (str) options: 'curve_fit', 'vandermonde'. If 'curve_fit', each polynomial order is fit separately with curve_fit. If 'vandermonde', all of the polynomial orders 
+    are fit at once with nested_weighted_polyfits(), which minimises the same weighted chi squared using one QR factorisation of the weighted Vandermonde matrix
+
 
     OUTPUTS
     --------------------
@@ -1051,14 +1790,26 @@ def polyfitting(b_df, band_coverage_quality, mjd_scale_C, L_rf_scalefactor, max_
         poly_orders_available = poly_orders_available[:(idx - 1)] # this should be fine since we have a lower limit of 2 datapoints right now
         print(f'NEW polyorders = {poly_orders_available}')
 
+    if engine == 'vandermonde':
+        vander_coeffs_dict = nested_weighted_polyfits(x = b_MJD_scaled, y = b_L_scaled, yerr = b_L_err_scaled, max_order = max(poly_orders_available))
+
+    elif engine != 'curve_fit':
+        raise ValueError(f"engine must be 'curve_fit' or 'vandermonde', not '{engine}'")
+
     # iterate thriugh different polynomial orders
     best_redchi = 1e10 # start off very high so it's immediately overwritten by the first fit's results
     for order in poly_orders_available: 
-        poly_function = poly_order_dict[order]
-        popt, pcov = opt.curve_fit(poly_function, xdata = b_MJD_scaled, ydata = b_L_scaled, sigma = b_L_err_scaled)
+        if engine == 'vandermonde':
+            if order not in vander_coeffs_dict: # more coefficients than datapoints, so the reduced chi squared would be NaN anyway
+                continue
+            polyval_coeffs = vander_coeffs_dict[order]
+
+        else:
+            poly_function = poly_order_dict[order]
+            popt, pcov = opt.curve_fit(poly_function, xdata = b_MJD_scaled, ydata = b_L_scaled, sigma = b_L_err_scaled)
+            polyval_coeffs = popt[::-1] # using popt[::-1] just reverses the array because my polynomial functions inputs go in ascending order coefficients, whereeas polyval does the opposite
         
         # now calculate the reduced chi squared of the polynomial fit
-        polyval_coeffs = popt[::-1] # using popt[::-1] just reverses the array because my polynomial functions inputs go in ascending order coefficients, whereeas polyval does the opposite
         chi_sc_poly_L = np.polyval(polyval_coeffs, b_MJD_scaled) 
         redchi, redchi_1sig = chisq(chi_sc_poly_L, b_L_scaled, b_L_err_scaled, M = order + 1, reduced_chi = True)
         
@@ -1094,26 +1845,27 @@ def fudge_interpolation_error_formula(mean_err, mjd_dif, L):
 
         INPUTS
         -----------
-        mean_err: (float) the mean error on the nearest X datapoints. If you're utilising straggler data, just input the error on your straggler datapoint
+        mean_err: (float or array) the mean error on the nearest X datapoints. If you're utilising straggler data, just input the error on your straggler datapoint
 
-        mjd_dif: (float) the mjd span over which we are interpolating
+        mjd_dif: (float or array) the mjd span over which we are interpolating
 
-        L: (float) the rest frame luminosity of the interpolated datapoint. Ideally, this would be scaled down
+        L: (float or array) the rest frame luminosity of the interpolated datapoint. Ideally, this would be scaled down
+
+        Arrays of the same length can be given for all three inputs to calculate the errors for many interpolated datapoints at once.
 
 
         RETURNS
         -------------
-        er: (float). The fudged error calculated for the interpolated datapoint. If you input L as a scaled value, er will be scaled by the same value as well. 
+        er: (float or array). The fudged error calculated for the interpolated datapoint. If you input L as a scaled value, er will be scaled by the same value as well. 
 
         """
 
         fraction = 0.05
 
-        x = abs( L * (mjd_dif / 10) ) 
+        x = np.abs( L * (mjd_dif / 10) ) 
         #er = np.sqrt(mean_err**2 + (fraction * x)**2)  # this adds some % error for every 10 days interpolated - inspired by Superbol who were inspired by someone else
         er = mean_err + fraction*x
-        if er > abs(L):
-            er = abs(L)
+        er = np.minimum(er, np.abs(L)) # the error can't be larger than L itself
 
         return er
 
@@ -1182,54 +1934,33 @@ def fudge_polyfit_L_rf_err(real_b_df, scaled_polyfit_L_rf, scaled_reference_MJDs
     scaled_rb_L_rf_err = rb_L_rf_err * L_rf_scaledown # scaled down band's real weighted mean rest frame luminosity error values
 
 
-    fudge_err_list = [] # a list of fudged rest frame luminosity uncertainties on the L_rf values calculated by polyfit, at the reference MJDs
-    if isinstance(scaled_polyfit_L_rf, float): # accounting for the possibilit that scaled_polyfit_L_rf isn't a list of values but a list of one value or a float. This would only really happen when we evaluate the reference band at the straggler datapoint MJDs
-        sc_ref_mjd = scaled_reference_MJDs
-        sc_L = scaled_polyfit_L_rf
-        MJD_diff = [abs(sc_ref_mjd - sc_mjd) for sc_mjd in scaled_rb_MJDs] # take the abs value of the difference between the mjd of the datapoint and the mjd values in the band's actual data
-        sort_by_MJD_closeness = np.argsort(MJD_diff) # argsort returns a list of the index arrangement of the elements within the list/array its given that would sort the list/array in ascending order
-            
-        # calculate the mean of the closest 20 datapoint's errors
-        closest_20_idx = sort_by_MJD_closeness[:20] 
-        sc_closest_20_err = [scaled_rb_L_rf_err[j] for j in closest_20_idx] #  a list of the wm_L_rf_err values for the 20 closest datapoints to our interpolated datapoint
-        sc_mean_L_rf_err = np.mean(np.array(sc_closest_20_err)) # part of the error formula = mean L_rf_err of the 20 closest datapoints in MJD
-        closest_MJD_diff = MJD_diff[sort_by_MJD_closeness[0]]
-
-        # use the fudged error formula
-        sc_poly_L_rf_er = fudge_interpolation_error_formula(sc_mean_L_rf_err, closest_MJD_diff, sc_L)
-        poly_L_rf_er =  sc_poly_L_rf_er / L_rf_scaledown # to scale L_rf (fudged) error
-        
-        if poly_L_rf_er < 0.0:
-            print(sc_L, poly_L_rf_er)
-        fudge_err_list.append(poly_L_rf_er)
+    # find the 20 closest datapoints in MJD to each of the interpolated datapoints all at once. Since scaled_rb_MJDs is sorted, the k closest datapoints to an MJD must all lie 
+    # within k datapoints either side of where it would be inserted into scaled_rb_MJDs, so we only need to look at this window of 2k candidates rather than the whole band
+    sc_ref_MJDs = np.atleast_1d(np.asarray(scaled_reference_MJDs, dtype = float)) # accounting for the possibility that we were given a float, which happens when we evaluate the reference band at the straggler datapoint MJDs
+    sc_L = np.atleast_1d(np.asarray(scaled_polyfit_L_rf, dtype = float))
+    no_rb = len(scaled_rb_MJDs)
+    k = min(20, no_rb)
+    no_candidates = min(2*k, no_rb)
 
+    insert_idx = np.searchsorted(scaled_rb_MJDs, sc_ref_MJDs)
+    window_start = np.clip(insert_idx - k, 0, no_rb - no_candidates)
+    candidate_idx = window_start[:, np.newaxis] + np.arange(no_candidates) # shape (no. interpolated datapoints, no_candidates)
+    candidate_MJD_diff = np.abs(sc_ref_MJDs[:, np.newaxis] - scaled_rb_MJDs[candidate_idx])
 
+    closest_k = np.argsort(candidate_MJD_diff, axis = 1, kind = 'stable')[:, :k] # the closest k in order of MJD closeness. The sort is stable so that when two datapoints are the same distance away (e.g. integer MJDs either side), the earlier one always wins
+    closest_k_idx = np.take_along_axis(candidate_idx, closest_k, axis = 1)
 
-    else:
-        for i, sc_L in enumerate(scaled_polyfit_L_rf): # iterate through each interpolated L_rf value calculated by evaluating the polyfit at the reference band's MJDs
-            sc_ref_mjd = scaled_reference_MJDs[i] # scaled MJD value of the reference band
-            MJD_diff = [abs(sc_ref_mjd - sc_mjd) for sc_mjd in scaled_rb_MJDs] # take the abs value of the difference between the mjd of the datapoint and the mjd values in the band's actual data
-            sort_by_MJD_closeness = np.argsort(MJD_diff) # argsort returns a list of the index arrangement of the elements within the list/array its given that would sort the list/array in ascending order
-            
-            # calculate the mean of the closest 20 datapoint's errors
-            closest_20_idx = sort_by_MJD_closeness[:20] 
-            sc_closest_20_err = [scaled_rb_L_rf_err[j] for j in closest_20_idx] #  a list of the wm_L_rf_err values for the 20 closest datapoints to our interpolated datapoint
-            sc_mean_L_rf_err = np.mean(np.array(sc_closest_20_err)) # part of the error formula = mean L_rf_err of the 20 closest datapoints in MJD
-            closest_MJD_diff = MJD_diff[sort_by_MJD_closeness[0]]
-
-            # calculate the error on the datapoints which would force the reduced chi squared of the nearest 5 datapoints (using the errors for the interpolated datapoints) to 1
-            #closest_5_idx = sort_by_MJD_closeness[:5]
-            #sc_closest_rb_L = [sc_rb_L_rf[j] for j in closest_5_idx] # the scaled luminosity values of the closest 5 datapoints in the real band's data
-            #sc_closest_rb_MJD = np.array([scaled_rb_MJDs[j] for j in closest_5_idx]) # the scaled MJD values of the closest 5 datapoints in the real band's data
-            #sc_closest_interp_L = np.polyval(optimal_params, sc_closest_rb_MJD) * L_rf_scaledown
-            
-            # use the fudged error formula
-            sc_poly_L_rf_er = fudge_interpolation_error_formula(sc_mean_L_rf_err, closest_MJD_diff, sc_L)
-            poly_L_rf_er =  sc_poly_L_rf_er / L_rf_scaledown # to scale L_rf (fudged) error
-            
-            if poly_L_rf_er < 0.0:
-                print(sc_L, poly_L_rf_er)
-            fudge_err_list.append(poly_L_rf_er)
+    # calculate the mean of the closest 20 datapoint's errors
+    sc_mean_L_rf_err = np.mean(scaled_rb_L_rf_err[closest_k_idx], axis = 1) # part of the error formula = mean L_rf_err of the 20 closest datapoints in MJD
+    closest_MJD_diff = np.take_along_axis(candidate_MJD_diff, closest_k[:, :1], axis = 1)[:, 0]
+
+    # use the fudged error formula
+    sc_poly_L_rf_er = fudge_interpolation_error_formula(sc_mean_L_rf_err, closest_MJD_diff, sc_L)
+    poly_L_rf_er = sc_poly_L_rf_er / L_rf_scaledown # to scale L_rf (fudged) error
+
+    if (poly_L_rf_er < 0.0).any():
+        print(sc_L[poly_L_rf_er < 0.0], poly_L_rf_er[poly_L_rf_er < 0.0])
+    fudge_err_list = list(poly_L_rf_er) # a list of fudged rest frame luminosity uncertainties on the L_rf values calculated by polyfit, at the reference MJDs
 
     return fudge_err_list
 
@@ -1324,6 +2055,61 @@ def restrict_dataframe(df, min_value, max_value, column = 'wm_MJD'):
 
 
 
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+
+
+
+def interp_cache_key(df, interp_params):
+    """
+    Makes a key for the interpolated light curve cache (see polyfit_lightcurve's interp_cache_folder) by hashing the ANT's binned light curve along with every parameter
+    which goes into the polyfitting and interpolation. If any of the data or these parameters change, the key changes, so a cached interpolated light curve is only ever 
+    reused when it would come out the same if it was recalculated. 
+
+    INPUTS
+    ---------------
+    df: (DataFrame) the ANT's binned light curve (the output of bin_lc())
+
+    interp_params: (dict) the interpolation parameters. The values can be numbers, strings, None, lists, tuples, dicts or DataFrames (e.g. the manually identified stragglers)
+
+
+    OUTPUTS
+    ---------------
+    key: (str) a hex string which is the same for the same df and interp_params
+    """
+    key_hash = hashlib.sha1()
+
+    def update_hash(value):
+        if isinstance(value, pd.DataFrame):
+            key_hash.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode())
+            key_hash.update(pd.util.hash_pandas_object(value, index = True).to_numpy().tobytes())
+        elif isinstance(value, dict):
+            key_hash.update(b'{')
+            for dict_key in sorted(value, key = str):
+                update_hash(dict_key)
+                update_hash(value[dict_key])
+            key_hash.update(b'}')
+        elif isinstance(value, (list, tuple)):
+            key_hash.update(b'[')
+            for item in value:
+                update_hash(item)
+            key_hash.update(b']')
+        else:
+            key_hash.update(repr(value).encode() + b';')
+
+    update_hash(df)
+    update_hash(interp_params)
+
+    return key_hash.hexdigest()
+
+
+
+
+
+
 #=================================================================================================================================================================
 #=================================================================================================================================================================
 #=================================================================================================================================================================
@@ -1344,7 +2130,7 @@ def restrict_dataframe(df, min_value, max_value, column = 'wm_MJD'):
 class polyfit_lightcurve:
     def __init__(self, ant_name, ant_z, df, bands, override_ref_band_dict, min_band_dps, manual_straggler_input_dict, 
                 straggler_dist, gapsize, fit_MJD_range, max_interp_distance, b_colour_dict, 
-                b_marker_dict, max_poly_order = 14, plot_polyfit = True, save_interp_df = True):
+                b_marker_dict, max_poly_order = 14, plot_polyfit = True, save_interp_df = True, polyfit_engine = 'curve_fit', interp_cache_folder = None, interp_file_format = None):
         """
         A class which can fit a polynomial to each band of a an ANT's light curve, then use this to interpolate the light curve according to user input interpolation restrictions
         to prevent interpolating in regions where the polynomial is more unreliable. 
@@ -1386,6 +2172,15 @@ class polyfit_lightcurve:
 
         save_interp_df: (bool) whether to save the polynomial interpolated light curve in a dataframe. 
 
+        polyfit_engine: (str) options: 'curve_fit', 'vandermonde'. How the polynomials are fit to each band, see the engine argument of polyfitting()
+
+        interp_cache_folder: (str or None) if not None, the folder in which to cache the results of run_fitting_pipeline(). The cache files are named by a hash of df and all of the 
+        interpolation parameters (see interp_cache_key()), so if this ANT has already been interpolated with the same data and parameters, run_fitting_pipeline() loads interp_df 
+        and plot_results from the cache rather than recalculating them (if plot_polyfit == True, the plots are made from the cached polyfits). If None, nothing is cached
+
+        interp_file_format: (str or None) the file format to save interp_df in if save_interp_df == True. Options: 'feather', 'parquet', 'csv' or None, which uses feather if pyarrow
+        is installed and csv otherwise (see save_dataframe())
+
         """
         
         self.ant_name = ant_name
@@ -1405,6 +2200,10 @@ class polyfit_lightcurve:
         self.b_marker_dict = b_marker_dict
         self.plot_polyfit = plot_polyfit
         self.save_interp_df = save_interp_df
+        self.polyfit_engine = polyfit_engine
+        self.interp_cache_folder = interp_cache_folder
+        self.interp_file_format = check_file_format(interp_file_format)
+        self.loaded_from_cache = False # set to True by run_fitting_pipeline() if the results were loaded from the cache
 
         self.b_df_dict = {b: df[df['band'] == b].copy() for b in bands} # a dictionary of band dataframes, so self.b_df_dict[band] gives the band's dataframe
         self.lim_df = None # will be set later
@@ -1540,19 +2339,17 @@ class polyfit_lightcurve:
             b_lim_df = self.b_lim_df_dict[b]
             b_non_straggler_df = self.prepping_data.at[b, 'non_straggler_df']
 
-            filtered_interp_MJDs = [mjd for mjd in b_interp_MJDs if (mjd >= b_non_straggler_df['wm_MJD'].min()) and (mjd <= b_non_straggler_df['wm_MJD'].max())]  # make sure interp_MJD doesn't go beyond the bounds of the band's data
+            b_min_MJD = b_non_straggler_df['wm_MJD'].min()
+            b_max_MJD = b_non_straggler_df['wm_MJD'].max()
+            filtered_interp_MJDs = [mjd for mjd in b_interp_MJDs if (mjd >= b_min_MJD) and (mjd <= b_max_MJD)]  # make sure interp_MJD doesn't go beyond the bounds of the band's data
             
             # evaluate whether each MJD is worth interpolating, e.g. if it's like 500 days away from all other datapoints, don't interpolate there because the polyfit isn't 
             # well constrained there. We allow better sampled bands to interpolate further out than poorly sampled bands since their fits are better constrained. 
-            sc_filtered_interp_MJDs = filtered_interp_MJDs - self.MJD_scaleconst
-            allow_interp = []
-            for sc_int_mjd in sc_filtered_interp_MJDs:
-                allow_int = allow_interpolation(interp_x = sc_int_mjd, all_data_x = b_lim_df['sc_MJD'], b_coverage_quality = self.prepping_data.at[b, 'b_coverage_score'], 
+            sc_filtered_interp_MJDs = np.array(filtered_interp_MJDs, dtype = float) - self.MJD_scaleconst
+            allow_interp = vectorised_allow_interpolation(interp_x = sc_filtered_interp_MJDs, all_data_x = b_lim_df['sc_MJD'], b_coverage_quality = self.prepping_data.at[b, 'b_coverage_score'], 
                                                           local_density_region = 50, interp_cap = self.max_interp_distance, gapsize = self.gapsize, factor = 1.0, 
                                                           simple_cutoff = False, simple_cut = None)
-                allow_interp.append(allow_int)
 
-            sc_filtered_interp_MJDs = np.array(sc_filtered_interp_MJDs)
             sc_filtered_interp_MJDs = sc_filtered_interp_MJDs[allow_interp]
 
             self.prepping_data.at[b, 'sc_interp_MJD'] = sc_filtered_interp_MJDs
@@ -1577,7 +2374,7 @@ class polyfit_lightcurve:
                 
                 continue
 
-            poly_coeffs, plot_poly_MJD, plot_poly_L_rf, redchi, redchi_1sig, chi_sig_dist = polyfitting(b_df = non_straggler_df, band_coverage_quality = self.prepping_data.at[b, 'b_coverage_score'], mjd_scale_C = self.MJD_scaleconst, L_rf_scalefactor = self.L_scalefactor, max_poly_order = self.max_poly_order)
+            poly_coeffs, plot_poly_MJD, plot_poly_L_rf, redchi, redchi_1sig, chi_sig_dist = polyfitting(b_df = non_straggler_df, band_coverage_quality = self.prepping_data.at[b, 'b_coverage_score'], mjd_scale_C = self.MJD_scaleconst, L_rf_scalefactor = self.L_scalefactor, max_poly_order = self.max_poly_order, engine = self.polyfit_engine)
             self.plot_results.loc[b] = [poly_coeffs, plot_poly_MJD, plot_poly_L_rf, redchi, redchi_1sig, chi_sig_dist]
 
             # interpolate using the polynomial fit at the MJD values determined by choose_interp_MJD
@@ -1708,7 +2505,7 @@ class polyfit_lightcurve:
                 exponent = int(np.floor(np.log10(abs(x))))
                 coeff = x / (10 ** exponent)
                 return rf"${coeff:.1f} \times 10^{{{exponent}}}$"
-        formatter = FuncFormatter(standard_form_tex)
+        formatter = ticker.FuncFormatter(standard_form_tex)
 
         for i, ax in enumerate(axs):
             if i >= no_subplots: # if we have more subplots than bands, break out of the loop and hide the axes of the remaining subplots#
@@ -1719,8 +2516,8 @@ class polyfit_lightcurve:
             
             ax.yaxis.set_major_formatter(formatter)  
             ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds 
-            ax.xaxis.set_major_locator(MaxNLocator(nbins=4))
-            ax.yaxis.set_major_locator(MaxNLocator(nbins=3))
+            ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=4))
+            ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins=3))
             ax.tick_params(axis='both', labelsize=9.5)
 
             b = self.bands[i]
@@ -1851,12 +2648,67 @@ class polyfit_lightcurve:
 
     def save_interpolated_df(self):
         if self.save_interp_df == True:
-            savepath = f"C:/Users/laure/OneDrive/Desktop/YoRiS desktop/YoRiS/data/interpolated_lcs/{self.ant_name}_interp_lc.csv"
-            self.interp_df.to_csv(savepath, index = False)
+            savepath = f"C:/Users/laure/OneDrive/Desktop/YoRiS desktop/YoRiS/data/interpolated_lcs/{self.ant_name}_interp_lc"
+            save_dataframe(self.interp_df, savepath, file_format = self.interp_file_format)
+
+
+
+    def get_interp_cache_path(self):
+        """
+        Returns the path of this ANT's cache file in self.interp_cache_folder, named by the hash of its binned light curve and interpolation parameters
+        """
+        interp_params = {'ant_name': self.ant_name, 'ant_z': self.ant_z, 'bands': list(self.bands), 'override_ref_band': self.override_ref_band, 'interp_at_ref_band': self.interp_at_ref_band, 
+                         'min_band_dps': self.min_band_dps, 'manual_straggler_input': self.manual_straggler_input, 'straggler_dist': self.straggler_dist, 'gapsize': self.gapsize, 
+                         'fit_MJD_range': self.fit_MJD_range, 'max_interp_distance': self.max_interp_distance, 'max_poly_order': self.max_poly_order, 'polyfit_engine': self.polyfit_engine}
+        cache_key = interp_cache_key(self.df, interp_params)
+
+        return os.path.join(self.interp_cache_folder, f"{self.ant_name}_{cache_key}_interp_cache.pkl")
+
+
+
+    def load_cached_interpolation(self):
+        """
+        If the cache has a result for this ANT with the same data and interpolation parameters, load it into self.interp_df, self.plot_results, self.ref_band 
+        and self.ref_band_peak_MJD and return True. Otherwise return False.
+        """
+        if self.interp_cache_folder is None:
+            return False
+
+        cache_path = self.get_interp_cache_path()
+        if not os.path.exists(cache_path):
+            return False
+
+        cached_results = pd.read_pickle(cache_path)
+        self.interp_df = cached_results['interp_df']
+        self.plot_results = cached_results['plot_results']
+        self.ref_band = cached_results['ref_band']
+        self.ref_band_peak_MJD = cached_results['ref_band_peak_MJD']
+        self.loaded_from_cache = True
+        return True
+
+
+
+    def save_cached_interpolation(self):
+        if self.interp_cache_folder is not None:
+            os.makedirs(self.interp_cache_folder, exist_ok = True)
+            cached_results = {'interp_df': self.interp_df, 'plot_results': self.plot_results, 'ref_band': self.ref_band, 'ref_band_peak_MJD': self.ref_band_peak_MJD}
+            pd.to_pickle(cached_results, self.get_interp_cache_path())
 
 
 
     def run_fitting_pipeline(self):
+        if self.load_cached_interpolation(): # this ANT has already been interpolated with the same data and parameters, so skip the fitting
+            self.get_scalefactors() # these aren't cached, but they only depend on self.df
+            if self.plot_polyfit == True: # the plots also need the straggler/non-straggler data and the band coverage scores, which are cheap to redo. The polyfits come from the cached self.plot_results
+                self.initialise_plot()
+                self.MJD_limit_df()
+                self.identify_stragglers_and_score_band()
+                self.plot_polyfit_funciton()
+                self.plot_polyfit_subplot()
+                plt.show()
+            self.save_interpolated_df()
+            return
+
         self.get_scalefactors()
         self.initialise_plot()
         self.MJD_limit_df()
@@ -1869,6 +2721,174 @@ class polyfit_lightcurve:
             self.plot_polyfit_subplot()
             plt.show()
         self.save_interpolated_df()
+        self.save_cached_interpolation()
+
+
+
+
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+
+
+
+def polyfit_kwargs_for_ANT(ANT_name, ANT_df, config):
+    """
+    Picks out one ANT's inputs to polyfit_lightcurve from a sample-wide config, as used by run_polyfit_sample() and stream_ANT_pipeline(). The inputs which change between 
+    ANTs ('ant_z', 'bands' and 'fit_MJD_range') are given in config as dictionaries keyed by the ANT names, everything else is used as it is for every ANT.
+
+    INPUTS
+    ---------------
+    ANT_name: (str) the ANT's name
+
+    ANT_df: (DataFrame) the ANT's binned light curve (the output of bin_lc()). Only used to get the ANT's bands if config doesn't give them
+
+    config: (dict) the inputs to polyfit_lightcurve (besides ant_name and df), see run_polyfit_sample()
+
+
+    OUTPUTS
+    ---------------
+    polyfit_kwargs: (dict) the inputs to polyfit_lightcurve for this ANT
+    """
+    per_ANT_inputs = ['ant_z', 'bands', 'fit_MJD_range']
+    polyfit_kwargs = {key: value for key, value in config.items() if key not in per_ANT_inputs}
+    for key in per_ANT_inputs:
+        if key in config:
+            polyfit_kwargs[key] = config[key][ANT_name]
+    if 'bands' not in polyfit_kwargs:
+        polyfit_kwargs['bands'] = list(ANT_df['band'].unique())
+
+    return polyfit_kwargs
+
+
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+
+
+
+def use_non_interactive_backend():
+    """
+    The initializer of run_polyfit_sample()'s worker processes, which makes matplotlib use a non-interactive backend in each worker (the polyfit plots are still saved 
+    if plot_polyfit = True, they just aren't shown). This is only run in the workers, so it never changes the backend of the process which called run_polyfit_sample()
+    """
+    plt.switch_backend('Agg')
+
+
+
+def polyfit_single_ANT(ANT_name, ANT_df, polyfit_kwargs, close_figures = False):
+    """
+    Runs polyfit_lightcurve's fitting pipeline on one ANT. This is the function which run_polyfit_sample() sends to each worker process. It doesn't save the interpolated 
+    light curve itself, since run_polyfit_sample() does this in the main process. 
+
+    INPUTS
+    ---------------
+    ANT_name: (str) the ANT's name
+
+    ANT_df: (DataFrame) the ANT's binned light curve (the output of bin_lc())
+
+    polyfit_kwargs: (dict) the rest of the inputs to polyfit_lightcurve, for this ANT
+
+    close_figures: (bool) if True, close all of the matplotlib figures once the ANT has been fit, so they don't pile up in the worker processes. This is False when
+                    run_polyfit_sample() fits the ANTs in its own process (n_workers = 1), so that it doesn't close any of your figures
+
+
+    OUTPUTS
+    ---------------
+    interp_df: (DataFrame) the ANT's interpolated light curve
+
+    """
+    polyfit_kwargs = dict(polyfit_kwargs, save_interp_df = False)
+    lightcurve = polyfit_lightcurve(ant_name = ANT_name, df = ANT_df, **polyfit_kwargs)
+    lightcurve.run_fitting_pipeline()
+    if close_figures:
+        plt.close('all')
+
+    return lightcurve.interp_df
+
+
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+
+
+
+def run_polyfit_sample(binned_df_list, names, config, n_workers = None, save_interp_df = True, 
+                       save_folder = None, file_format = None):
+    """
+    Polyfits and interpolates the light curves of a whole sample of ANTs in parallel, with each ANT's binned light curve sent to its own worker process. Each ANT's 
+    interpolated light curve is saved as soon as its worker finishes, and if an ANT's fit fails, the error is printed and the rest of the sample carries on. 
+
+    NOTE: on Windows, the processes are started by re-importing the script that calls this function, so the call must be inside an if __name__ == '__main__': block. 
+
+    INPUTS
+    ---------------
+    binned_df_list: (list) a list of the ANTs' binned light curve dataframes (the output of bin_lc()), in the same order as names
+
+    names: (list) a list of the ANT names
+
+    config: (dict) the inputs to polyfit_lightcurve (besides ant_name and df) which will be used for every ANT, e.g. {'min_band_dps': 4, 'straggler_dist': 70, ...}. 
+            The inputs which change between ANTs, i.e. 'ant_z', 'bands' and 'fit_MJD_range', should be given as dictionaries where the keys are the ANT names (like 
+            ANT_redshift_dict and MJDs_for_fit in plotting_preferences). If 'bands' isn't given, all of the bands in the ANT's light curve are used. If 'interp_cache_folder' is given, 
+            each ANT which has already been interpolated with the same binned light curve and parameters is loaded from the cache rather than refit (see polyfit_lightcurve)
+
+    n_workers: (int or None) the number of worker processes to use. If None, the number of CPUs is used. If 1, the ANTs are fit one after the other in this process
+
+    save_interp_df: (bool) whether to save each ANT's interpolated light curve
+
+    save_folder: (str or None) the folder in which to save the interpolated light curves, as {ANT_name}_interp_lc.feather (or .parquet/.csv). This must be given if 
+                 save_interp_df = True (there's no default folder, since this runs on the server as well as on a laptop)
+
+    file_format: (str or None) the file format to save the interpolated light curves in. Options: 'feather', 'parquet', 'csv' or None, which uses feather if pyarrow is 
+                 installed and csv otherwise (see save_dataframe())
+
+
+    OUTPUTS
+    ---------------
+    interp_df_list: (list) a list of the ANTs' interpolated light curve dataframes, in the same order as names. If an ANT's fit failed, its entry is None
+
+    failed_ANTs: (dict) the keys are the names of the ANTs whose fits failed, the values are the error messages
+
+    """
+    if save_interp_df and (save_folder is None):
+        raise ValueError("save_folder must be given if save_interp_df = True")
+    file_format = check_file_format(file_format)
+    polyfit_kwargs_list = [polyfit_kwargs_for_ANT(name, ANT_df, config) for name, ANT_df in zip(names, binned_df_list)]
+
+    interp_df_list = [None]*len(names)
+    failed_ANTs = {}
+
+    def collect_result(idx, get_interp_df): # save the result straight away, or record the error if the fit failed
+        name = names[idx]
+        try:
+            interp_df = get_interp_df()
+        except Exception as e:
+            failed_ANTs[name] = f'{type(e).__name__}: {e}'
+            print(f'{Fore.RED} WARNING: polyfitting {name} failed with {failed_ANTs[name]} {Style.RESET_ALL}')
+            return
+
+        interp_df_list[idx] = interp_df
+        if save_interp_df == True:
+            save_dataframe(interp_df, f"{save_folder}{name}_interp_lc", file_format = file_format)
+
+
+    if n_workers == 1:
+        for idx in tqdm(range(len(names)), desc = 'Polyfitting ANTs'):
+            collect_result(idx, lambda: polyfit_single_ANT(names[idx], binned_df_list[idx], polyfit_kwargs_list[idx]))
+
+    else:
+        with ProcessPoolExecutor(max_workers = n_workers, initializer = use_non_interactive_backend) as executor:
+            future_to_idx = {executor.submit(polyfit_single_ANT, names[idx], binned_df_list[idx], polyfit_kwargs_list[idx], close_figures = True): idx for idx in range(len(names))}
+            for future in tqdm(as_completed(future_to_idx), total = len(future_to_idx), desc = 'Polyfitting ANTs'):
+                collect_result(future_to_idx[future], future.result)
+
+    return interp_df_list, failed_ANTs
 
         
         
@@ -1895,7 +2915,8 @@ class polyfit_lightcurve:
 
 def load_interp_ANT_data(running_on_server):
     """
-    loads in the interpolated ANT data files
+    loads in the interpolated ANT data files. These can be feather, parquet or csv files (see save_dataframe()), and if an ANT's interpolated light curve has been saved
+    in more than one of these formats, the feather file is loaded over the parquet file over the csv file
 
     INPUTS:
     -----------
@@ -1920,15 +2941,22 @@ def load_interp_ANT_data(running_on_server):
     names = []
     ANT_bands = []
 
+    ANT_files = {} # the keys are the ANT names, the values are the file names of their interpolated light curves in the preferred format
+    file_format_rank = list(dataframe_file_extensions.values())
     for file in os.listdir(directory): # file is a string of the file name such as 'file_name.dat'
-        if file.endswith('.csv') == False: # ignore the README file
+        ANT_name, file_extension = os.path.splitext(file)
+        if (file_extension not in file_format_rank) or (ANT_name.endswith('_interp_lc') == False): # ignore the README file
             continue
 
-        ANT_name = file[:-14] # the files are named: ANT_name_interp_lc.csv
+        ANT_name = ANT_name[:-10] # the files are named: ANT_name_interp_lc.feather (or .parquet or .csv)
+        if (ANT_name not in ANT_files) or (file_format_rank.index(file_extension) < file_format_rank.index(os.path.splitext(ANT_files[ANT_name])[1])):
+            ANT_files[ANT_name] = file
+
+    for ANT_name, file in ANT_files.items():
         # load in the files
         file_path = os.path.join(directory, file)
-        file_df = pd.read_csv(file_path, delimiter = ',') # the lightcurve data in a dataframe
-        bands = file_df['band'].unique() # the bands in which this transient has data for
+        file_df = load_dataframe(file_path) # the lightcurve data in a dataframe
+        bands = np.asarray(file_df['band'].unique()) # the bands in which this transient has data for (the band column of a feather or parquet file is categorical)
 
         dataframes.append(file_df)
         names.append(ANT_name)            
@@ -1999,14 +3027,8 @@ def blackbody(lam_cm, R_cm, T_K):
     L: blackbody luminosity per unit wavelength for the wavelength input. Units: ergs/s/Angstrom
     """
 
-    c_cgs = const.c.cgs.value
-    h_cgs = const.h.cgs.value
-    k_cgs = const.k_B.cgs.value
 
-    C = 8 * (np.pi**2) * h_cgs * (c_cgs**2) * 1e-8 # the constant coefficient of the equation 
-    denom = np.exp((h_cgs * c_cgs) / (lam_cm * k_cgs * T_K)) - 1
-
-    L = C * ((R_cm**2) / (lam_cm**5)) * (1 / (denom)) # ergs/s/Angstrom
+    L = (R_cm**2) * planck_L_lam(lam_cm, T_K) # ergs/s/Angstrom, the constants are worked out once in planck_kernel.py
 
     return L
 
@@ -2017,6 +3039,46 @@ def blackbody(lam_cm, R_cm, T_K):
 
 
 
+def blackbody_jacobian(lam_cm, R_cm, T_K):
+    """
+    The analytic Jacobian of blackbody() with respect to its parameters (R_cm, T_K), for use as curve_fit's jac. Since L = R^2 * f(wavelength, T):
+
+    dL/dR = 2 * L / R,      dL/dT = (L / T) * x * e^x / (e^x - 1),      where x = hc / (wavelength * k * T)
+
+    The exponential is only calculated once (e^x - 1, the same as in blackbody()) and is used for both L and dL/dT, since e^x / (e^x - 1) = 1 + 1 / (e^x - 1). Written this 
+    way it doesn't overflow for large x either, where e^x - 1 = inf and the factor is just 1. 
+
+    INPUTS
+    --------------
+    lam_cm: (N_wl, ) the wavelength in cm
+
+    R_cm: Blackbody radius in cm (or scaled radius, as long as it's the same as given to blackbody())
+
+    T_K: Blackbody temperature in Kelvin
+
+    RETURNS
+    --------------
+    jac: (N_wl, 2) the derivatives of the blackbody luminosity with respect to R (first column) and T (second column) at each wavelength. The inputs can also be 
+        broadcastable arrays (e.g. lam_cm of shape (N_epochs, N_wl) with R_cm and T_K of shape (N_epochs, 1)), in which case jac has shape (N_epochs, N_wl, 2)
+    """
+
+    lam_cm = np.asarray(lam_cm, dtype = float)
+    x = planck_exponent(lam_cm, T_K)
+    denom = overflow_safe_expm1(x) # e^x - 1
+    L = L_lam_coeff * ((R_cm**2) / (lam_cm**5)) / denom # ergs/s/Angstrom
+
+    dL_dR = 2 * L / R_cm
+    dL_dT = (L / T_K) * x * (1 + 1 / denom)
+
+    return np.stack((dL_dR, dL_dT), axis = -1)
+
+
+
+
+
+
+
+
 
 
 
@@ -2060,35 +3122,52 @@ def double_blackbody(lam, R1, T1, R2, T2):
 
 
 
-def vectorised_blackbody(lam_cm, R_cm, T_K):
+def double_blackbody_jacobian(lam, R1, T1, R2, T2):
     """
-    Planck's blackbody formula modified to give luminosity per unit wavelength in units ergs/s/Angstrom
+    The analytic Jacobian of double_blackbody() with respect to its parameters (R1, T1, R2, T2), for use as curve_fit's jac. Since the two blackbodies are independent, 
+    this is just blackbody_jacobian() for each of them side by side. 
 
     INPUTS
     --------------
     lam: (N_wl, ) the wavelength in cm
 
-    R_cm: (N_r, ) Blackbody radius in cm - a parameter to fit for
-
-    T_K: (N_t, ) Blackbody temperature in Kelvin - a parameter to fit for
+    R1, T1, R2, T2: the same as double_blackbody()
 
     RETURNS
     --------------
-    L: (N_wl, N_r, N_t) blackbody luminosity per unit wavelength for the wavelength input. Units: ergs/s/Angstrom
+    jac: (N_wl, 4) the derivatives of the DBB luminosity with respect to R1, T1, R2, T2 at each wavelength (or (N_epochs, N_wl, 4) for broadcastable array inputs, like blackbody_jacobian)
     """
+    return np.concatenate((blackbody_jacobian(lam, R1, T1), blackbody_jacobian(lam, R2, T2)), axis = -1)
 
-    c_cgs = const.c.cgs.value
-    h_cgs = const.h.cgs.value
-    k_cgs = const.k_B.cgs.value
 
-    lam_cm = lam_cm[:, np.newaxis, np.newaxis] # shape (N_wl, 1, 1)
-    R_cm, T_K = np.meshgrid(R_cm, T_K) # shape (N_r, N_t) - this is the same as R_cm[:, np.newaxis] * T_K[np.newaxis, :] but more efficient
 
-    C = 8 * (np.pi**2) * h_cgs * (c_cgs**2) * 1e-8 # the constant coefficient of the equation 
-    exponent = (h_cgs * c_cgs) / (lam_cm * k_cgs * T_K)
-    denom = np.expm1(exponent) # more efficient than using np.exp() -1
 
-    L = C * ((R_cm**2) / (lam_cm**5)) / (denom) # ergs/s/Angstrom
+
+
+
+
+def vectorised_blackbody(lam_cm, R_cm, T_K):
+    """
+    Planck's blackbody formula modified to give luminosity per unit wavelength in units ergs/s/Angstrom
+
+    INPUTS
+    --------------
+    lam: (N_wl, ) the wavelength in cm
+
+    R_cm: (N_r, ) Blackbody radius in cm - a parameter to fit for
+
+    T_K: (N_t, ) Blackbody temperature in Kelvin - a parameter to fit for
+
+    RETURNS
+    --------------
+    L: (N_wl, N_r, N_t) blackbody luminosity per unit wavelength for the wavelength input. Units: ergs/s/Angstrom
+    """
+
+
+    R_cm = np.asarray(R_cm, dtype = float)
+    T_K = np.asarray(T_K, dtype = float)
+    planck_L = planck_L_lam(lam_cm[:, np.newaxis, np.newaxis], T_K[np.newaxis, np.newaxis, :]) # shape (N_wl, 1, N_t) - the planck function only depends on T, so only work it out once per T
+    L = (R_cm[np.newaxis, :, np.newaxis]**2) * planck_L # shape (N_wl, N_r, N_t), ergs/s/Angstrom
 
     return L
 
@@ -2128,6 +3207,146 @@ def vectorised_double_blackbody(lam, R1, T1, R2, T2):
     return BB1 + BB2 # shape (N_wl, N_r1, N_t1, N_r2, N_t2)
 
 
+
+
+
+
+
+
+def chunked_double_blackbody_chi(lam, L_rf, L_rf_err, R1, T1, R2, T2, max_bytes = 256 * 1024**2):
+    """
+    Calculates the chi squared of a double blackbody fit to the data for every combination of R1, T1, R2 and T2, without ever storing the (N_wl, N_r1, N_t1, N_r2, N_t2) 
+    array of model luminosities that vectorised_double_blackbody() gives. The blackbodies are calculated once for each (R, T) pair (which is small), then the chi grid is 
+    built up in blocks of (R1, T1) pairs, one wavelength at a time, using a preallocated buffer and in place numpy operations. This gives exactly the same chi values as 
+    np.sum((L_rf - vectorised_double_blackbody(lam, R1, T1, R2, T2))**2 / L_rf_err**2, axis = 0), but only needs memory for the chi grid itself plus the buffer.
+
+    INPUTS
+    --------------
+    lam: (N_wl, ) the wavelength in cm
+
+    L_rf: (N_wl, ) the rest frame luminosity of the data (in the same units as the blackbodies, i.e. scaled if the radii are scaled)
+
+    L_rf_err: (N_wl, ) the rest frame luminosity errors
+
+    R1, T1: (N_r1, ), (N_t1, ) the radii and temperatures of the first blackbody to try
+
+    R2, T2: (N_r2, ), (N_t2, ) the radii and temperatures of the second blackbody to try
+
+    max_bytes: (int) roughly the max memory that the buffer can take up. The number of (R1, T1) pairs in each block is set so that the buffer (of shape (block size, N_r2, N_t2))
+                fits into this. 
+
+    RETURNS
+    --------------
+    chi: (N_r1, N_t1, N_r2, N_t2) the chi squared for each combination of R1, T1, R2, T2
+    """
+    BB1 = vectorised_blackbody(lam, R1, T1) # shape (N_wl, N_r1, N_t1)
+    BB2 = vectorised_blackbody(lam, R2, T2) # shape (N_wl, N_r2, N_t2)
+    BB1 = BB1.reshape(len(lam), -1) # shape (N_wl, N_r1 * N_t1), one column for each (R1, T1) pair
+    L_rf_err_sq = L_rf_err**2
+    no_pairs = BB1.shape[1]
+
+    block_size = int(min(max(1, max_bytes // (8 * BB2[0].size)), no_pairs)) # the number of (R1, T1) pairs in each block
+    buffer = np.empty((block_size, len(R2), len(T2)))
+    chi = np.zeros((no_pairs, len(R2), len(T2)))
+
+    for start in range(0, no_pairs, block_size):
+        stop = min(start + block_size, no_pairs)
+        block_buffer = buffer[:stop - start]
+        block_chi = chi[start:stop]
+        for w in range(len(lam)): # add on each wavelength's contribution to chi
+            np.add(BB1[w, start:stop, np.newaxis, np.newaxis], BB2[w][np.newaxis, :, :], out = block_buffer) # the DBB model
+            np.subtract(L_rf[w], block_buffer, out = block_buffer)
+            np.square(block_buffer, out = block_buffer)
+            np.divide(block_buffer, L_rf_err_sq[w], out = block_buffer)
+            np.add(block_chi, block_buffer, out = block_chi)
+
+    return chi.reshape(len(R1), len(T1), len(R2), len(T2))
+
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+# CACHED PLANCK FUNCTION TABLES FOR THE BRUTE FORCE BLACKBODY GRIDS
+
+
+
+class planck_table_cache:
+    def __init__(self, max_bytes = 256 * 1024**2):
+        """
+        A least recently used cache of the Planck function part of the blackbody model, f(wavelength, T), where blackbody(wavelength, R, T) = R^2 * f(wavelength, T). 
+        The brute force blackbody fits evaluate the blackbody at the same grid of temperatures for every epoch, and the interpolated light curves only have a handful 
+        of rest frame band wavelengths, so each wavelength's row of f(wavelength, T) only needs to be calculated once and can be reused for every epoch of the ANT. 
+        Each row is keyed on the rest frame wavelength and the temperature grid. 
+
+        NOTE: since the blackbody is fit in the rest frame, a band's rest frame wavelength depends on the ANT's redshift, so the rows are NOT shared between ANTs which
+        were observed in the same band - only between ANTs at exactly the same redshift, which in practice doesn't happen. The saving is across the epochs of each ANT.
+
+        INPUTS
+        ---------------
+        max_bytes: (int) the maximum memory that the cached rows can take up. When adding a new row would go over this, the least recently used rows are removed
+        """
+        self.max_bytes = max_bytes
+        self.tables = OrderedDict() # keys are (wavelength in cm, temperature grid key), values are the rows of f(wavelength, T)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+
+    @staticmethod
+    def planck_function(lam_cm, T_K):
+        """
+        The part of blackbody() which doesn't depend on R, so blackbody(lam_cm, R_cm, T_K) = R_cm**2 * planck_function(lam_cm, T_K). Units: ergs/s/Angstrom/cm^2
+        """
+
+        return planck_L_lam(lam_cm, T_K)
+
+
+
+    def get_table(self, lam_cm, T_K):
+        """
+        Returns the Planck function table f(wavelength, T) for the wavelengths lam_cm and temperatures T_K, with shape (len(lam_cm), len(T_K)), calculating (and caching)
+        any rows which aren't already in the cache.
+        """
+        T_K = np.asarray(T_K, dtype = float)
+        T_grid_key = hashlib.sha1(T_K.tobytes()).hexdigest() # the same temperature grid gives the same key
+        
+        table_rows = []
+        for wl in np.asarray(lam_cm, dtype = float):
+            key = (float(wl), T_grid_key)
+            if key in self.tables:
+                self.hits += 1
+                self.tables.move_to_end(key) # mark as the most recently used row
+            
+            else:
+                self.misses += 1
+                row = self.planck_function(wl, T_K)
+                self.tables[key] = row
+                self.current_bytes += row.nbytes
+                while (self.current_bytes > self.max_bytes) and (len(self.tables) > 1): # remove the least recently used rows until we're under the memory limit
+                    _, old_row = self.tables.popitem(last = False)
+                    self.current_bytes -= old_row.nbytes
+
+            table_rows.append(self.tables[key])
+        
+        return np.stack(table_rows, axis = 0)
+
+
+
+    def clear(self):
+        self.tables.clear()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+
+planck_cache = planck_table_cache() # shared by all of the brute force blackbody fits in this process (but see the note in planck_table_cache about sharing between ANTs)
+
+
+
+
 #=================================================================================================================================================================
 #=================================================================================================================================================================
 #=================================================================================================================================================================
@@ -2165,6 +3384,245 @@ def power_law_SED(lam, A, gamma):
 
 
 
+
+
+
+def power_law_SED_jacobian(lam, A, gamma):
+    """
+    The analytic Jacobian of power_law_SED() with respect to its parameters (A, gamma), for use as curve_fit's jac:
+
+    dL/dA = wavelength^gamma,       dL/dgamma = A * wavelength^gamma * ln(wavelength)
+
+    INPUTS
+    --------------
+    lam: (N_wl, ) wavelength, in the same units as given to power_law_SED()
+
+    A: (float) Amplitude factor of the power law
+
+    gamma: (float) the power of the power law
+
+    RETURNS
+    --------------
+    jac: (N_wl, 2) the derivatives of the power law luminosity with respect to A (first column) and gamma (second column) at each wavelength (or (N_epochs, N_wl, 2) 
+        for broadcastable array inputs, like blackbody_jacobian)
+    """
+    lam = np.asarray(lam, dtype = float)
+    lam_gamma = lam**gamma
+
+    return np.stack((lam_gamma, A * lam_gamma * np.log(lam)), axis = -1)
+
+
+
+
+
+
+def profiled_power_law_chi(wavelengths, L_rfs, L_rf_errs, gamma_values, A_min, A_max):
+    """
+    Profiles the amplitude A out of the chi squared of a power law SED fit, L = A * (wavelength)**gamma. Since L is linear in A, for each gamma the chi squared is a quadratic in A:
+
+    chi(A, gamma) = sum(w * L^2) - 2 * A * sum(w * L * wavelength^gamma) + A^2 * sum(w * wavelength^(2*gamma)),    where w = 1/L_err^2
+
+    so the best A for each gamma is sum(w * L * wavelength^gamma) / sum(w * wavelength^(2*gamma)), which we clip to the range [A_min, A_max] (the constrained minimum, since chi is a 
+    parabola in A). This costs O(len(gamma_values) * len(wavelengths)) rather than needing a grid of A values. 
+
+    INPUTS
+    --------------
+    wavelengths: (array) the wavelengths of the data, in the units that A is defined in (Angstrom for fit_SED_across_lightcurve)
+
+    L_rfs: (array) the (scaled) rest frame luminosities of the data
+
+    L_rf_errs: (array) the (scaled) rest frame luminosity errors of the data
+
+    gamma_values: (float or array) the gamma value(s) to profile over
+
+    A_min: (float) the min value of A allowed, in the same (scaled) units as L_rfs
+
+    A_max: (float) the max value of A allowed
+
+
+    OUTPUTS
+    --------------
+    A_best: (array) the best A within [A_min, A_max] for each gamma value
+
+    chi_best: (array) the chi squared at (A_best, gamma) for each gamma value
+
+    sum_wLL, sum_wLg, sum_wgg: the sums which define the chi squared parabola in A for each gamma (sum_wLL is a float, the other two are arrays of length len(gamma_values)). 
+    These let you calculate chi squared at any A, or the A range within some delta chi of a minimum, without summing over the wavelengths again. 
+    """
+    gamma_values = np.atleast_1d(gamma_values)
+    weights = 1 / L_rf_errs**2
+    g = wavelengths[:, np.newaxis]**gamma_values[np.newaxis, :] # wavelength^gamma, shape (len(wavelengths), len(gamma_values))
+
+    sum_wLL = np.sum(weights * L_rfs**2)
+    sum_wLg = np.sum((weights * L_rfs)[:, np.newaxis] * g, axis = 0)
+    sum_wgg = np.sum(weights[:, np.newaxis] * g**2, axis = 0)
+
+    A_best = np.clip(sum_wLg / sum_wgg, A_min, A_max)
+    chi_best = sum_wLL - 2 * A_best * sum_wLg + A_best**2 * sum_wgg
+
+    return A_best, chi_best, sum_wLL, sum_wLg, sum_wgg
+
+
+
+
+
+
+
+def batched_levenberg_marquardt(SED_function, SED_jacobian, wavelengths, L_rfs, L_rf_errs, band_mask, lower_bounds, upper_bounds, p0 = None, log_params = None, max_iter = None, 
+                                ftol = 1e-8, xtol = 1e-8):
+    """
+    Fits the same SED model to many epochs at once with the Levenberg-Marquardt method, treating each epoch as its own small, independent least squares problem. 
+    Rather than looping over the epochs in python (like calling curve_fit at each epoch), every epoch takes its LM step at the same time using stacked numpy arrays, 
+    and epochs drop out of the iteration once they've converged. Each epoch has its own damping factor, which is divided by 10 after a step which lowers its chi squared 
+    and multiplied by 10 otherwise. The steps are clipped to stay within the bounds, and parameters which are sat on a bound and being pushed further out are held fixed 
+    for that step. Epochs with fewer bands than others are padded out to the same number of bands, and band_mask stops the padded entries contributing to the fit. 
+
+    INPUTS
+    ---------------
+    SED_function: (function) the SED model, called as SED_function(wavelengths, *params) where wavelengths has shape (N_epochs, N_max_bands) and each param has shape (N_epochs, 1), 
+                e.g. blackbody, double_blackbody or power_law_SED
+
+    SED_jacobian: (function) the analytic Jacobian of SED_function, returning shape (N_epochs, N_max_bands, N_params), e.g. blackbody_jacobian
+
+    wavelengths, L_rfs, L_rf_errs: (N_epochs, N_max_bands) arrays of the data at each epoch, padded out to N_max_bands. The padded entries just need the model to be finite 
+                                    there (e.g. a copy of one of the epoch's real wavelengths)
+
+    band_mask: (N_epochs, N_max_bands) bool array which is True for the real data and False for the padded entries
+
+    lower_bounds, upper_bounds: (N_params, ) the bounds on the model parameters
+
+    p0: (N_epochs, N_params) the starting parameters. If None, the fits start from the middle of the bounds, like curve_fit does when it's given bounds but no p0 (the middle of the 
+        bounds in log space for the parameters in log_params)
+
+    log_params: (N_params, ) bool array of the parameters which should be stepped in log space (these must have positive bounds). This suits parameters which are allowed to span 
+                several orders of magnitude, like the blackbody radius and temperature. If None, all of the parameters are stepped in linear space, like curve_fit
+
+    max_iter: (int) the maximum number of LM iterations for each epoch. If None, this is 100*N_params, which is the same number of model evaluations that curve_fit allows
+
+    ftol, xtol: an epoch has converged when a step lowers its chi squared by less than ftol * chi squared, or when all its parameters change by less than 
+                xtol * (xtol + |parameter|), like curve_fit's ftol and xtol
+
+    OUTPUTS
+    ---------------
+    popt: (N_epochs, N_params) the best fit parameters at each epoch
+
+    pcov: (N_epochs, N_params, N_params) the covariance matrix of the parameters at each epoch, calculated in the same way as curve_fit with absolute_sigma = True
+
+    converged: (N_epochs, ) bool array, False for the epochs which didn't converge within max_iter iterations (where curve_fit would have raised a RuntimeError)
+
+    nfev: (N_epochs, ) the number of model evaluations each epoch took
+    """
+    lower_bounds = np.asarray(lower_bounds, dtype = float)
+    upper_bounds = np.asarray(upper_bounds, dtype = float)
+    n_epochs = wavelengths.shape[0]
+    n_params = len(lower_bounds)
+    if max_iter is None:
+        max_iter = 100 * n_params
+
+    log_params = np.zeros(n_params, dtype = bool) if log_params is None else np.asarray(log_params, dtype = bool)
+
+    # the fit steps through x, where x = ln(parameter) for the parameters in log_params, and x = parameter for the rest
+    def x_to_params(x):
+        return np.where(log_params, np.exp(x), x)
+
+    x_lower_bounds = np.where(log_params, np.log(np.where(log_params, lower_bounds, 1.0)), lower_bounds)
+    x_upper_bounds = np.where(log_params, np.log(np.where(log_params, upper_bounds, 1.0)), upper_bounds)
+    if p0 is None:
+        x = np.tile(0.5 * (x_lower_bounds + x_upper_bounds), (n_epochs, 1))
+    else:
+        p0 = np.clip(np.array(p0, dtype = float), lower_bounds, upper_bounds)
+        x = np.where(log_params, np.log(np.where(log_params, p0, 1.0)), p0)
+    params = x_to_params(x)
+
+    weights = np.where(band_mask, 1 / L_rf_errs, 0.0) # the padded entries get zero weight
+
+    def weighted_residuals(epoch_idx, epoch_params):
+        model = SED_function(wavelengths[epoch_idx], *[epoch_params[:, [i]] for i in range(n_params)])
+        return weights[epoch_idx] * (L_rfs[epoch_idx] - model)
+
+    def weighted_jacobian(epoch_idx, epoch_params):
+        jac = SED_jacobian(wavelengths[epoch_idx], *[epoch_params[:, [i]] for i in range(n_params)])
+        return weights[epoch_idx][:, :, np.newaxis] * jac
+
+    def damped_svd_step(J_scaled, epoch_residuals, epoch_damping):
+        U, s, VT = np.linalg.svd(J_scaled, full_matrices = False)
+        UTr = np.einsum('eki,ek->ei', U, epoch_residuals)
+        return np.einsum('eji,ej->ei', VT, (s / (s**2 + epoch_damping[:, np.newaxis])) * UTr)
+
+    all_epochs = np.arange(n_epochs)
+    with np.errstate(all = 'ignore'):
+        residuals = weighted_residuals(all_epochs, params)
+        jacobian = weighted_jacobian(all_epochs, params)
+        chi = np.sum(residuals**2, axis = 1)
+        nfev = np.ones(n_epochs, dtype = int)
+        damping = np.full(n_epochs, 1e-3)
+        parameter_scales = np.zeros((n_epochs, n_params))
+        converged = np.zeros(n_epochs, dtype = bool)
+        active = np.isfinite(chi) # any epoch which has a non-finite chi squared at the starting parameters is counted as a failed fit
+
+        for iteration in range(max_iter):
+            idx = np.flatnonzero(active)
+            if len(idx) == 0:
+                break
+
+            # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+            # solve the damped least squares problem min |J step - r|^2 + damping |D step|^2 for every active epoch at once, where D scales each parameter by the largest size its 
+            # column of J has had so far (like MINPACK's LM, so the parameters' units don't matter, and a parameter which the model has become insensitive to doesn't get huge steps). 
+            # This is solved through the SVD of the scaled Jacobian rather than the normal equations (J^T J + damping D^2) step = J^T r, since forming J^T J squares its 
+            # condition number, and parameters like the power law's A and gamma are strongly correlated
+            J = jacobian[idx] * np.where(log_params, params[idx], 1.0)[:, np.newaxis, :] # d model / dx = (d model / d parameter) * parameter for the parameters in log_params
+            bad_system = ~np.all(np.isfinite(J), axis = (1, 2))
+            J = np.where(bad_system[:, np.newaxis, np.newaxis], 0.0, J) # the bad systems get a zero step, so they'll be counted as failed once their damping blows up
+            parameter_scales[idx] = np.maximum(parameter_scales[idx], np.sqrt(np.sum(J**2, axis = 1)))
+            D = np.where(parameter_scales[idx] > 0, parameter_scales[idx], 1.0)
+            J_scaled = J / D[:, np.newaxis, :]
+            epoch_residuals = np.where(bad_system[:, np.newaxis], 0.0, residuals[idx])
+            step = damped_svd_step(J_scaled, epoch_residuals, damping[idx]) / D
+
+            # any parameter which is sat on one of its bounds and is being pushed further out is held fixed, and the step is recalculated for the other parameters. 
+            # Otherwise, clipping the step would send it in a direction which might not lower the chi squared, and the epoch would get stuck
+            pinned = ((x[idx] <= x_lower_bounds) & (step < 0)) | ((x[idx] >= x_upper_bounds) & (step > 0))
+            if np.any(pinned):
+                step = damped_svd_step(np.where(pinned[:, np.newaxis, :], 0.0, J_scaled), epoch_residuals, damping[idx]) / D
+
+            # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+            # take the step, keep it if it lowered the chi squared
+            trial_x = np.clip(x[idx] + step, x_lower_bounds, x_upper_bounds)
+            trial_params = x_to_params(trial_x)
+            trial_residuals = weighted_residuals(idx, trial_params)
+            trial_chi = np.sum(trial_residuals**2, axis = 1)
+            nfev[idx] += 1
+
+            improved = trial_chi < chi[idx] # False if trial_chi is nan
+            small_chi_change = improved & ((chi[idx] - trial_chi) <= ftol * chi[idx])
+            small_step = np.all(np.abs(trial_x - x[idx]) <= xtol * (xtol + np.abs(x[idx])), axis = 1) & ~bad_system
+
+            accepted = idx[improved]
+            x[accepted] = trial_x[improved]
+            params[accepted] = trial_params[improved]
+            residuals[accepted] = trial_residuals[improved]
+            chi[accepted] = trial_chi[improved]
+            jacobian[accepted] = weighted_jacobian(accepted, params[accepted])
+            damping[accepted] = damping[accepted] / 10
+            damping[idx[~improved]] = damping[idx[~improved]] * 10
+
+            done = small_chi_change | small_step
+            converged[idx[done]] = True
+            active[idx[done]] = False
+            active[idx[damping[idx] > 1e16]] = False # no step in any direction lowers the chi squared, and the step size wasn't small enough to count as converged
+
+        # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+        # the covariance matrix at the best fit parameters, from the SVD of the Jacobian in the same way as curve_fit (which drops the singular values that are too small to be trusted)
+        _, s, VT = np.linalg.svd(np.where(np.isfinite(jacobian), jacobian, 0.0), full_matrices = False)
+        threshold = np.finfo(float).eps * max(jacobian.shape[1:]) * s[:, [0]]
+        s_inv_sq = np.where(s > threshold, 1 / s**2, 0.0)
+        pcov = np.einsum('eji,ej,ejk->eik', VT, s_inv_sq, VT)
+        pcov[np.any(np.isnan(pcov), axis = (1, 2))] = np.inf # curve_fit sets the covariance to inf when it can't be estimated
+
+    return params, pcov, converged, nfev
+
+
+
 #=================================================================================================================================================================
 #=================================================================================================================================================================
 #=================================================================================================================================================================
@@ -2184,13 +3642,244 @@ def power_law_SED(lam, A, gamma):
 
 
 
+class SED_fit_cache:
+    """
+    An on-disk cache of the SED fit results at each epoch, stored in a single SQLite file so it can be shared between runs (e.g. fitting the same interp_df with the
+    single_BB, double_BB and power_law SEDs, then re-running to re-plot or compare them). Each entry is a pickled dict holding one MJD's row of BB_fit_results and its
+    sampled parameters, stored under a key made by fit_SED_across_lightcurve.epoch_fit_cache_key() from the epoch's data and every setting which affects the fit.
+    A cached fit is only reused when its inputs are unchanged, so the only epochs that are refit are the ones whose data or fit settings changed.
+
+    The database is opened for each load()/save() rather than held open, so the class can still be copied into the worker processes by run_BB_fit()
+    (the workers never read or write the cache themselves).
+
+    INPUTS
+    ---------------
+    db_path: (str) the path of the SQLite file. It is created if it doesn't exist yet
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_folder = os.path.dirname(db_path)
+        if db_folder != '':
+            os.makedirs(db_folder, exist_ok = True)
+
+        with closing(sqlite3.connect(self.db_path)) as connection, connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS epoch_fits (key TEXT PRIMARY KEY, result BLOB)')
+
+
+
+
+    def load(self, keys):
+        """
+        Returns a dict of {key: cached result} for the keys in the list keys which are in the cache. Keys which aren't in the cache are left out
+        """
+        keys = [key for key in keys if key is not None]
+        cached = {}
+        with closing(sqlite3.connect(self.db_path)) as connection:
+            for i in range(0, len(keys), 500): # SQLite limits the number of parameters in one query
+                key_chunk = keys[i : i + 500]
+                rows = connection.execute(f"SELECT key, result FROM epoch_fits WHERE key IN ({', '.join(['?']*len(key_chunk))})", key_chunk).fetchall()
+                cached.update({key: pickle.loads(result) for key, result in rows})
+
+        return cached
+
+
+
+
+    def save(self, results):
+        """
+        Writes a dict of {key: result} to the cache in a single transaction, overwriting any results already stored under the same keys
+        """
+        if len(results) == 0:
+            return
+
+        with closing(sqlite3.connect(self.db_path)) as connection, connection:
+            connection.executemany('INSERT OR REPLACE INTO epoch_fits (key, result) VALUES (?, ?)',
+                                   [(key, pickle.dumps(result, protocol = pickle.HIGHEST_PROTOCOL)) for key, result in results.items()])
+
+
+
+
+
+
+class sampled_params_store:
+    """
+    A preallocated, columnar store for the model parameters sampled by the brute force SED fits, which is much faster to fill than writing each sample into the 
+    BB_fit_samples DataFrame cell by cell. The columns of sampled_columns which start with 'sampled_' vary from sample to sample, so they are stored as float arrays of shape
+    (no. MJDs, error_sampling_size) and filled one MJD at a time by slice assignment. The rest of the columns (e.g. 'd_since_peak', 'bands', 'brute_chi') are the same for 
+    all samples at an MJD, so they are stored once per MJD. to_dataframe() converts the store to the usual BB_fit_samples DataFrame layout (with a (MJD, sample) MultiIndex), 
+    with NaNs for any MJD which wasn't filled (e.g. when a DBB curve_fit failed). 
+
+    INPUTS
+    ---------------
+    mjd_values: (array) the MJDs which will have sampled parameters
+
+    error_sampling_size: (int) the number of parameter samples taken at each MJD
+
+    sampled_columns: (list) the columns of the BB_fit_samples DataFrame, in order
+    """
+    def __init__(self, mjd_values, error_sampling_size, sampled_columns):
+        self.mjd_values = np.asarray(mjd_values)
+        self.error_sampling_size = error_sampling_size
+        self.sampled_columns = list(sampled_columns)
+        self.epoch_row = {MJD: i for i, MJD in enumerate(self.mjd_values)} # the row of the arrays which holds each MJD's samples
+
+        self.per_sample_columns = [col for col in self.sampled_columns if col.startswith('sampled_')]
+        self.per_epoch_columns = [col for col in self.sampled_columns if not col.startswith('sampled_')]
+        self.samples = {col: np.full((len(self.mjd_values), error_sampling_size), np.nan) for col in self.per_sample_columns}
+        self.epoch_values = {col: np.full(len(self.mjd_values), np.nan, dtype = object) for col in self.per_epoch_columns} # object arrays since 'bands' and 'em_cent_wls' hold lists
+        self.extra_rows = [] # (MJD, sample number, row dict) for any rows beyond the error_sampling_size samples, like double_BB_brute()'s curve_fit fallback row
+
+
+
+
+    def add_epoch(self, MJD, epoch_values, sampled_values):
+        """
+        Fills in the samples for one MJD. epoch_values is a dict of the values which are the same for every sample at this MJD, and sampled_values is a dict of arrays 
+        (each of length error_sampling_size) for the 'sampled_' columns
+        """
+        row = self.epoch_row[MJD]
+        for key, value in epoch_values.items():
+            self.epoch_values[key][row] = value
+        for key, values in sampled_values.items():
+            self.samples[key][row, :] = values
+
+
+
+
+    def add_extra_row(self, MJD, sample, row_dict):
+        """
+        Adds a single row with index (MJD, sample) on top of the error_sampling_size samples at this MJD. row_dict should have a value for each of the sampled_columns
+        """
+        self.extra_rows.append((MJD, sample, row_dict))
+
+
+
+
+    def get_epoch(self, MJD):
+        """
+        Returns everything stored for one MJD as (epoch_values, sampled_values, extra_rows), where epoch_values and sampled_values are dicts in the same form that add_epoch()
+        takes and extra_rows is a list of (sample number, row dict), so the MJD can be put back into a store with add_epoch() and add_extra_row()
+        """
+        row = self.epoch_row[MJD]
+        epoch_values = {col: self.epoch_values[col][row] for col in self.per_epoch_columns}
+        sampled_values = {col: self.samples[col][row, :].copy() for col in self.per_sample_columns}
+        extra_rows = [(sample, row_dict) for extra_MJD, sample, row_dict in self.extra_rows if extra_MJD == MJD]
+
+        return epoch_values, sampled_values, extra_rows
+
+
+
+
+    def subset(self, mjd_subset):
+        """
+        returns a new sampled_params_store which only holds the rows for the MJDs in mjd_subset
+        """
+        rows = np.array([self.epoch_row[MJD] for MJD in mjd_subset], dtype = int)
+        sub_store = sampled_params_store(mjd_subset, self.error_sampling_size, self.sampled_columns)
+        for col in self.per_sample_columns:
+            sub_store.samples[col] = self.samples[col][rows]
+        for col in self.per_epoch_columns:
+            sub_store.epoch_values[col] = self.epoch_values[col][rows]
+        sub_store.extra_rows = [extra_row for extra_row in self.extra_rows if extra_row[0] in sub_store.epoch_row]
+
+        return sub_store
+
+
+
+
+    @staticmethod
+    def concat(stores):
+        """
+        joins a list of sampled_params_stores (which have the same columns and error_sampling_size) together, in the order given
+        """
+        mjd_values = np.concatenate([store.mjd_values for store in stores])
+        joined_store = sampled_params_store(mjd_values, stores[0].error_sampling_size, stores[0].sampled_columns)
+        for col in joined_store.per_sample_columns:
+            joined_store.samples[col] = np.concatenate([store.samples[col] for store in stores], axis = 0)
+        for col in joined_store.per_epoch_columns:
+            joined_store.epoch_values[col] = np.concatenate([store.epoch_values[col] for store in stores])
+        joined_store.extra_rows = [extra_row for store in stores for extra_row in store.extra_rows]
+
+        return joined_store
+
+
+
+
+    def to_dataframe(self):
+        """
+        converts the store to the BB_fit_samples DataFrame layout, with a MultiIndex of (MJD, sample). If there are any extra rows, they are added and the index is sorted
+        """
+        sample_index = pd.MultiIndex.from_product([self.mjd_values, range(self.error_sampling_size)], names = ['MJD', 'sample'])
+        data = {}
+        for col in self.sampled_columns:
+            if col in self.samples:
+                data[col] = self.samples[col].reshape(-1)
+            else:
+                data[col] = np.repeat(self.epoch_values[col], self.error_sampling_size)
+        sample_df = pd.DataFrame(data, index = sample_index, columns = self.sampled_columns)
+
+        if len(self.extra_rows) > 0:
+            extra_index = pd.MultiIndex.from_tuples([(MJD, sample) for MJD, sample, _ in self.extra_rows], names = ['MJD', 'sample'])
+            extra_df = pd.DataFrame([row_dict for _, _, row_dict in self.extra_rows], index = extra_index, columns = self.sampled_columns)
+            sample_df = pd.concat([sample_df, extra_df], axis = 0)
+            sample_df = sample_df.sort_index() # sort the index so that the MJD and sample columns are in order
+
+        return sample_df
+
+
+
+
+
+
+def SED_fit_MJD_chunk(chunk_fitter, seed):
+    """
+    Fits the SED to each of the MJDs held by chunk_fitter (made by fit_SED_across_lightcurve.MJD_chunk_copy()). This is the function which 
+    fit_SED_across_lightcurve.run_BB_fit() sends to each worker process when n_jobs != 1. 
+
+    INPUTS
+    ---------------
+    chunk_fitter: (fit_SED_across_lightcurve) a copy of the SED fitting class which only holds the chunk of MJDs to fit
+
+    seed: (int) the random seed used when sampling the model parameters from the brute force grids
+
+
+    OUTPUTS
+    ---------------
+    BB_fit_results: (DataFrame) the SED fit results for the chunk's MJDs
+
+    sample_store: (sampled_params_store) the sampled model parameters for the chunk's MJDs
+
+    no_failed_curvefits: (int) the number of curve_fits which failed
+
+    curvefit_info: (tuple) the chunk's curvefit_nfev and curvefit_start_type dicts
+    """
+    plt.switch_backend('Agg')
+    np.random.seed(seed)
+    chunk_fitter.no_failed_curvefits = 0
+    chunk_fitter.fit_MJD_epochs(chunk_fitter.mjd_values, progress_bar = False)
+
+    return chunk_fitter.BB_fit_results, chunk_fitter.sample_store, chunk_fitter.no_failed_curvefits, (chunk_fitter.curvefit_nfev, chunk_fitter.curvefit_start_type)
+
+
+
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+##################################################################################################################################################################
+
+
+
+
 class fit_SED_across_lightcurve:
     def __init__(self, interp_df, running_on_server, SED_type, brute_gridsize, DBB_brute_gridsize, error_sampling_size, ant_name, brute_delchi = 2.3, 
                 individual_BB_plot = 'whole_lc', no_indiv_SED_plots = 12, show_plots = True, save_indiv_BB_plot = True, save_param_vs_time_plot = True,
                  plot_chi_contour = False, no_chi_contours = 3, save_SED_fit_file = True,
                 BB_R_min = 1e13, BB_R_max = 1e19, BB_T_min = 1e3, BB_T_max = 5e5,
                 DBB_T1_min = 1e2, DBB_T1_max = 1e4, DBB_T2_min = 1e4, DBB_T2_max = 5e5, DBB_R_min = 1e13, DBB_R_max = 1e19, 
-                PL_A_min = 1e42, PL_A_max = 1e51, PL_gamma_min = -5.0, PL_gamma_max = 0.0):
+                PL_A_min = 1e42, PL_A_max = 1e51, PL_gamma_min = -5.0, PL_gamma_max = 0.0, n_jobs = 1, MJD_tolerance = 1e-6, BB_brute_method = 'grid', 
+                 PL_brute_method = 'grid', DBB_brute_method = 'grid', DBB_refine_levels = 3, DBB_max_cells = 2000000, 
+                 DBB_chi_max_bytes = 256 * 1024**2, curvefit_warm_start = False, analytic_jacobian = False, 
+                 solver = 'curve_fit', batched_lm_starts = 4, SED_fit_cache_path = None, SED_fit_file_format = None, planck_engine = 'numpy'):
         """
         Fits an SED model to each epoch in the provided ANT light curve. 
 
@@ -2246,6 +3935,66 @@ class fit_SED_across_lightcurve:
         DBB_T1_min, DBB_T1_max, DBB_T2_min, DBB_T2_ma, DBB_R_min, DBB_R_max: (each are floats). The parameter space limits for the double BB SED fits
 
         PL_A_min, PL_A_max, PL_gamma_min, PL_gamma_max: (each are floats). The parameter space limits for the power law SED fitting
+
+        n_jobs: (int or None) the number of worker processes to split the MJDs between when fitting each MJD independently (in run_BB_fit()). If 1, the MJDs are fit one after 
+        the other in this process. If None, the number of CPUs is used. The UVOT guided fitting process is always run in this process, since the optical MJDs' fits depend on 
+        the UVOT MJDs' fits. On Windows, the class must be run inside an if __name__ == '__main__': block to use n_jobs != 1
+
+        MJD_tolerance: (float) rows of interp_df whose MJDs are within MJD_tolerance days of each other are treated as the same epoch (and their MJDs are set to the smallest 
+        MJD in the group), so tiny floating point differences between the bands' MJDs don't split an epoch up
+
+        BB_brute_method: (str) options: 'grid', 'planck_table'. How BB_brute() calculates the chi squared grid. If 'grid', the blackbody is evaluated for every wavelength, R and T. 
+        If 'planck_table', the R-independent part of the blackbody is taken from the cached Planck function tables (see planck_table_cache) and the chi squared grid is built from 
+        outer products with R^2, which is much faster for large brute_gridsize and gives the same chi squared values to within floating point rounding. 
+        If 'analytic_R', R is marginalised out analytically (see BB_brute_analytic_R()): chi squared is a quadratic in R^2 for each T, so the best R^2 for each T and the 
+        R^2 range within brute_delchi of the min chi are solved for in closed form. The best fit R is then not restricted to the R grid, and the full 2D chi grid is only built 
+        if we need it to draw the error_sampling_size parameter samples
+
+        PL_brute_method: (str) options: 'grid', 'profiled'. How power_law_brute() fits the power law SED. If 'grid', chi squared is calculated over a 2D grid of A and gamma values. 
+        If 'profiled', A is profiled out analytically (see power_law_brute_profiled()): since L = A * wavelength^gamma is linear in A, the best A and the A range within brute_delchi 
+        of the min chi have closed forms for each gamma, so only gamma is searched, using a coarse gamma grid to bracket the minimum followed by a 1D bounded search
+
+        DBB_brute_method: (str) options: 'grid', 'adaptive'. How double_BB_brute() finds the region of parameter space with chi <= cf_chi + brute_delchi to sample from. If 'grid', the chi 
+        squared is calculated over the full 4D grid with DBB_brute_gridsize values of each parameter, which takes memory ~ DBB_brute_gridsize^4 * no. wavelengths. If 'adaptive', 
+        the parameter space is split into DBB_brute_gridsize cells along each parameter, and only the cells which could contain part of the delta chi region are refined 
+        (see DBB_adaptive_contour()), so much finer DBB grids can be used without building the full 4D grid
+
+        DBB_refine_levels: (int) if DBB_brute_method == 'adaptive', the max number of times to halve the cells along each parameter. The finest cells are 2^DBB_refine_levels times
+        smaller than the starting cells along each parameter
+
+        DBB_max_cells: (int) if DBB_brute_method == 'adaptive', we stop refining if it would give more than this many cells
+
+        DBB_chi_max_bytes: (int) if DBB_brute_method == 'grid', the memory budget for the buffer used to build the DBB chi grid in blocks (see chunked_double_blackbody_chi()). The chi 
+        grid itself still takes 8 * DBB_brute_gridsize^4 bytes
+
+        curvefit_warm_start: (bool) if True, the MJDs are fit in time order and each curve_fit starts from the previous successful curve_fit solution rather than from scipy's default 
+        starting point, falling back on the default starting point if the warm started fit fails (see SED_curve_fit()). Either way, the number of model evaluations that each curve_fit 
+        took is saved in self.curvefit_nfev (a dict with the MJDs as keys)
+
+        analytic_jacobian: (bool) if True, the curve_fits are given the analytic Jacobians of the SED models (blackbody_jacobian, double_blackbody_jacobian, power_law_SED_jacobian)
+        rather than approximating them with finite differences, which saves 2-4 model evaluations per iteration
+
+        solver: (str) 'curve_fit' (default) fits each MJD with its own opt.curve_fit call. 'batched_lm' fits all of the MJDs at once with batched_levenberg_marquardt() (see batched_curvefit()),
+        which fills in the same cf_* columns. The solutions agree with curve_fit's to ~1e-6, but an MJD where the fit is poorly constrained (e.g. only 2 bands for 2 parameters) 
+        can land on a different solution. batched_lm always uses the analytic Jacobians, so analytic_jacobian doesn't affect it, and it can't be used with curvefit_warm_start = True 
+        since the MJDs aren't fit one after the other (this raises a ValueError). This only replaces the curve_fits in run_BB_fit(), the UVOT guided DBB fits still use curve_fit
+
+        batched_lm_starts: (int) if solver == 'batched_lm', the number of starting points each MJD's fit is run from (keeping the one with the lowest chi squared)
+
+        SED_fit_cache_path: (str or None) if not None, the path of an SQLite file (see SED_fit_cache) where each epoch's SED fit results are stored. Before fitting an epoch, run_BB_fit()
+        and the UVOT guided fitting functions look for a cached fit with the same epoch data, SED_type, parameter limits (including any UVOT guided limits), grid sizes, brute_delchi 
+        and fitting method settings, and reuse it instead of refitting, so re-running the same fits (e.g. to re-plot, or to compare SED types) only refits the epochs whose inputs 
+        changed. The number of cache hits and misses is printed at the end of the fitting. If curvefit_warm_start == True, note that the key doesn't include the previous epoch's 
+        curve_fit solution which the fit started from
+
+        SED_fit_file_format: (str or None) the file format to save the SED fit results and sampled parameters in if save_SED_fit_file == True. Options: 'feather', 'parquet', 'csv' or None,
+        which uses feather if pyarrow is installed and csv otherwise (see save_dataframe())
+
+        planck_engine: (str) how the 'grid' brute force chi squared grids are calculated (BB_brute_method == 'grid' and DBB_brute_method == 'grid'). 'numpy' (default) builds the 
+        blackbody luminosities with blackbody()/vectorised_blackbody() and sums up the chi squared from them. 'fused' uses fused_BB_chi()/fused_DBB_chi() from planck_kernel.py, 
+        which only work out the planck function once per (wavelength, T) and sum up the chi squared of every grid point in one pass, without building the arrays of model 
+        luminosities. These are compiled with numba if it's installed, otherwise they fall back on numpy (which still saves memory, but isn't much faster). Both give the same chi
+        squared grids to rounding error
         
 
         """
@@ -2272,6 +4021,39 @@ class fit_SED_across_lightcurve:
         self.no_chi_contours = no_chi_contours
         self.save_SED_fit_file = save_SED_fit_file
         self.plot_chi_contour = plot_chi_contour
+        self.n_jobs = n_jobs
+        self.BB_brute_method = BB_brute_method
+        if self.BB_brute_method not in ['grid', 'planck_table', 'analytic_R']:
+            raise ValueError(f"BB_brute_method must be 'grid', 'planck_table' or 'analytic_R', not '{self.BB_brute_method}'")
+        self.PL_brute_method = PL_brute_method
+        if self.PL_brute_method not in ['grid', 'profiled']:
+            raise ValueError(f"PL_brute_method must be 'grid' or 'profiled', not '{self.PL_brute_method}'")
+        self.DBB_brute_method = DBB_brute_method
+        self.DBB_refine_levels = DBB_refine_levels
+        self.DBB_max_cells = DBB_max_cells
+        self.DBB_chi_max_bytes = DBB_chi_max_bytes
+        self.curvefit_warm_start = curvefit_warm_start
+        self.analytic_jacobian = analytic_jacobian
+        self.solver = solver
+        self.batched_lm_starts = batched_lm_starts
+        if self.solver not in ['curve_fit', 'batched_lm']:
+            raise ValueError(f"solver must be 'curve_fit' or 'batched_lm', not '{self.solver}'")
+        if (self.solver == 'batched_lm') and self.curvefit_warm_start:
+            raise ValueError("curvefit_warm_start = True can't be used with solver = 'batched_lm', since batched_lm fits all of the MJDs at once rather than starting each from the last")
+        self.planck_engine = planck_engine
+        if self.planck_engine not in ['numpy', 'fused']:
+            raise ValueError(f"planck_engine must be 'numpy' or 'fused', not '{self.planck_engine}'")
+        if (self.planck_engine == 'fused') and (not numba_installed):
+            print(f"{Fore.RED}WARNING - numba isn't installed, so planck_engine = 'fused' will use the numpy versions of the fused chi squared kernels {Style.RESET_ALL}")
+        self.SED_fit_cache = SED_fit_cache(SED_fit_cache_path) if SED_fit_cache_path is not None else None
+        self.SED_fit_file_format = check_file_format(SED_fit_file_format)
+        self.SED_fit_cache_hits = 0 # the number of epochs whose fits were loaded from/missing from the SED fit cache in the last fitting run
+        self.SED_fit_cache_misses = 0
+        self.curvefit_p0 = None # the last successful curve_fit solution, used as the starting point of the next curve_fit if curvefit_warm_start == True
+        self.curvefit_nfev = {} # the number of model evaluations each MJD's curve_fit took
+        self.curvefit_start_type = {} # whether each MJD's curve_fit was 'cold', 'warm' or 'cold_after_failed_warm'
+        if self.DBB_brute_method not in ['grid', 'adaptive']:
+            raise ValueError(f"DBB_brute_method must be 'grid' or 'adaptive', not '{self.DBB_brute_method}'")
 
         self.guided_UVOT_SED_fits = False # this is automatically set to true if you call self.run_UVOT_guided_SED_fitting_process() for the ANTs which have UVOT data on the rise/peak (which is what allows us to guide the nearby non-UVOT SED fits)
 
@@ -2284,6 +4066,10 @@ class fit_SED_across_lightcurve:
         self.interp_df['L_rf_err_scaled'] = self.interp_df['L_rf_err'] * self.L_scalefactor
         interp_df['em_cent_wl_cm'] = interp_df['em_cent_wl'] * 1e-8 # the blackbody function takes wavelength in centimeters. 1A = 1e-10 m.     1A = 1e-8 cm
 
+        # group the rows of interp_df into epochs once, so the fits can take each MJD's data straight from the index rather than searching interp_df for it
+        self.MJD_tolerance = MJD_tolerance
+        self.build_epoch_index()
+
         # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
         # define limits on our SED model parameters and the results dataframe (whole columns are dependent on the SED type)
         self.mjd_values = self.interp_df['MJD'].unique()
@@ -2346,9 +4132,11 @@ class fit_SED_across_lightcurve:
 
         self.BB_fit_results = pd.DataFrame(columns = self.columns, index = self.mjd_values)
 
-        sample_index = pd.MultiIndex.from_product([self.mjd_values, range(error_sampling_size)], names = ['MJD', 'sample']) # use a multiindex so you refer to a particular row using .loc[(MJD_value, sample_number)], and refer to all samples for a particular MJD using .loc[MJD_value], allows for easy grouping
-        self.BB_fit_samples = pd.DataFrame(columns = self.sampled_columns, index = sample_index)
-        self.BB_fit_samples.loc[:, :] = np.nan # set all cells to nan to be later overwritten. We do this because when curve_fits fail for the DBB, we won't reach the brute forcing and sampling so the rows associated to the MJD with the failed curve_fit would be empty, so we want these to be filled with NaN values. 
+        # the sampled parameters are filled into a preallocated store as we go, then converted to the BB_fit_samples DataFrame by save_SED_fit_results(). BB_fit_samples uses a multiindex so 
+        # you refer to a particular row using .loc[(MJD_value, sample_number)], and refer to all samples for a particular MJD using .loc[MJD_value]. MJDs which never get sampled (e.g. when 
+        # curve_fits fail for the DBB, we won't reach the brute forcing and sampling) are left as NaN
+        self.sample_store = sampled_params_store(self.mjd_values, error_sampling_size, self.sampled_columns)
+        self.BB_fit_samples = None
 
 
 
@@ -2358,6 +4146,238 @@ class fit_SED_across_lightcurve:
 
 
     
+    def build_epoch_index(self):
+        """
+        Sorts interp_df by MJD once and groups its rows into epochs, where consecutive MJDs within self.MJD_tolerance of each other belong to the same epoch. The MJDs
+        in each epoch are set to the epoch's smallest MJD (if this changes any of the MJDs, interp_df is copied first, so the MJDs of the dataframe you gave the class are
+        left as they were). The epoch's rows are stored as a contiguous block of self.epoch_df and of the packed arrays self.epoch_wl_cm, 
+        self.epoch_wl_A, self.epoch_L_scaled, self.epoch_L_err_scaled and self.epoch_band_code, with self.epoch_slices giving the slice of each MJD's block. 
+        """
+        given_MJDs = self.interp_df['MJD'].to_numpy(dtype = float)
+        MJDs = given_MJDs.copy()
+        sort_idx = np.argsort(MJDs, kind = 'stable') # stable so the rows within an epoch stay in the same order as in interp_df
+        sorted_MJDs = MJDs[sort_idx]
+
+        new_epoch = np.diff(sorted_MJDs) > self.MJD_tolerance # where the next row starts a new epoch
+        epoch_starts = np.concatenate(([0], np.flatnonzero(new_epoch) + 1)) if len(sorted_MJDs) > 0 else np.array([], dtype = int)
+        epoch_ends = np.append(epoch_starts[1:], len(sorted_MJDs)).astype(int)
+        epoch_MJDs = sorted_MJDs[epoch_starts]
+
+        MJDs[sort_idx] = np.repeat(epoch_MJDs, epoch_ends - epoch_starts) # set every row's MJD to its epoch's MJD
+        if not np.array_equal(MJDs, given_MJDs, equal_nan = True):
+            self.interp_df = self.interp_df.copy()
+            self.interp_df['MJD'] = MJDs
+
+        self.epoch_df = self.interp_df.iloc[sort_idx]
+        self.epoch_wl_cm = self.epoch_df['em_cent_wl_cm'].to_numpy(dtype = float)
+        self.epoch_wl_A = self.epoch_df['em_cent_wl'].to_numpy(dtype = float)
+        self.epoch_L_scaled = self.epoch_df['L_rf_scaled'].to_numpy(dtype = float)
+        self.epoch_L_err_scaled = self.epoch_df['L_rf_err_scaled'].to_numpy(dtype = float)
+        self.epoch_band_code, self.epoch_band_names = pd.factorize(self.epoch_df['band']) # self.epoch_band_names[self.epoch_band_code] gives the band of each row
+        self.epoch_slices = {MJD: slice(start, end) for MJD, start, end in zip(epoch_MJDs, epoch_starts, epoch_ends)}
+
+
+
+
+    def get_MJD_df(self, MJD):
+        """
+        Returns the rows of interp_df at this MJD (as a slice of self.epoch_df)
+        """
+        return self.epoch_df.iloc[self.epoch_slices[MJD]]
+
+
+
+
+    def get_epoch_arrays(self, MJD, wavelength_units = 'cm'):
+        """
+        Returns the emitted central wavelengths, scaled rest frame luminosities and scaled rest frame luminosity errors at this MJD, as views into the packed epoch arrays. 
+        wavelength_units can be 'cm' or 'Angstrom'
+        """
+        MJD_slice = self.epoch_slices[MJD]
+        wavelengths = self.epoch_wl_cm[MJD_slice] if wavelength_units == 'cm' else self.epoch_wl_A[MJD_slice]
+
+        return wavelengths, self.epoch_L_scaled[MJD_slice], self.epoch_L_err_scaled[MJD_slice]
+
+
+
+
+    def epoch_fit_cache_key(self, MJD, fit_path, guided_limits = None):
+        """
+        Makes the SED fit cache key for this MJD (see SED_fit_cache) by hashing the epoch's data along with everything else which changes the fit result. Returns None if
+        we aren't using the cache.
+
+        INPUTS
+        ---------------
+        MJD: (float) the MJD being fit
+
+        fit_path: (str) which function is fitting the MJD: 'independent' (run_BB_fit()), 'UVOT' (get_UVOT_MJDs_and_SED_fit_them()) or 'UVOT_guided' (optical_SED_fits_guided_by_UVOT()),
+                  since these fit the same data differently
+
+        guided_limits: (list or None) the parameter limits calculated from the closest UVOT fit, for the UVOT guided fits
+
+
+        OUTPUTS
+        ---------------
+        key: (str or None) the cache key
+        """
+        if self.SED_fit_cache is None:
+            return None
+
+        epoch_data = self.get_MJD_df(MJD)[['band', 'em_cent_wl', 'L_rf', 'L_rf_err', 'd_since_peak']].reset_index(drop = True) # reset the index so the key doesn't depend on where the epoch's rows are in interp_df
+        epoch_data['band'] = epoch_data['band'].astype(str) # so the key is the same whether interp_df was loaded from a csv or from a feather/parquet file (where band is categorical)
+        if guided_limits is not None:
+            guided_limits = [float(lim) for lim in guided_limits] # the limits are np.float64 or float depending on whether the UVOT fit was loaded from the cache, which would change the key
+        fit_settings = {'MJD': MJD, 'fit_path': fit_path, 'guided_limits': guided_limits, 'result_columns': list(self.BB_fit_results.columns)}
+        for setting in ['SED_type', 'curvefit', 'brute', 'brute_gridsize', 'DBB_brute_gridsize', 'error_sampling_size', 'brute_delchi', 'R_scalefactor',
+                        'BB_R_min', 'BB_R_max', 'BB_T_min', 'BB_T_max', 'DBB_T1_min', 'DBB_T1_max', 'DBB_T2_min', 'DBB_T2_max', 'DBB_R_min', 'DBB_R_max',
+                        'PL_A_min', 'PL_A_max', 'PL_gamma_min', 'PL_gamma_max', 'BB_brute_method', 'PL_brute_method', 'DBB_brute_method', 'DBB_refine_levels',
+                        'DBB_max_cells', 'curvefit_warm_start', 'analytic_jacobian', 'solver', 'batched_lm_starts', 'planck_engine']:
+            fit_settings[setting] = getattr(self, setting, None) # the parameter limits of the other SED types aren't set
+        if (fit_path == 'independent') and (self.solver == 'batched_lm'): # these only affect the curve_fits, which batched_lm replaces in run_BB_fit() (the UVOT fits still use curve_fit)
+            fit_settings['curvefit_warm_start'] = None
+            fit_settings['analytic_jacobian'] = None
+
+        return interp_cache_key(epoch_data, fit_settings)
+
+
+
+
+    def load_cached_epoch_fits(self, mjd_values, cache_keys):
+        """
+        Looks up the MJDs' fits in the SED fit cache and writes any which are found into self.BB_fit_results and self.sample_store, counting the hits and misses in
+        self.SED_fit_cache_hits and self.SED_fit_cache_misses.
+
+        INPUTS
+        ---------------
+        mjd_values: (array) the MJDs to look up
+
+        cache_keys: (list) each MJD's key from epoch_fit_cache_key()
+
+
+        OUTPUTS
+        ---------------
+        cached: (array of bools) True for the MJDs which were loaded from the cache, so don't need fitting
+        """
+        cached = np.zeros(len(mjd_values), dtype = bool)
+        if self.SED_fit_cache is None:
+            return cached
+
+        cached_fits = self.SED_fit_cache.load(cache_keys)
+        for i, (MJD, key) in enumerate(zip(mjd_values, cache_keys)):
+            if key not in cached_fits:
+                continue
+
+            cached_fit = cached_fits[key]
+            for col, value in cached_fit['BB_fit_results'].items():
+                self.BB_fit_results.at[MJD, col] = value
+            self.sample_store.add_epoch(MJD, cached_fit['epoch_values'], cached_fit['sampled_values'])
+            for sample, row_dict in cached_fit['extra_rows']:
+                self.sample_store.add_extra_row(MJD, sample, row_dict)
+
+            if cached_fit['failed_curvefit']: # so the failed curve_fit count is the same as if we had refit it
+                self.no_failed_curvefits += 1
+            cached[i] = True
+
+        self.SED_fit_cache_hits += int(np.sum(cached))
+        self.SED_fit_cache_misses += int(np.sum(~cached))
+
+        return cached
+
+
+
+
+    def save_epoch_fits_to_cache(self, mjd_values, cache_keys, curvefit_used):
+        """
+        Writes the MJDs' rows of self.BB_fit_results and their sampled parameters to the SED fit cache, once they've been fit.
+
+        INPUTS
+        ---------------
+        mjd_values: (array) the MJDs which were just fit
+
+        cache_keys: (list) each MJD's key from epoch_fit_cache_key()
+
+        curvefit_used: (bool) whether the fit included a curve_fit, so we can store whether it failed (a failed curve_fit leaves the cf parameter columns as NaN)
+        """
+        if self.SED_fit_cache is None:
+            return
+
+        cf_param_col = {'single_BB': 'cf_T_K', 'double_BB': 'cf_T1_K', 'power_law': 'cf_A'}[self.SED_type]
+        min_bands = 4 if self.SED_type == 'double_BB' else 2 # the fewest bands which get fit
+        results = {}
+        for MJD, key in zip(mjd_values, cache_keys):
+            results_row = self.BB_fit_results.loc[MJD]
+            epoch_values, sampled_values, extra_rows = self.sample_store.get_epoch(MJD)
+            failed_curvefit = bool(curvefit_used and (results_row['no_bands'] >= min_bands) and pd.isna(results_row[cf_param_col]))
+            results[key] = {'BB_fit_results': results_row.to_dict(), 'epoch_values': epoch_values, 'sampled_values': sampled_values, 'extra_rows': extra_rows,
+                            'failed_curvefit': failed_curvefit}
+
+        self.SED_fit_cache.save(results)
+
+
+
+
+    def SED_fit_cache_summary(self):
+        """
+        Returns the cache hits and misses as a string to add to the 'fitting complete' messages, or an empty string if we aren't using the SED fit cache
+        """
+        if self.SED_fit_cache is None:
+            return ''
+
+        return f'  (SED fit cache: {self.SED_fit_cache_hits} hits, {self.SED_fit_cache_misses} misses)'
+
+
+
+
+    def SED_curve_fit(self, MJD, SED_function, wavelengths, L_rfs, L_rf_errs, lower_bounds, upper_bounds, SED_jacobian = None):
+        """
+        Runs opt.curve_fit for the SED model at this MJD and records how many model evaluations it took in self.curvefit_nfev. If self.curvefit_warm_start == True, the 
+        fit starts from the last successful curve_fit solution (self.curvefit_p0, moved inside the bounds if needed) instead of scipy's default starting point, since the SEDs of 
+        neighbouring epochs are very similar. If the warm started fit fails, we try again from the default starting point (a cold start). self.curvefit_start_type records 
+        whether each MJD's fit was 'cold', 'warm' or 'cold_after_failed_warm' (curve_fit doesn't report the number of evaluations of a failed fit, so these aren't included in 
+        self.curvefit_nfev). 
+
+        INPUTS
+        ---------------
+        SED_function: (function) the SED model, e.g. blackbody, double_blackbody or power_law_SED
+
+        wavelengths, L_rfs, L_rf_errs: (arrays) the data at this MJD
+
+        lower_bounds, upper_bounds: (arrays) the bounds on the model parameters
+
+        SED_jacobian: (function or None) the analytic Jacobian of SED_function (e.g. blackbody_jacobian). This is only used if self.analytic_jacobian == True, otherwise curve_fit 
+                      approximates the Jacobian by finite differences
+
+
+        OUTPUTS
+        ---------------
+        popt, pcov: the same as opt.curve_fit. A RuntimeError is raised if the (cold started) fit fails, like opt.curve_fit
+        """
+        jac = SED_jacobian if (self.analytic_jacobian and (SED_jacobian is not None)) else None # None gives curve_fit's default finite difference Jacobian
+        start_type = 'cold'
+        if self.curvefit_warm_start and (self.curvefit_p0 is not None) and (len(self.curvefit_p0) == len(lower_bounds)):
+            p0 = np.clip(self.curvefit_p0, lower_bounds, upper_bounds) # the previous solution might be outside of this fit's bounds (e.g. for the UVOT guided fits)
+            try:
+                popt, pcov, infodict, _, _ = opt.curve_fit(SED_function, xdata = wavelengths, ydata = L_rfs, sigma = L_rf_errs, absolute_sigma = True, p0 = p0, 
+                                                           bounds = (lower_bounds, upper_bounds), jac = jac, full_output = True)
+                start_type = 'warm'
+            except RuntimeError:
+                start_type = 'cold_after_failed_warm'
+
+        if start_type != 'warm':
+            popt, pcov, infodict, _, _ = opt.curve_fit(SED_function, xdata = wavelengths, ydata = L_rfs, sigma = L_rf_errs, absolute_sigma = True, 
+                                                       bounds = (lower_bounds, upper_bounds), jac = jac, full_output = True)
+
+        self.curvefit_p0 = popt
+        self.curvefit_nfev[MJD] = infodict['nfev']
+        self.curvefit_start_type[MJD] = start_type
+
+        return popt, pcov
+
+
+
+
+
+
     def BB_curvefit(self, MJD, MJD_df, R_sc_min, R_sc_max, T_min, T_max):
         """
         INPUTS
@@ -2371,8 +4391,9 @@ class fit_SED_across_lightcurve:
         T_max: the max value of BB temperature to try
         """
         try:
-            popt, pcov = opt.curve_fit(blackbody, xdata = MJD_df['em_cent_wl_cm'], ydata = MJD_df['L_rf_scaled'], sigma = MJD_df['L_rf_err_scaled'], absolute_sigma = True, 
-                                    bounds = (np.array([R_sc_min, T_min]), np.array([R_sc_max, T_max])))
+            wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD) # the emitted central wavelengths (cm), scaled rest frame luminosities and their errors at this MJD value
+            popt, pcov = self.SED_curve_fit(MJD, blackbody, wavelengths, L_rfs, L_rf_errs, lower_bounds = np.array([R_sc_min, T_min]), upper_bounds = np.array([R_sc_max, T_max]), 
+                                            SED_jacobian = blackbody_jacobian)
             sc_cf_R, cf_T = popt
             sc_cf_R_err = np.sqrt(pcov[0, 0])
             cf_T_err = np.sqrt(pcov[1, 1])
@@ -2382,8 +4403,8 @@ class fit_SED_across_lightcurve:
 
             # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
             # calculate the reduced chi squared of the curve_fit result
-            BB_sc_L_chi = [blackbody(wl_cm, sc_cf_R, cf_T) for wl_cm in MJD_df['em_cent_wl_cm']] # evaluating the BB model from curve_fit at the emitted central wavelengths present in our data to use for chi squared calculation
-            cf_red_chi, red_chi_1sig = chisq(y_m = BB_sc_L_chi, y = MJD_df['L_rf_scaled'], yerr = MJD_df['L_rf_err_scaled'], M = 2, reduced_chi = True)
+            BB_sc_L_chi = blackbody(wavelengths, sc_cf_R, cf_T) # evaluating the BB model from curve_fit at the emitted central wavelengths present in our data to use for chi squared calculation
+            cf_red_chi, red_chi_1sig = chisq(y_m = BB_sc_L_chi, y = L_rfs, yerr = L_rf_errs, M = 2, reduced_chi = True)
             cf_chi_sigma_dist = (cf_red_chi - 1)/red_chi_1sig
 
             # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -2417,8 +4438,9 @@ class fit_SED_across_lightcurve:
         """
         try:
             A_scalefactor = self.L_scalefactor # L = A(wavelength)^gamma . If we scale L down by 5, it would scale A down by 5
-            popt, pcov = opt.curve_fit(power_law_SED, xdata = MJD_df['em_cent_wl'], ydata = MJD_df['L_rf_scaled'], sigma = MJD_df['L_rf_err_scaled'], absolute_sigma = True, 
-                                       bounds = (np.array([A_sc_min, gamma_min]), np.array([A_sc_max, gamma_max])))
+            wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD, wavelength_units = 'Angstrom') # the emitted central wavelengths (Angstrom), scaled rest frame luminosities and their errors at this MJD value
+            popt, pcov = self.SED_curve_fit(MJD, power_law_SED, wavelengths, L_rfs, L_rf_errs, lower_bounds = np.array([A_sc_min, gamma_min]), upper_bounds = np.array([A_sc_max, gamma_max]), 
+                                            SED_jacobian = power_law_SED_jacobian)
             cf_A_sc = popt[0]
             cf_A = cf_A_sc/A_scalefactor
             cf_gamma = popt[1]
@@ -2429,8 +4451,8 @@ class fit_SED_across_lightcurve:
 
             # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
             # calculate the reduced chi squared of the curve_fit result
-            PL_sc_L_chi = [power_law_SED(wl_A, cf_A_sc, cf_gamma) for wl_A in MJD_df['em_cent_wl']] # evaluating the power law SED model from curve_fit at the emitted central wavelengths present in our data to use for chi squared calculation
-            cf_red_chi, red_chi_1sig = chisq(y_m = PL_sc_L_chi, y = MJD_df['L_rf_scaled'], yerr = MJD_df['L_rf_err_scaled'], M = 2, reduced_chi = True)
+            PL_sc_L_chi = power_law_SED(wavelengths, cf_A_sc, cf_gamma) # evaluating the power law SED model from curve_fit at the emitted central wavelengths present in our data to use for chi squared calculation
+            cf_red_chi, red_chi_1sig = chisq(y_m = PL_sc_L_chi, y = L_rfs, yerr = L_rf_errs, M = 2, reduced_chi = True)
             cf_chi_sigma_dist = (cf_red_chi - 1)/red_chi_1sig
 
             # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -2470,15 +4492,17 @@ class fit_SED_across_lightcurve:
                             you know the largest and smallest parameter values which fall within this region to get the correct model parameter uncertainties. We use
                             the UVOT guided parameters to restrict the region of parameter space that we allow the final model parameters to be chosen from. 
         """
+        if self.PL_brute_method == 'profiled': # profile A out analytically instead of searching the A grid
+            self.power_law_brute_profiled(MJD, MJD_df, A_min, A_max, gamma_min, gamma_max, UVOT_guided_params = UVOT_guided_params)
+            return
+
         # HERE I AM EXPLORING (grid_scalefactor)^2 TIMES AS MANY VALUES OF A AS OPPOSED TO GAMMA SO THIS IS A RECTANGULAR PARAMETER GRID NOW, BECAUSE I THINK THE A IS STRUGGING TO BE CONSTRAINED MORE THAN GAMMA
         grid_scalefactor = 2
         A_values = np.logspace(np.log10(A_min), np.log10(A_max), int(np.round(self.brute_gridsize*grid_scalefactor, -1)))
         sc_A_values = A_values*self.A_scalefactor
         gamma_values = np.linspace(gamma_min, gamma_max, int(np.round(self.brute_gridsize/grid_scalefactor)))
 
-        wavelengths = MJD_df['em_cent_wl'].to_numpy() # the emitted central wavelengths of the bands present at this MJD value
-        L_rfs = MJD_df['L_rf_scaled'].to_numpy() # the scaled rest frame luminosities of the bands present at this MJD value
-        L_rf_errs = MJD_df['L_rf_err_scaled'].to_numpy() # the scaled rest frame luminosity errors of the bands present at this MJD value
+        wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD, wavelength_units = 'Angstrom') # the emitted central wavelengths, scaled rest frame luminosities and their errors of the bands present at this MJD value
 
         PL_L_sc = power_law_SED(wavelengths[:, np.newaxis, np.newaxis], sc_A_values[np.newaxis, :, np.newaxis], gamma_values[np.newaxis, np.newaxis, :]) # the calculated value of scaled rest frame luminosity using this value of T and scaled R
         
@@ -2549,13 +4573,181 @@ class fit_SED_across_lightcurve:
             A_err_lower = brute_A - np.min(masked_A)
 
 
-            # sample param values from the uncertainty region
+            # sample param values from the uncertainty region
+            if UVOT_guided_params is not None:
+                UVOT_guidance_mask = ((masked_A >= UVOT_A_min) & (masked_A <= UVOT_A_max) & (masked_gamma >= UVOT_gamma_min) & (masked_gamma <= UVOT_gamma_max))
+                masked_chi = masked_chi[UVOT_guidance_mask]
+                masked_A = masked_A[UVOT_guidance_mask]
+                masked_gamma = masked_gamma[UVOT_guidance_mask]
+
+            weights = 1/masked_chi
+            weights /= np.sum(weights)
+
+            sampled_indicies = np.random.choice(len(weights), size = self.error_sampling_size, p = weights, replace = True)
+
+            sampled_A = masked_A[sampled_indicies]
+            sampled_gamma = masked_gamma[sampled_indicies]
+            sampled_chi = masked_chi[sampled_indicies]
+
+
+
+            
+            # -------------------------------------------------------------------------------------------------------------------------------------------------
+            # plotting a contour plot of chi squareds for randomly chosen when desired
+            if self.plot_chi_contour:
+                if MJD in self.contour_MJDs:
+                    self.plot_PL_chi_contour(MJD, A_values, gamma_values, chi, min_chi, brute_A, brute_gamma, brute_gamma_err, A_err_lower, A_err_upper, brute_chi_sigma_dist)
+
+  
+        else:
+            print()
+            print(f"{Fore.RED} WARNING - MULTIPLE R AND T PARAMETER PAIRS GIVE THIS MIN CHI VALUE. MJD = {MJD_df['MJD'].iloc[0]} \n Ts = {[A_values[r] for r in row]}, Rs = {[gamma_values[c] for c in col]}")
+            print(f"Chi values = {chi[row, col]} {Style.RESET_ALL}")
+            print()
+
+        
+        #self.BB_fit_results.at[MJD, 'brute_A'] = brute_A
+        #self.BB_fit_results.at[MJD, 'brute_A_err'] = brute_A_err
+        self.save_power_law_brute_result(MJD, MJD_df, brute_A, A_err_lower, A_err_upper, brute_gamma, brute_gamma_err, brute_red_chi, brute_chi_sigma_dist, min_chi, 
+                                         sampled_A, sampled_gamma, sampled_chi)
+
+
+
+
+    def power_law_brute_profiled(self, MJD, MJD_df, A_min, A_max, gamma_min, gamma_max, UVOT_guided_params = None):
+        """
+        The PL_brute_method = 'profiled' version of power_law_brute(). Since L = A * (wavelength)^gamma is linear in A, the best A for each gamma and the A range within brute_delchi 
+        of the min chi have closed forms (see profiled_power_law_chi()), so we only need to search over gamma. The gamma values from power_law_brute()'s grid are used to bracket
+        the minimum of the profiled chi squared, which is then refined with a bounded 1D search, so the best fit A and gamma aren't restricted to grid values. The edges of the 
+        delta chi region in gamma are found with root finding between the gamma grid values either side of them. The 2D chi grid is only calculated (from the profiled sums, 
+        so without summing over the wavelengths again) if we need to draw error_sampling_size parameter samples from it or plot a chi contour. 
+
+        INPUTS
+        -----------------
+        A_min: the minimum value of A to test
+
+        A_max: the maximum value of A to test
+
+        gamma_min: the minimum value of gamma to test
+
+        gamma_max: the maximum value of gamma to test
+
+        UVOT_guided_params: (list) the same as in power_law_brute(), in the order: A_min, A_max, gamma_min, gamma_max. The best fit params are taken from within these bounds, 
+                            but the uncertainties are calculated over the entire A and gamma range
+
+
+        OUTPUTS
+        -----------------
+        None, the results are added to BB_fit_results and sample_store using save_power_law_brute_result()
+        """
+        grid_scalefactor = 2 # the same A and gamma grids as power_law_brute(). The A grid is only used for sampling and contour plots
+        A_values = np.logspace(np.log10(A_min), np.log10(A_max), int(np.round(self.brute_gridsize*grid_scalefactor, -1)))
+        sc_A_values = A_values*self.A_scalefactor
+        gamma_values = np.linspace(gamma_min, gamma_max, int(np.round(self.brute_gridsize/grid_scalefactor)))
+        sc_A_min = A_min*self.A_scalefactor
+        sc_A_max = A_max*self.A_scalefactor
+
+        wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD, wavelength_units = 'Angstrom') # the emitted central wavelengths, scaled rest frame luminosities and their errors of the bands present at this MJD value
+
+        # the profiled chi for each gamma value, allowing A to take any value within the whole A range. This is what we use for the parameter uncertainties
+        _, chi_full, sum_wLL, sum_wLg, sum_wgg = profiled_power_law_chi(wavelengths, L_rfs, L_rf_errs, gamma_values, sc_A_min, sc_A_max)
+
+        # FIND MIN CHI
+        # if we are doing a UVOT guided approach, then restrict the gamma values and A range to the regions of parameter space that the UVOT fits allow to take the model parameters from
+        if UVOT_guided_params is None:
+            sel_gamma_min, sel_gamma_max = gamma_min, gamma_max
+            sel_sc_A_min, sel_sc_A_max = sc_A_min, sc_A_max
+            gamma_idx = np.arange(len(gamma_values))
+            chi_sel = chi_full
+
+        else:
+            UVOT_A_min, UVOT_A_max, UVOT_gamma_min, UVOT_gamma_max = UVOT_guided_params
+            sel_gamma_min, sel_gamma_max = max(gamma_min, UVOT_gamma_min), min(gamma_max, UVOT_gamma_max)
+            sel_sc_A_min, sel_sc_A_max = max(A_min, UVOT_A_min)*self.A_scalefactor, min(A_max, UVOT_A_max)*self.A_scalefactor
+            gamma_idx = np.where((gamma_values >= UVOT_gamma_min) & (gamma_values <= UVOT_gamma_max))[0]
+            chi_sel = profiled_power_law_chi(wavelengths, L_rfs, L_rf_errs, gamma_values[gamma_idx], sel_sc_A_min, sel_sc_A_max)[1]
+
+        coarse_min_chi = np.min(chi_sel)
+        coarse_idx = np.where(chi_sel == coarse_min_chi)[0]
+        if len(coarse_idx) > 1:
+            print()
+            print(f"{Fore.RED} WARNING - MULTIPLE A AND GAMMA PARAMETER PAIRS GIVE THIS MIN CHI VALUE. MJD = {MJD_df['MJD'].iloc[0]} \n gammas = {list(gamma_values[gamma_idx[coarse_idx]])}")
+            print(f"Chi values = {chi_sel[coarse_idx]} {Style.RESET_ALL}")
+            print()
+
+        # refine gamma with a bounded 1D search between the gamma grid values either side of the coarse minimum
+        c = coarse_idx[0]
+        brute_gamma = gamma_values[gamma_idx[c]]
+        bracket_lower = max(gamma_values[gamma_idx[max(c - 1, 0)]], sel_gamma_min)
+        bracket_upper = min(gamma_values[gamma_idx[min(c + 1, len(gamma_idx) - 1)]], sel_gamma_max)
+        if bracket_lower < bracket_upper:
+            refined = opt.minimize_scalar(lambda gamma: profiled_power_law_chi(wavelengths, L_rfs, L_rf_errs, gamma, sel_sc_A_min, sel_sc_A_max)[1][0], 
+                                          bounds = (bracket_lower, bracket_upper), method = 'bounded', options = {'xatol': 1e-8 * (gamma_max - gamma_min)})
+            if refined.fun < coarse_min_chi: # the bounded search doesn't evaluate the bracket edges, so only take its result if it improves on the grid
+                brute_gamma = refined.x
+
+        sc_A_best, chi_best = profiled_power_law_chi(wavelengths, L_rfs, L_rf_errs, brute_gamma, sel_sc_A_min, sel_sc_A_max)[:2]
+        brute_A = sc_A_best[0] / self.A_scalefactor
+        min_chi = chi_best[0]
+
+        N_M = len(MJD_df['band']) - 2
+        if N_M > 0: # this is for when we try to 'fit' a BB to 2 datapoints, since we have 2 parameters, we can't calculate a reduced chi squared value......
+            brute_red_chi = min_chi / N_M
+            red_chi_1sig = np.sqrt(2/N_M)
+            brute_chi_sigma_dist = (brute_red_chi - 1) / red_chi_1sig
+        else:
+            brute_red_chi = np.nan
+            red_chi_1sig = np.nan
+            brute_chi_sigma_dist = np.nan
+
+
+        # getting the errors on the model parameters. First find the gamma values where the profiled chi is within the delta chi region, 
+        # including the edges of the region which lie between the gamma grid values
+        threshold = min_chi + self.brute_delchi
+        within_threshold = chi_full <= threshold
+        edge_gammas = []
+        for n in np.where(within_threshold[:-1] != within_threshold[1:])[0]:
+            edge_gammas.append(opt.brentq(lambda gamma: profiled_power_law_chi(wavelengths, L_rfs, L_rf_errs, gamma, sc_A_min, sc_A_max)[1][0] - threshold, 
+                                          gamma_values[n], gamma_values[n + 1]))
+        region_gammas = np.concatenate((gamma_values[within_threshold], edge_gammas, [brute_gamma]))
+
+        # then the A range within the delta chi region at each of these gamma values
+        _, _, _, region_sum_wLg, region_sum_wgg = profiled_power_law_chi(wavelengths, L_rfs, L_rf_errs, region_gammas, sc_A_min, sc_A_max)
+        region_sc_A_opt = region_sum_wLg / region_sum_wgg
+        region_chi_opt = sum_wLL - region_sum_wLg**2 / region_sum_wgg
+        half_width = np.sqrt(np.maximum(threshold - region_chi_opt, 0.0) / region_sum_wgg)
+        region_sc_A_lower = np.maximum(region_sc_A_opt - half_width, sc_A_min)
+        region_sc_A_upper = np.minimum(region_sc_A_opt + half_width, sc_A_max)
+
+        gamma_err_upper = np.max(region_gammas) - brute_gamma
+        gamma_err_lower = brute_gamma - np.min(region_gammas)
+        brute_gamma_err = (gamma_err_lower + gamma_err_upper)/2 # take the mean (this assumes that gamma's lower and upper error are quite close in value)
+
+        A_err_upper = max(np.max(region_sc_A_upper) / self.A_scalefactor, brute_A) - brute_A # getting assymetric errors since chi isn't symmetric in A once we include the variation in gamma
+        A_err_lower = brute_A - min(np.min(region_sc_A_lower) / self.A_scalefactor, brute_A)
+
+
+        # sample param values from the uncertainty region. Only here do we need the 2D chi grid, and only for the gamma values within the delta chi region
+        if self.error_sampling_size > 0:
+            chi = sum_wLL - 2 * np.outer(sc_A_values, sum_wLg[within_threshold]) + np.outer(sc_A_values**2, sum_wgg[within_threshold]) # the chi squared values for each combination of A and gamma
+            mask = (chi <= threshold)
+
+            A_grid, gamma_grid = np.meshgrid(A_values, gamma_values[within_threshold], indexing = 'ij')
+            masked_chi = chi[mask]
+            masked_A = A_grid[mask]
+            masked_gamma = gamma_grid[mask]
+
             if UVOT_guided_params is not None:
                 UVOT_guidance_mask = ((masked_A >= UVOT_A_min) & (masked_A <= UVOT_A_max) & (masked_gamma >= UVOT_gamma_min) & (masked_gamma <= UVOT_gamma_max))
                 masked_chi = masked_chi[UVOT_guidance_mask]
                 masked_A = masked_A[UVOT_guidance_mask]
                 masked_gamma = masked_gamma[UVOT_guidance_mask]
 
+            # the best fit doesn't have to lie on the grid, so add it in so that there is always at least one parameter combination to sample from
+            masked_chi = np.append(masked_chi, min_chi)
+            masked_A = np.append(masked_A, brute_A)
+            masked_gamma = np.append(masked_gamma, brute_gamma)
+
             weights = 1/masked_chi
             weights /= np.sum(weights)
 
@@ -2564,42 +4756,57 @@ class fit_SED_across_lightcurve:
             sampled_A = masked_A[sampled_indicies]
             sampled_gamma = masked_gamma[sampled_indicies]
             sampled_chi = masked_chi[sampled_indicies]
+        else:
+            sampled_A = sampled_gamma = sampled_chi = np.array([])
 
 
+        # -------------------------------------------------------------------------------------------------------------------------------------------------
+        # plotting a contour plot of chi squareds for randomly chosen when desired
+        if self.plot_chi_contour:
+            if MJD in self.contour_MJDs:
+                chi = sum_wLL - 2 * np.outer(sc_A_values, sum_wLg) + np.outer(sc_A_values**2, sum_wgg)
+                self.plot_PL_chi_contour(MJD, A_values, gamma_values, chi, min_chi, brute_A, brute_gamma, brute_gamma_err, A_err_lower, A_err_upper, brute_chi_sigma_dist)
 
-            
-            # -------------------------------------------------------------------------------------------------------------------------------------------------
-            # plotting a contour plot of chi squareds for randomly chosen when desired
-            if self.plot_chi_contour:
-                if MJD in self.contour_MJDs:
-                    fig, ax = plt.subplots(figsize = (16, 7.2))
-                    A_grid, gamma_grid = np.meshgrid(A_values, gamma_values)
-                    chi_cutoff = 2.3
-                    masked_chi = np.ma.masked_where((chi > (min_chi + chi_cutoff)), chi)
-                    sc = ax.pcolormesh(A_grid, gamma_grid, masked_chi.T, cmap = 'jet', zorder = 2)
-                    high_chi_mask = np.where((chi > (min_chi + chi_cutoff)), 100, np.nan)
-                    ax.pcolormesh(A_grid, gamma_grid, high_chi_mask.T, color = 'k', zorder = 1)
-
-                    fig.colorbar(sc, ax = ax, label = r'$\mathbf{\chi^2}$')
-                    ax.errorbar(brute_A, brute_gamma, yerr = brute_gamma_err, xerr = ([A_err_lower], [A_err_upper]), markersize = 15, fmt = '*', mec = 'k', mew = '0.5', color = 'white', zorder = 3)
-                    ax.set_xlabel('A', fontweight = 'bold')
-                    ax.set_ylabel(f'$\mathbf{{\gamma}}$', fontweight = 'bold')
-                    ax.set_xlim(((brute_A/50), (brute_A*50)))
-                    ax.set_ylim(((brute_gamma - brute_gamma_err*2), (brute_gamma + brute_gamma_err*2)))
-                    ax.set_xscale('log')
-                    ax.set_title(f'{self.ant_name},    MJD = {MJD:.1f}, \n'+ fr"$ \mathbf{{ A = {brute_A:.1e}^{{+{A_err_upper:.1e}}}_{{-{A_err_lower:.1e}}} }}$    "+ fr'$\mathbf{{  \gamma = {brute_gamma:.1f} \pm {brute_gamma_err:.1f}  }}$' + r'    $\mathbf{\chi}$ sig dist'+ f' = {brute_chi_sigma_dist:.2e}', fontweight = 'bold') 
-                    plt.show() #                                            fr"$ \mathbf{{ A = {brute_A:.1e}^{{+{A_err_upper:.1e}}}_{{-{A_err_lower:.1e}}} }}$"
 
-  
-        else:
-            print()
-            print(f"{Fore.RED} WARNING - MULTIPLE R AND T PARAMETER PAIRS GIVE THIS MIN CHI VALUE. MJD = {MJD_df['MJD'].iloc[0]} \n Ts = {[A_values[r] for r in row]}, Rs = {[gamma_values[c] for c in col]}")
-            print(f"Chi values = {chi[row, col]} {Style.RESET_ALL}")
-            print()
+        self.save_power_law_brute_result(MJD, MJD_df, brute_A, A_err_lower, A_err_upper, brute_gamma, brute_gamma_err, brute_red_chi, brute_chi_sigma_dist, min_chi, 
+                                         sampled_A, sampled_gamma, sampled_chi)
 
-        
-        #self.BB_fit_results.at[MJD, 'brute_A'] = brute_A
-        #self.BB_fit_results.at[MJD, 'brute_A_err'] = brute_A_err
+
+
+
+    def plot_PL_chi_contour(self, MJD, A_values, gamma_values, chi, min_chi, brute_A, brute_gamma, brute_gamma_err, A_err_lower, A_err_upper, brute_chi_sigma_dist):
+        """
+        plots the chi squared contour of a power law brute force fit over the grid of (UNSCALED) A_values and gamma_values, where chi has shape (len(A_values), len(gamma_values)). 
+        This is called by power_law_brute() and power_law_brute_profiled() for the MJDs in self.contour_MJDs when plot_chi_contour == True
+        """
+        fig, ax = plt.subplots(figsize = (16, 7.2))
+        A_grid, gamma_grid = np.meshgrid(A_values, gamma_values)
+        chi_cutoff = 2.3
+        masked_chi = np.ma.masked_where((chi > (min_chi + chi_cutoff)), chi)
+        sc = ax.pcolormesh(A_grid, gamma_grid, masked_chi.T, cmap = 'jet', zorder = 2)
+        high_chi_mask = np.where((chi > (min_chi + chi_cutoff)), 100, np.nan)
+        ax.pcolormesh(A_grid, gamma_grid, high_chi_mask.T, color = 'k', zorder = 1)
+
+        fig.colorbar(sc, ax = ax, label = r'$\mathbf{\chi^2}$')
+        ax.errorbar(brute_A, brute_gamma, yerr = brute_gamma_err, xerr = ([A_err_lower], [A_err_upper]), markersize = 15, fmt = '*', mec = 'k', mew = '0.5', color = 'white', zorder = 3)
+        ax.set_xlabel('A', fontweight = 'bold')
+        ax.set_ylabel(f'$\mathbf{{\gamma}}$', fontweight = 'bold')
+        ax.set_xlim(((brute_A/50), (brute_A*50)))
+        ax.set_ylim(((brute_gamma - brute_gamma_err*2), (brute_gamma + brute_gamma_err*2)))
+        ax.set_xscale('log')
+        ax.set_title(f'{self.ant_name},    MJD = {MJD:.1f}, \n'+ fr"$ \mathbf{{ A = {brute_A:.1e}^{{+{A_err_upper:.1e}}}_{{-{A_err_lower:.1e}}} }}$    "+ fr'$\mathbf{{  \gamma = {brute_gamma:.1f} \pm {brute_gamma_err:.1f}  }}$' + r'    $\mathbf{\chi}$ sig dist'+ f' = {brute_chi_sigma_dist:.2e}', fontweight = 'bold') 
+        plt.show() #                                            fr"$ \mathbf{{ A = {brute_A:.1e}^{{+{A_err_upper:.1e}}}_{{-{A_err_lower:.1e}}} }}$"
+
+
+
+
+
+    def save_power_law_brute_result(self, MJD, MJD_df, brute_A, A_err_lower, A_err_upper, brute_gamma, brute_gamma_err, brute_red_chi, brute_chi_sigma_dist, min_chi, 
+                                    sampled_A, sampled_gamma, sampled_chi):
+        """
+        Writes the results of a brute force power law fit (from power_law_brute() or power_law_brute_profiled()) into the BB_fit_results row at this MJD and the sampled 
+        parameters into sample_store. sampled_A should be UNSCALED, and sampled_A, sampled_gamma and sampled_chi should each have length error_sampling_size
+        """
         self.BB_fit_results.loc[MJD, self.columns[10:18]] = [brute_A, A_err_lower, A_err_upper, brute_gamma, brute_gamma_err, brute_red_chi, brute_chi_sigma_dist, min_chi] 
 
         # save the sampled parameters to the dataframe
@@ -2611,20 +4818,18 @@ class fit_SED_across_lightcurve:
         MJD_no_bands = len( MJD_bands ) # the number of bands (and therefore datapoints) we have available at this MJD for the BB fit
         MJD_em_cent_wls = list(MJD_df['em_cent_wl'].unique())
 
-        for i in range(self.error_sampling_size):
-            sample_row_dict = {'d_since_peak': MJD_d_since_peak, 
-                               'no_bands': MJD_no_bands, 
-                               'bands': MJD_bands, 
-                               'em_cent_wls': MJD_em_cent_wls, 
-                               'brute_red_chi': brute_red_chi, 
-                               'brute_chi_sigma_dist': brute_chi_sigma_dist, 
-                               'brute_chi': min_chi, 
-                               'sampled_A': sampled_A[i], 
-                               'sampled_gamma': sampled_gamma[i], 
-                               'sampled_chi': sampled_chi[i]}
-            
-            for key, value in sample_row_dict.items():
-                self.BB_fit_samples.at[(MJD, i), key] = value
+        self.sample_store.add_epoch(MJD, 
+                                    epoch_values = {'d_since_peak': MJD_d_since_peak, 
+                                                    'no_bands': MJD_no_bands, 
+                                                    'bands': MJD_bands, 
+                                                    'em_cent_wls': MJD_em_cent_wls, 
+                                                    'brute_red_chi': brute_red_chi, 
+                                                    'brute_chi_sigma_dist': brute_chi_sigma_dist, 
+                                                    'brute_chi': min_chi}, 
+                                    sampled_values = {'sampled_A': sampled_A, 
+                                                      'sampled_gamma': sampled_gamma, 
+                                                      'sampled_chi': sampled_chi})
+
 
 
 
@@ -2653,16 +4858,33 @@ class fit_SED_across_lightcurve:
         T_values = np.logspace(np.log10(T_min), np.log10(T_max), self.brute_gridsize)
         #R_values = sc_R_values / self.R_scalefactor # use this to return the grid of parameter values tried
 
-        wavelengths = MJD_df['em_cent_wl_cm'].to_numpy() # the emitted central wavelengths of the bands present at this MJD value
-        L_rfs = MJD_df['L_rf_scaled'].to_numpy() # the scaled rest frame luminosities of the bands present at this MJD value
-        L_rf_errs = MJD_df['L_rf_err_scaled'].to_numpy() # the scaled rest frame luminosity errors of the bands present at this MJD value
+        if self.BB_brute_method == 'analytic_R': # solve for R in closed form instead of searching the R grid
+            self.BB_brute_analytic_R(MJD, MJD_df, sc_R_values, T_values, UVOT_guided_params = UVOT_guided_params)
+            return
+
+        wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD) # the emitted central wavelengths (cm), scaled rest frame luminosities and their errors of the bands present at this MJD value
+
+        if self.BB_brute_method == 'planck_table':
+            # since the blackbody luminosity = R^2 * f(wavelength, T), chi = sum(w * (L - R^2 * f)^2) = sum(w * L^2) - 2 * R^2 * sum(w * L * f) + R^4 * sum(w * f^2) where w = 1/L_err^2, 
+            # so we only need to sum over the bands for each T, then take outer products with R^2 and R^4. f(wavelength, T) comes from the cached Planck tables
+            planck_table = planck_cache.get_table(wavelengths, T_values) # shape (len(wavelengths), len(T_values))
+            weights = 1 / L_rf_errs**2
+            sum_wLL = np.sum(weights * L_rfs**2)
+            sum_wLf = np.sum((weights * L_rfs)[:, np.newaxis] * planck_table, axis = 0) # shape (len(T_values), )
+            sum_wff = np.sum(weights[:, np.newaxis] * planck_table**2, axis = 0) # shape (len(T_values), )
+            sc_R_sq = sc_R_values**2
+            chi = sum_wLL - 2 * np.outer(sc_R_sq, sum_wLf) + np.outer(sc_R_sq**2, sum_wff) # the chi squared values for each combination of R and T
+        
+        elif self.planck_engine == 'fused': # the same chi squared grid as below, without building the 3D array of blackbody luminosities
+            chi = fused_BB_chi(wavelengths, L_rfs, L_rf_errs, R = sc_R_values, T = T_values) # the chi squared values for each combination of R and T
 
-        # create a 3D array of the blackbody luminosities for each combination of R and T. This is done by broadcasting the 1D arrays of wavelengths, R values and T values
-        # the 3D array will have dimensions (len(wavelengths), len(R_values), len(T_values)) and will contain the blackbody luminosities for each combination of R and T for each wavelength value
-        BB_L_sc = blackbody(wavelengths[:, np.newaxis, np.newaxis], sc_R_values[np.newaxis, :, np.newaxis], T_values[np.newaxis, np.newaxis, :]) # the calculated value of scaled rest frame luminosity using this value of T and scaled R
+        else:
+            # create a 3D array of the blackbody luminosities for each combination of R and T. This is done by broadcasting the 1D arrays of wavelengths, R values and T values
+            # the 3D array will have dimensions (len(wavelengths), len(R_values), len(T_values)) and will contain the blackbody luminosities for each combination of R and T for each wavelength value
+            BB_L_sc = blackbody(wavelengths[:, np.newaxis, np.newaxis], sc_R_values[np.newaxis, :, np.newaxis], T_values[np.newaxis, np.newaxis, :]) # the calculated value of scaled rest frame luminosity using this value of T and scaled R
 
-        # calculate the chi squared of the fit
-        chi = np.sum((L_rfs[:, np.newaxis, np.newaxis] - BB_L_sc)**2 / L_rf_errs[:, np.newaxis, np.newaxis]**2, axis = 0) # the chi squared values for each combination of R and T
+            # calculate the chi squared of the fit
+            chi = np.sum((L_rfs[:, np.newaxis, np.newaxis] - BB_L_sc)**2 / L_rf_errs[:, np.newaxis, np.newaxis]**2, axis = 0) # the chi squared values for each combination of R and T
         
         # FIND MIN CHI 
         # if we are doing a UVOT guided approach, then restrict the chi grid to the regions of parameter space that the UVOT fits allow to take the model parameters from, 
@@ -2752,6 +4974,168 @@ class fit_SED_across_lightcurve:
 
 
         # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+        # add the result to the results row and the sampled params to the sampled params df
+        self.save_BB_brute_result(MJD, MJD_df, red_chi_1sig, brute_T, brute_T_err_lower, brute_T_err_upper, brute_R, brute_R_err_lower, brute_R_err_upper, brute_red_chi, 
+                                  brute_chi_sigma_dist, min_chi, sampled_T, sampled_R, sampled_chi)
+
+
+
+
+
+
+
+
+    def BB_brute_analytic_R(self, MJD, MJD_df, sc_R_values, T_values, UVOT_guided_params = None):
+        """
+        The BB_brute_method = 'analytic_R' version of BB_brute(). Since the blackbody luminosity = R^2 * f(wavelength, T), for each T the chi squared is a quadratic in R^2:
+
+        chi(R, T) = A - 2 * R^2 * B(T) + R^4 * D(T),    where A = sum(w * L^2), B(T) = sum(w * L * f), D(T) = sum(w * f^2) and w = 1/L_err^2
+
+        so for each T the best R^2 is B/D (clipped to the R range we are allowed to take) with chi = A - B^2/D, and the R^2 values with chi <= min_chi + brute_delchi are 
+        B/D +/- sqrt((min_chi + brute_delchi - A + B^2/D) / D). This means that we only need to search over T, the best fit R isn't restricted to the R grid values, and the 
+        model parameter uncertainties come from these closed form bounds rather than from the full 2D chi grid. The 2D chi grid is only built if we need to draw error_sampling_size
+        parameter samples from it. 
+
+        INPUTS
+        ---------------
+        sc_R_values: (array) the grid of SCALED BB radii, made in BB_brute(). Only its endpoints are used to set the allowed R range, unless we are drawing parameter samples
+
+        T_values: (array) the grid of BB temperatures to try, made in BB_brute()
+
+        UVOT_guided_params: (list) the same as in BB_brute(), in the order: R_sc_min, R_sc_max, T_min, T_max. The best fit params are taken from within these bounds, 
+                            but the uncertainties are calculated over the entire R and T range
+
+
+        OUTPUTS
+        ---------------
+        None, the results are added to BB_fit_results and sample_store using save_BB_brute_result()
+        """
+        wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD) # the emitted central wavelengths (cm), scaled rest frame luminosities and their errors of the bands present at this MJD value
+
+        planck_table = planck_cache.get_table(wavelengths, T_values) # shape (len(wavelengths), len(T_values))
+        weights = 1 / L_rf_errs**2
+        sum_wLL = np.sum(weights * L_rfs**2) # A
+        sum_wLf = np.sum((weights * L_rfs)[:, np.newaxis] * planck_table, axis = 0) # B(T), shape (len(T_values), )
+        sum_wff = np.sum(weights[:, np.newaxis] * planck_table**2, axis = 0) # D(T), shape (len(T_values), )
+
+        # the unconstrained best R^2 and its chi for each T. If D = 0 (f underflows to 0 at every wavelength), the model is 0 for all R so chi = A
+        D_positive = sum_wff > 0
+        safe_sum_wff = np.where(D_positive, sum_wff, 1.0)
+        R_sq_opt = np.where(D_positive, sum_wLf / safe_sum_wff, 0.0)
+        chi_opt = np.where(D_positive, sum_wLL - sum_wLf**2 / safe_sum_wff, sum_wLL)
+
+        R_sq_min = sc_R_values[0]**2 # the range of R^2 that we are trialing
+        R_sq_max = sc_R_values[-1]**2
+
+        # FIND MIN CHI
+        # if we are doing a UVOT guided approach, then restrict the T values and R^2 range to the regions of parameter space that the UVOT fits allow to take the model parameters from, 
+        # then calculate the model parameter uncertainties using the entire R and T range
+        if UVOT_guided_params is None: # if you're not doing UVOT guided fitting
+            T_idx = np.arange(len(T_values))
+            sel_R_sq_min, sel_R_sq_max = R_sq_min, R_sq_max
+
+        else: # if you DO want UVOT-guided fitting
+            UVOT_R_sc_min, UVOT_R_sc_max, UVOT_T_min, UVOT_T_max = UVOT_guided_params
+            T_idx = np.where((T_values >= UVOT_T_min) & (T_values <= UVOT_T_max))[0]
+            sel_R_sq_min = max(R_sq_min, UVOT_R_sc_min**2)
+            sel_R_sq_max = min(R_sq_max, UVOT_R_sc_max**2)
+
+        R_sq_best = np.clip(R_sq_opt[T_idx], sel_R_sq_min, sel_R_sq_max) # the best allowed R^2 for each allowed T, since chi is a parabola in R^2 the clipped value is the constrained minimum
+        chi_best = sum_wLL - 2 * R_sq_best * sum_wLf[T_idx] + R_sq_best**2 * sum_wff[T_idx]
+        min_chi = np.min(chi_best) # the minimum chi squared value
+        best_idx = np.where(chi_best == min_chi)[0]
+
+        if len(best_idx) > 1:
+            print()
+            print(f"{Fore.RED} WARNING - MULTIPLE R AND T PARAMETER PAIRS GIVE THIS MIN CHI VALUE. MJD = {MJD_df['MJD'].iloc[0]} \n Ts = {list(T_values[T_idx[best_idx]])}, Rs = {list(np.sqrt(R_sq_best[best_idx]) / self.R_scalefactor)}")
+            print(f"Chi values = {chi_best[best_idx]} {Style.RESET_ALL}")
+            print()
+
+        b = best_idx[0]
+        brute_T = T_values[T_idx[b]] # the parameters which give the minimum chi squared
+        brute_sc_R = np.sqrt(R_sq_best[b])
+        brute_R = brute_sc_R / self.R_scalefactor
+
+        N_M = len(MJD_df['band']) - 2
+        if N_M > 0: # this is for when we try to 'fit' a BB to 2 datapoints, since we have 2 parameters, we can't calculate a reduced chi squared value......
+            brute_red_chi = min_chi / N_M
+            red_chi_1sig = np.sqrt(2/N_M)
+            brute_chi_sigma_dist = (brute_red_chi - 1) / red_chi_1sig
+        else:
+            brute_red_chi = np.nan
+            red_chi_1sig = np.nan
+            brute_chi_sigma_dist = np.nan
+
+
+        # calculate uncertainties on model params from the analytic R^2 bounds of the delta chi region at each T
+        threshold = min_chi + self.brute_delchi
+        half_width = np.sqrt(np.maximum(threshold - chi_opt, 0.0) / safe_sum_wff) # the half width of the delta chi region in R^2 at each T
+        R_sq_lower = np.maximum(R_sq_opt - half_width, R_sq_min)
+        R_sq_upper = np.minimum(R_sq_opt + half_width, R_sq_max)
+        within_threshold = np.where(D_positive, (chi_opt <= threshold) & (R_sq_lower <= R_sq_upper), sum_wLL <= threshold) # the T values which have some R within the delta chi region
+        R_sq_lower = np.where(D_positive, R_sq_lower, R_sq_min) # if D = 0 then every R has the same chi
+        R_sq_upper = np.where(D_positive, R_sq_upper, R_sq_max)
+        within_threshold[T_idx[b]] = True # the best fit always lies within the delta chi region, even when floating point rounding says otherwise
+
+        brute_R_err_upper = max(np.sqrt(np.max(R_sq_upper[within_threshold])), brute_sc_R) / self.R_scalefactor - brute_R
+        brute_R_err_lower = brute_R - min(np.sqrt(np.min(R_sq_lower[within_threshold])), brute_sc_R) / self.R_scalefactor
+        brute_T_err_upper = np.max(T_values[within_threshold]) - brute_T
+        brute_T_err_lower = brute_T - np.min(T_values[within_threshold])
+
+
+        # sample values from the uncertainty region. Only here do we need the full chi grid, and only for the T values which have some R within the delta chi region
+        if self.error_sampling_size > 0:
+            sampling_T_idx = np.where(within_threshold)[0]
+            sc_R_sq = sc_R_values**2
+            chi = sum_wLL - 2 * np.outer(sc_R_sq, sum_wLf[sampling_T_idx]) + np.outer(sc_R_sq**2, sum_wff[sampling_T_idx]) # the chi squared values for each combination of R and T
+            mask = chi <= threshold
+
+            R_sc_grid, T_grid = np.meshgrid(sc_R_values, T_values[sampling_T_idx], indexing = 'ij')
+            masked_chi = chi[mask]
+            masked_R_sc = R_sc_grid[mask]
+            masked_T = T_grid[mask]
+
+            if UVOT_guided_params is not None: # if we want UVOT-guided fitting, we must only sample values from within the UVOT-guided bounds
+                UVOT_guidance_mask = ((masked_T <= UVOT_T_max) & (masked_T >= UVOT_T_min) & (masked_R_sc <= UVOT_R_sc_max) & (masked_R_sc >= UVOT_R_sc_min))
+                masked_chi = masked_chi[UVOT_guidance_mask]
+                masked_R_sc = masked_R_sc[UVOT_guidance_mask]
+                masked_T = masked_T[UVOT_guidance_mask]
+
+            # the best fit doesn't have to lie on the grid, so add it in so that there is always at least one parameter combination to sample from
+            masked_chi = np.append(masked_chi, min_chi)
+            masked_R_sc = np.append(masked_R_sc, brute_sc_R)
+            masked_T = np.append(masked_T, brute_T)
+
+            sample_weights = 1/masked_chi
+            sample_weights /= np.sum(sample_weights)
+
+            sampled_indicies = np.random.choice(len(sample_weights), size = self.error_sampling_size, p = sample_weights, replace = True) # sample parameter combinations, where the probability is proportional to 1/chi
+
+            sampled_R = masked_R_sc[sampled_indicies] / self.R_scalefactor
+            sampled_T = masked_T[sampled_indicies]
+            sampled_chi = masked_chi[sampled_indicies]
+        else:
+            sampled_R = sampled_T = sampled_chi = np.array([])
+
+
+        # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+        # add the result to the results row and the sampled params to the sampled params df
+        self.save_BB_brute_result(MJD, MJD_df, red_chi_1sig, brute_T, brute_T_err_lower, brute_T_err_upper, brute_R, brute_R_err_lower, brute_R_err_upper, brute_red_chi, 
+                                  brute_chi_sigma_dist, min_chi, sampled_T, sampled_R, sampled_chi)
+
+
+
+
+
+
+
+
+    def save_BB_brute_result(self, MJD, MJD_df, red_chi_1sig, brute_T, brute_T_err_lower, brute_T_err_upper, brute_R, brute_R_err_lower, brute_R_err_upper, brute_red_chi, 
+                             brute_chi_sigma_dist, min_chi, sampled_T, sampled_R, sampled_chi):
+        """
+        Writes the results of a brute force single BB fit (from BB_brute() or BB_brute_analytic_R()) into the BB_fit_results row at this MJD and the sampled parameters into sample_store. 
+        sampled_R should be the UNSCALED sampled radii (cm), sampled_T the sampled temperatures (K) and sampled_chi their chi squared values, each of length error_sampling_size
+        """
         # add the result to the results row which will be appended to the results dataframe
         self.BB_fit_results.loc[MJD, self.columns[10:20]] = [red_chi_1sig,    brute_T,     brute_T_err_lower,     brute_T_err_upper,     brute_R,     brute_R_err_lower,      brute_R_err_upper,     brute_red_chi,    brute_chi_sigma_dist, min_chi]
         #                                                   'red_chi_1sig', 'brute_T_K', 'brute_T_err_lower_K', 'brute_T_err_upper_K', 'brute_R_cm', 'brute_R_err_lower_cm', 'brute_R_err_upper_cm', 'brute_red_chi', 'brute_chi_sigma_dist']
@@ -2765,21 +5149,17 @@ class fit_SED_across_lightcurve:
         MJD_no_bands = len( MJD_bands ) # the number of bands (and therefore datapoints) we have available at this MJD for the BB fit
         MJD_em_cent_wls = list(MJD_df['em_cent_wl'].unique())
 
-        for i in range(self.error_sampling_size):
-            sample_row_dict = {'d_since_peak': MJD_d_since_peak, 
-                               'no_bands': MJD_no_bands, 
-                               'bands': MJD_bands, 
-                               'em_cent_wls': MJD_em_cent_wls, 
-                               'brute_red_chi': brute_red_chi, 
-                               'brute_chi_sigma_dist': brute_chi_sigma_dist, 
-                               'brute_chi': min_chi, 
-                               'sampled_T_K': sampled_T[i], 
-                               'sampled_R_cm': sampled_R[i], 
-                               'sampled_chi': sampled_chi[i]}
-
-            for key, value in sample_row_dict.items():
-                self.BB_fit_samples.at[(MJD, i), key] = value
-            
+        self.sample_store.add_epoch(MJD, 
+                                    epoch_values = {'d_since_peak': MJD_d_since_peak, 
+                                                    'no_bands': MJD_no_bands, 
+                                                    'bands': MJD_bands, 
+                                                    'em_cent_wls': MJD_em_cent_wls, 
+                                                    'brute_red_chi': brute_red_chi, 
+                                                    'brute_chi_sigma_dist': brute_chi_sigma_dist, 
+                                                    'brute_chi': min_chi}, 
+                                    sampled_values = {'sampled_T_K': sampled_T, 
+                                                      'sampled_R_cm': sampled_R, 
+                                                      'sampled_chi': sampled_chi})
 
 
 
@@ -2790,8 +5170,10 @@ class fit_SED_across_lightcurve:
 
     def double_BB_curvefit(self, MJD, MJD_df, R1_sc_min, R1_sc_max, T1_min, T1_max, R2_sc_min, R2_sc_max, T2_min, T2_max, return_params = False):
         try:
-            popt, pcov = opt.curve_fit(double_blackbody, xdata = MJD_df['em_cent_wl_cm'], ydata = MJD_df['L_rf_scaled'], sigma = MJD_df['L_rf_err_scaled'], absolute_sigma = True, 
-                                    bounds = (np.array([R1_sc_min, T1_min, R2_sc_min, T2_min]), np.array([R1_sc_max, T1_max, R2_sc_max, T2_max])))
+            wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD) # the emitted central wavelengths (cm), scaled rest frame luminosities and their errors at this MJD value
+            popt, pcov = self.SED_curve_fit(MJD, double_blackbody, wavelengths, L_rfs, L_rf_errs, 
+                                            lower_bounds = np.array([R1_sc_min, T1_min, R2_sc_min, T2_min]), upper_bounds = np.array([R1_sc_max, T1_max, R2_sc_max, T2_max]), 
+                                            SED_jacobian = double_blackbody_jacobian)
                                     #                  (R1_min,   T1_min,   R2_min,  T2_min)           (R1_max,   T1_max,  R2_max,  T2_max)
             
             sc_cf_R1, cf_T1, sc_cf_R2, cf_T2 = popt
@@ -2807,8 +5189,8 @@ class fit_SED_across_lightcurve:
 
             # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
             # calculate the reduced chi squared of the curve_fit result
-            BB_sc_L_chi = [double_blackbody(wl_cm, sc_cf_R1, cf_T1, sc_cf_R2, cf_T2) for wl_cm in MJD_df['em_cent_wl_cm']] # evaluating the BB model from curve_fit at the emitted central wavelengths present in our data to use for chi squared calculation
-            cf_chi, cf_red_chi, red_chi_1sig = chisq(y_m = BB_sc_L_chi, y = MJD_df['L_rf_scaled'], yerr = MJD_df['L_rf_err_scaled'], M = 4, reduced_chi = False, chi_AND_redchi = True)
+            BB_sc_L_chi = double_blackbody(wavelengths, sc_cf_R1, cf_T1, sc_cf_R2, cf_T2) # evaluating the BB model from curve_fit at the emitted central wavelengths present in our data to use for chi squared calculation
+            cf_chi, cf_red_chi, red_chi_1sig = chisq(y_m = BB_sc_L_chi, y = L_rfs, yerr = L_rf_errs, M = 4, reduced_chi = False, chi_AND_redchi = True)
             cf_chi_sigma_dist = (cf_red_chi - 1)/red_chi_1sig
 
             # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -2869,128 +5251,134 @@ class fit_SED_across_lightcurve:
         MJD_no_bands = len( MJD_bands ) # the number of bands (and therefore datapoints) we have available at this MJD for the BB fit
         MJD_em_cent_wls = list(MJD_df['em_cent_wl'].unique())
 
-        # creating the values of R and T that we will try
-        # the number of R and T values to trial in the grid. The combinations of R and T form a 2D grid, so the number of R and T values that we try give the side lengths of the grid
-        sc_R1_values = np.logspace(np.log10(R1_sc_min), np.log10(R1_sc_max), self.DBB_brute_gridsize)
-        T1_values = np.logspace(np.log10(T1_min), np.log10(T1_max), self.DBB_brute_gridsize)
+        # if we don't have any values within the delchi = 2.3 region, we just save the actual curve_fit params alongside the samples and go with that
+        cf_sampled_row_dict = {'d_since_peak': MJD_d_since_peak, 
+                               'no_bands': MJD_no_bands, 
+                               'bands': MJD_bands, 
+                               'em_cent_wls': MJD_em_cent_wls, 
+                               'cf_red_chi': cf_red_chi, #brute_red_chi, 
+                               'cf_chi_sigma_dist': cf_chi_sigma_dist, #brute_chi_sigma_dist, 
+                               'cf_chi': cf_chi, #min_chi, 
+                               'sampled_T1_K': cf_T1, 
+                               'sampled_R1_cm': cf_R1, 
+                               'sampled_T2_K': cf_T2, 
+                               'sampled_R2_cm': cf_R2, 
+                               'sampled_chi': cf_chi}
+
+        if self.DBB_brute_method == 'adaptive': # only refine the grid where the delta chi region can be, rather than building the full 4D chi grid
+            wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD) # the emitted central wavelengths (cm), scaled rest frame luminosities and their errors of the bands present at this MJD value
+            param_bounds = [(R1_sc_min, R1_sc_max), (T1_min, T1_max), (R2_sc_min, R2_sc_max), (T2_min, T2_max)]
+
+            # if there aren't any parameter combinations within the delta_chi = 2.3 region, widen it in the same steps as the 'grid' method
+            for delchi_no, delchi in enumerate([self.brute_delchi, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0]):
+                chi_flat, R1_sc_flat, T1_flat, R2_sc_flat, T2_flat, evaluated_min_chi = self.DBB_adaptive_contour(wavelengths, L_rfs, L_rf_errs, param_bounds, threshold = cf_chi + delchi)
+                if len(chi_flat) > 0:
+                    break
 
-        sc_R2_values = np.logspace(np.log10(R2_sc_min), np.log10(R2_sc_max), self.DBB_brute_gridsize)
-        T2_values = np.logspace(np.log10(T2_min), np.log10(T2_max), self.DBB_brute_gridsize)
+                print()
+                print(f'{Fore.RED} WARNING - No chi values within the delta_chi = {delchi} region for MJD = {MJD}. Min delchi = {evaluated_min_chi - (cf_chi)} {Style.RESET_ALL}')
+                print()
+                if delchi_no == 0:
+                    self.sample_store.add_extra_row(MJD, self.error_sampling_size, cf_sampled_row_dict) # if we don't have any values within the delchi = 2.3, just save the actual curve_fit params and go with that
 
-        wavelengths = MJD_df['em_cent_wl_cm'].to_numpy() # the emitted central wavelengths of the bands present at this MJD value
-        L_rfs = MJD_df['L_rf_scaled'].to_numpy() # the scaled rest frame luminosities of the bands present at this MJD value
-        L_rfs = L_rfs[:, np.newaxis, np.newaxis, np.newaxis, np.newaxis]
-        L_rf_errs = MJD_df['L_rf_err_scaled'].to_numpy() # the scaled rest frame luminosity errors of the bands present at this MJD value
-        L_rf_errs = L_rf_errs[:, np.newaxis, np.newaxis, np.newaxis, np.newaxis]
+        else:
+            # creating the values of R and T that we will try
+            # the number of R and T values to trial in the grid. The combinations of R and T form a 2D grid, so the number of R and T values that we try give the side lengths of the grid
+            sc_R1_values = np.logspace(np.log10(R1_sc_min), np.log10(R1_sc_max), self.DBB_brute_gridsize)
+            T1_values = np.logspace(np.log10(T1_min), np.log10(T1_max), self.DBB_brute_gridsize)
 
-        # create a 5D array of the blackbody luminosities for each combination of R and T. This is done by broadcasting the 1D arrays of wavelengths, R values and T values
-        # the 5D array will have dimensions (len(wavelengths), len(R_values), len(T_values)) and will contain the blackbody luminosities for each combination of R and T for each wavelength value
-        DBB_L_sc = vectorised_double_blackbody(wavelengths, R1 = sc_R1_values, T1 = T1_values, R2 = sc_R2_values, T2 = T2_values) # the calculated value of scaled rest frame luminosity using each combination of T1, sc_R1, T2, sc_R2 for each wavelength. shape = (len(wavelengths), len(sc_R1_values), len(T1_values), len(sc_R2_values), len(T2_values))
-        
-        # calculate the chi squared grid
-        chi = np.sum((L_rfs - DBB_L_sc)**2 / L_rf_errs**2, axis = 0) # the chi squared grid, shape = (len(sc_R1_values), len(T1_values), len(sc_R2_values), len(T2_values))
+            sc_R2_values = np.logspace(np.log10(R2_sc_min), np.log10(R2_sc_max), self.DBB_brute_gridsize)
+            T2_values = np.logspace(np.log10(T2_min), np.log10(T2_max), self.DBB_brute_gridsize)
 
-        R1_sc_grid, T1_grid, R2_sc_grid, T2_grid = np.meshgrid(sc_R1_values, T1_values, sc_R2_values, T2_values, indexing='ij') # I just renamed these
+            wavelengths, L_rfs, L_rf_errs = self.get_epoch_arrays(MJD) # the emitted central wavelengths (cm), scaled rest frame luminosities and their errors of the bands present at this MJD value
 
-        unmasked_chi = chi # save for the error print message
-        mask = chi <= (cf_chi + self.brute_delchi)
-        chi = chi[mask]
-        chi_flat = chi.flatten()
-        if len(chi_flat) == 0:
-            print()
-            print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 2.3 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
-            print()
-            mask = unmasked_chi <= (cf_chi + 5.0)
-            chi = unmasked_chi[mask]
-            chi_flat = chi.flatten()
-            # if we don't have any values within the delchi = 2.3, just save the actual curve_fit params and go with that
-            sampled_row_dict = {'d_since_peak': MJD_d_since_peak, 
-                                'no_bands': MJD_no_bands, 
-                                'bands': MJD_bands, 
-                                'em_cent_wls': MJD_em_cent_wls, 
-                                'cf_red_chi': cf_red_chi, #brute_red_chi, 
-                                'cf_chi_sigma_dist': cf_chi_sigma_dist, #brute_chi_sigma_dist, 
-                                'cf_chi': cf_chi, #min_chi, 
-                                'sampled_T1_K': cf_T1, 
-                                'sampled_R1_cm': cf_R1, 
-                                'sampled_T2_K': cf_T2, 
-                                'sampled_R2_cm': cf_R2, 
-                                'sampled_chi': cf_chi}
-
-            new_index = pd.MultiIndex.from_tuples([(MJD, self.error_sampling_size)], names = ['MJD', 'sample'])
-            new_row = pd.DataFrame(index = new_index, columns = list(sampled_row_dict.keys()))
-            new_row.loc[(MJD, self.error_sampling_size), sampled_row_dict.keys()] = pd.Series(sampled_row_dict) # if we don't have any values within the delchi = 2.3, just save the actual curve_fit params and go with that
-            self.BB_fit_samples = pd.concat([self.BB_fit_samples, new_row], axis = 0)
-            self.BB_fit_samples = self.BB_fit_samples.sort_index() # sort the index so that the MJD and sample columns are in order
-            
-            #self.BB_fit_samples.loc[(MJD, self.error_sampling_size)] = pd.Series(sampled_row_dict) # if we don't have any values within the delchi = 2.3, just save the actual curve_fit params and go with that
-            #self.BB_fit_samples.loc[(MJD, self.error_sampling_size), sampled_row_dict.keys()] = pd.Series(sampled_row_dict)
+            # calculate the chi squared grid in blocks, so we never have to store the 5D array of DBB luminosities for each combination of R and T at each wavelength
+            if self.planck_engine == 'fused':
+                chi = fused_DBB_chi(wavelengths, L_rfs, L_rf_errs, R1 = sc_R1_values, T1 = T1_values, R2 = sc_R2_values, T2 = T2_values)
+            else:
+                chi = chunked_double_blackbody_chi(wavelengths, L_rfs, L_rf_errs, R1 = sc_R1_values, T1 = T1_values, R2 = sc_R2_values, T2 = T2_values, max_bytes = self.DBB_chi_max_bytes) # the chi squared grid, shape = (len(sc_R1_values), len(T1_values), len(sc_R2_values), len(T2_values))
 
+            unmasked_chi = chi # save for the error print message
+            mask = chi <= (cf_chi + self.brute_delchi)
+            chi = chi[mask]
+            chi_flat = chi.flatten()
             if len(chi_flat) == 0:
                 print()
-                print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 5 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 2.3 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
                 print()
-                mask = unmasked_chi <= (cf_chi + 10.0)
+                mask = unmasked_chi <= (cf_chi + 5.0)
                 chi = unmasked_chi[mask]
                 chi_flat = chi.flatten()
+                self.sample_store.add_extra_row(MJD, self.error_sampling_size, cf_sampled_row_dict) # if we don't have any values within the delchi = 2.3, just save the actual curve_fit params and go with that
 
                 if len(chi_flat) == 0:
                     print()
-                    print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 10.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                    print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 5 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
                     print()
-                    mask = unmasked_chi <= (cf_chi + 20.0)
+                    mask = unmasked_chi <= (cf_chi + 10.0)
                     chi = unmasked_chi[mask]
                     chi_flat = chi.flatten()
 
                     if len(chi_flat) == 0:
                         print()
-                        print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 20.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                        print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 10.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
                         print()
-                        mask = unmasked_chi <= (cf_chi + 50.0)
+                        mask = unmasked_chi <= (cf_chi + 20.0)
                         chi = unmasked_chi[mask]
                         chi_flat = chi.flatten()
 
                         if len(chi_flat) == 0:
                             print()
-                            print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 50.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                            print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 20.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
                             print()
-                            mask = unmasked_chi <= (cf_chi + 100.0)
+                            mask = unmasked_chi <= (cf_chi + 50.0)
                             chi = unmasked_chi[mask]
                             chi_flat = chi.flatten()
 
                             if len(chi_flat) == 0:
                                 print()
-                                print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 100.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                                print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 50.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
                                 print()
-                                mask = unmasked_chi <= (cf_chi + 200.0)
+                                mask = unmasked_chi <= (cf_chi + 100.0)
                                 chi = unmasked_chi[mask]
                                 chi_flat = chi.flatten()
 
                                 if len(chi_flat) == 0:
                                     print()
-                                    print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 200.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                                    print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 100.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
                                     print()
-                                    mask = unmasked_chi <= (cf_chi + 500.0)
+                                    mask = unmasked_chi <= (cf_chi + 200.0)
                                     chi = unmasked_chi[mask]
                                     chi_flat = chi.flatten()
 
+                                    if len(chi_flat) == 0:
+                                        print()
+                                        print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 200.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                                        print()
+                                        mask = unmasked_chi <= (cf_chi + 500.0)
+                                        chi = unmasked_chi[mask]
+                                        chi_flat = chi.flatten()
 
-        R1_sc_grid = R1_sc_grid[mask]
-        T1_grid = T1_grid[mask]
-        R2_sc_grid = R2_sc_grid[mask]
-        T2_grid = T2_grid[mask]
+
+            # the parameter values of the grid points in the mask (rather than making 4D grids of each parameter to mask)
+            R1_idx, T1_idx, R2_idx, T2_idx = np.nonzero(mask)
+            R1_sc_grid = sc_R1_values[R1_idx]
+            T1_grid = T1_values[T1_idx]
+            R2_sc_grid = sc_R2_values[R2_idx]
+            T2_grid = T2_values[T2_idx]
 
 
         
-        if len(chi_flat) == 0:
-            print()
-            print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 500.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
-            print()
-        R1_sc_flat = R1_sc_grid.flatten()
-        T1_flat = T1_grid.flatten()
-        R2_sc_flat = R2_sc_grid.flatten()
-        T2_flat = T2_grid.flatten()
+            if len(chi_flat) == 0:
+                print()
+                print(f'{Fore.RED} WARNING - No chi values within the delta_chi = 500.0 region for MJD = {MJD}. Min delchi = {np.min(unmasked_chi) - (cf_chi)} {Style.RESET_ALL}')
+                print()
+            R1_sc_flat = R1_sc_grid.flatten()
+            T1_flat = T1_grid.flatten()
+            R2_sc_flat = R2_sc_grid.flatten()
+            T2_flat = T2_grid.flatten()
         
+
         weights = 1/chi_flat
         weights /= np.sum(weights)
 
@@ -3009,26 +5397,129 @@ class fit_SED_across_lightcurve:
         #                            0               1         2            3              4                     5                6              7              8               9                 10              11            
         #self.sampled_columns = ['d_since_peak', 'no_bands', 'bands', 'em_cent_wls', 'brute_red_chi', 'brute_chi_sigma_dist', 'brute_chi', 'sampled_T1_K', 'sampled_R1_cm', 'sampled_T2_K', 'sampled_R2_cm', 'sampled_chi] 
 
-        for i in range(self.error_sampling_size):
-            sampled_row_dict = {'d_since_peak': MJD_d_since_peak, 
-                                'no_bands': MJD_no_bands, 
-                                'bands': MJD_bands, 
-                                'em_cent_wls': MJD_em_cent_wls, 
-                                'cf_red_chi': cf_red_chi, #brute_red_chi, 
-                                'cf_chi_sigma_dist': cf_chi_sigma_dist, #brute_chi_sigma_dist, 
-                                'cf_chi': cf_chi, #min_chi, 
-                                'sampled_T1_K': sampled_T1[i], 
-                                'sampled_R1_cm': sampled_R1[i], 
-                                'sampled_T2_K': sampled_T2[i], 
-                                'sampled_R2_cm': sampled_R2[i], 
-                                'sampled_chi': sampled_chi[i]}
+        self.sample_store.add_epoch(MJD, 
+                                    epoch_values = {'d_since_peak': MJD_d_since_peak, 
+                                                    'no_bands': MJD_no_bands, 
+                                                    'bands': MJD_bands, 
+                                                    'em_cent_wls': MJD_em_cent_wls, 
+                                                    'cf_red_chi': cf_red_chi, #brute_red_chi, 
+                                                    'cf_chi_sigma_dist': cf_chi_sigma_dist, #brute_chi_sigma_dist, 
+                                                    'cf_chi': cf_chi}, #min_chi, 
+                                    sampled_values = {'sampled_T1_K': sampled_T1, 
+                                                      'sampled_R1_cm': sampled_R1, 
+                                                      'sampled_T2_K': sampled_T2, 
+                                                      'sampled_R2_cm': sampled_R2, 
+                                                      'sampled_chi': sampled_chi}) # add the sampled params to the sample store
+
+
+
+
+
+
+
+    def DBB_adaptive_contour(self, wavelengths, L_rfs, L_rf_errs, param_bounds, threshold):
+        """
+        The DBB_brute_method = 'adaptive' alternative to building the full 4D chi grid in double_BB_brute(). The (log spaced) parameter space is split up into DBB_brute_gridsize cells 
+        along each of R1, T1, R2 and T2, then each cell which could contain a chi <= threshold is split in half along each parameter (into 16 smaller cells), and so on, up to 
+        DBB_refine_levels times. 
+
+        Whether a cell could contain a chi <= threshold comes from a lower bound on chi within the cell: since the blackbody increases with both R and T at every wavelength, 
+        the DBB model at each wavelength lies between its value at the cell's (R1_min, T1_min, R2_min, T2_min) corner and its value at the (R1_max, T1_max, R2_max, T2_max) corner, 
+        so the smallest possible residual at each wavelength is its distance from this range (or 0 if the data lies within it). Cells whose lower bound is > threshold can't contain any
+        part of the delta chi region, so they are thrown away. The cells are processed in chunks and the blackbody is evaluated on the cell edges of each parameter separately, 
+        so the memory used doesn't grow like (no. cells along each parameter)^4 * no. wavelengths. If refining the remaining cells would give more than DBB_max_cells cells, 
+        we stop refining. 
+
+        INPUTS
+        ---------------
+        wavelengths: (array) the emitted central wavelengths (cm) of the data at this MJD
+
+        L_rfs: (array) the scaled rest frame luminosities at this MJD
+
+        L_rf_errs: (array) the scaled rest frame luminosity errors at this MJD
+
+        param_bounds: (list) the (min, max) of each parameter to explore, in the order: [(R1_sc_min, R1_sc_max), (T1_min, T1_max), (R2_sc_min, R2_sc_max), (T2_min, T2_max)]
+
+        threshold: (float) the max chi to keep, e.g. cf_chi + brute_delchi
+
+
+        OUTPUTS
+        ---------------
+        chi_flat: (array) the chi values at the centres of the finest cells which have chi <= threshold
+
+        R1_sc_flat, T1_flat, R2_sc_flat, T2_flat: (arrays) the parameter values at the centres of these cells (R1 and R2 are scaled)
+
+        evaluated_min_chi: (float) the min chi out of all of the finest cells' centres, whether or not they're <= threshold (np.inf if no cells are left). Used for the warning message 
+                            when no cells are left
+        """
+        weights = 1 / L_rf_errs**2
+        log_bounds = np.log10(np.array(param_bounds, dtype = float)) # shape (4, 2), the log10 (min, max) of R1_sc, T1, R2_sc, T2
+        chunk_size = 2**16 # the number of cells processed at once, so the arrays are at most (no. wavelengths, chunk_size)
+        cell_offsets = np.indices((2, 2, 2, 2)).reshape(4, -1).T # the 16 children of each cell are at 2*(cell index) + these offsets
+
+        def level_tables(level):
+            """
+            the blackbody luminosities of the first and second BB at the cell edges and cell centres of each parameter at this refinement level, shape (no. wavelengths, no. R, no. T)
+            """
+            n_cells = self.DBB_brute_gridsize * 2**level
+            edges = [np.logspace(log_bounds[d, 0], log_bounds[d, 1], n_cells + 1) for d in range(4)]
+            centres = [10**(0.5 * (np.log10(e[:-1]) + np.log10(e[1:]))) for e in edges]
+            BB1_edges = vectorised_blackbody(wavelengths, edges[0], edges[1])
+            BB2_edges = vectorised_blackbody(wavelengths, edges[2], edges[3])
+            BB1_centres = vectorised_blackbody(wavelengths, centres[0], centres[1])
+            BB2_centres = vectorised_blackbody(wavelengths, centres[2], centres[3])
+            return centres, BB1_edges, BB2_edges, BB1_centres, BB2_centres
+
+        def chunks(level, cells):
+            """
+            yields chunks of cells (integer index along each parameter, shape (no. cells, 4)). If cells is None, yields all cells at this level
+            """
+            if cells is None:
+                n_cells = self.DBB_brute_gridsize * 2**level
+                for start in range(0, n_cells**4, chunk_size):
+                    yield np.stack(np.unravel_index(np.arange(start, min(start + chunk_size, n_cells**4)), (n_cells,)*4), axis = 1)
+            else:
+                for start in range(0, len(cells), chunk_size):
+                    yield cells[start : start + chunk_size]
+
+        level = 0
+        cells = None # None means every cell at this level
+        while True:
+            centres, BB1_edges, BB2_edges, BB1_centres, BB2_centres = level_tables(level)
+
+            # the lower bound on chi within each cell
+            kept_cells = []
+            for cell_chunk in chunks(level, cells):
+                i, j, k, l = cell_chunk.T
+                DBB_lower = BB1_edges[:, i, j] + BB2_edges[:, k, l] # shape (no. wavelengths, no. cells in chunk)
+                DBB_upper = BB1_edges[:, i + 1, j + 1] + BB2_edges[:, k + 1, l + 1]
+                min_residual = np.maximum(DBB_lower - L_rfs[:, np.newaxis], 0) + np.maximum(L_rfs[:, np.newaxis] - DBB_upper, 0)
+                chi_lower_bound = np.sum(weights[:, np.newaxis] * min_residual**2, axis = 0)
+                kept_cells.append(cell_chunk[chi_lower_bound <= threshold])
+            cells = np.concatenate(kept_cells, axis = 0)
+
+            if (level >= self.DBB_refine_levels) or (len(cells) == 0) or (len(cells) * 16 > self.DBB_max_cells):
+                break
+
+            cells = (2 * cells[:, np.newaxis, :] + cell_offsets[np.newaxis, :, :]).reshape(-1, 4) # split each remaining cell into 16
+            level += 1
+
+        # calculate chi at the centres of the remaining cells
+        chi_chunks = []
+        for cell_chunk in chunks(level, cells):
+            i, j, k, l = cell_chunk.T
+            DBB_L_sc = BB1_centres[:, i, j] + BB2_centres[:, k, l]
+            chi_chunks.append(np.sum(weights[:, np.newaxis] * (L_rfs[:, np.newaxis] - DBB_L_sc)**2, axis = 0))
+        chi_flat = np.concatenate(chi_chunks) if len(chi_chunks) > 0 else np.array([])
+        evaluated_min_chi = np.min(chi_flat) if len(chi_flat) > 0 else np.inf
 
+        mask = chi_flat <= threshold
+        cells = cells[mask]
+        chi_flat = chi_flat[mask]
+        R1_sc_flat, T1_flat, R2_sc_flat, T2_flat = [centres[d][cells[:, d]] for d in range(4)]
+
+        return chi_flat, R1_sc_flat, T1_flat, R2_sc_flat, T2_flat, evaluated_min_chi
 
-            #for key, value in sampled_row_dict.items():
-            #    self.BB_fit_samples.at[(MJD, i), key] = value
-            self.BB_fit_samples.loc[(MJD, i), sampled_row_dict.keys()] = list(sampled_row_dict.values()) # add the sampled params to the dataframe
-            #self.BB_fit_samples.loc[(MJD, i)] = pd.Series(sampled_row_dict.values()) # add the sampled params to the dataframe
-            #self.BB_fit_samples.loc[(MJD, i), list(sampled_row_dict.keys())] = list(sampled_row_dict.values()) # add the sampled params to the dataframe
 
 
 
@@ -3099,19 +5590,31 @@ class fit_SED_across_lightcurve:
 
 
 
-    def run_BB_fit(self):
+    def fit_MJD_epochs(self, mjd_values, progress_bar = True):
+        """
+        Fits the SED to each of the MJDs in mjd_values independently of each other, writing the results into self.BB_fit_results and self.sample_store. 
+
+        INPUTS
+        ---------------
+        mjd_values: (array) the MJDs to fit
+
+        progress_bar: (bool) whether to show a tqdm progress bar over the MJDs
+        """
         # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
         # iterate through each value of MJD within the dataframe and see if we have enough bands to take a BB fit to it 
         single_BB = self.SED_type == 'single_BB'
         double_BB = self.SED_type == 'double_BB'
         power_law = self.SED_type == 'power_law'
 
+        if self.curvefit_warm_start: # walk through the epochs in time order so each curve_fit can start from the solution at the previous epoch
+            mjd_values = np.sort(mjd_values)
+            self.curvefit_p0 = None
 
-        if self.curvefit: # count the number of failed curve_fits
-            self.no_failed_curvefits = 0
+        batched_lm = self.solver == 'batched_lm'
+        batched_mjds = [] # the MJDs to curve fit all at once after the loop if solver == 'batched_lm'
 
-        for MJD in tqdm(self.mjd_values, desc = f'Progress {self.SED_type} SED fitting each MJD value', total = len(self.mjd_values), leave = False):
-            MJD_df = self.interp_df[self.interp_df['MJD'] == MJD].copy() # THERE COULD BE FLOATING POINT ERRORS HERE!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+        for MJD in tqdm(mjd_values, desc = f'Progress {self.SED_type} SED fitting each MJD value', total = len(mjd_values), leave = False, disable = not progress_bar):
+            MJD_df = self.get_MJD_df(MJD) # the rows of interp_df at this MJD, taken from the epoch index
             MJD_d_since_peak = MJD_df['d_since_peak'].iloc[0]
             MJD_no_bands = len( MJD_df['band'].unique() ) # the number of bands (and therefore datapoints) we have available at this MJD for the BB fit
             self.BB_fit_results.loc[MJD, :] = np.nan # set all values to nan for now, then overwrite them if we have data for thsi column, so that if (e.g.) brute = False, then the brute columns would contain nan values
@@ -3124,7 +5627,9 @@ class fit_SED_across_lightcurve:
             
             #for a single BB fit
             if single_BB:
-                if self.curvefit:
+                if self.curvefit and batched_lm:
+                    batched_mjds.append(MJD)
+                elif self.curvefit:
                     self.BB_curvefit(MJD, MJD_df, R_sc_min = self.BB_R_min_sc, R_sc_max = self.BB_R_max_sc, T_min = self.BB_T_min, T_max = self.BB_T_max)
 
                 if self.brute:
@@ -3135,26 +5640,226 @@ class fit_SED_across_lightcurve:
                 if MJD_no_bands < 4: # don't try fitting a DBB spectrum to <c4 datapoints, so the BB results in this row will all be nan
                     continue
 
-                if self.curvefit:
+                if self.curvefit and batched_lm:
+                    batched_mjds.append(MJD)
+                elif self.curvefit:
                     self.double_BB_curvefit(MJD, MJD_df, 
                                             R1_sc_min = self.DBB_R_min_sc, R1_sc_max = self.DBB_R_max_sc, T1_min = self.DBB_T1_min, T1_max = self.DBB_T1_max, 
                                             R2_sc_min = self.DBB_R_min_sc, R2_sc_max = self.DBB_R_max_sc, T2_min = self.DBB_T2_min, T2_max = self.DBB_T2_max)
 
             elif power_law:
-                if self.curvefit:
+                if self.curvefit and batched_lm:
+                    batched_mjds.append(MJD)
+                elif self.curvefit:
                     self.power_law_curvefit(MJD, MJD_df, A_sc_min = self.PL_sc_A_min, A_sc_max = self.PL_sc_A_max, gamma_min = self.PL_gamma_min, gamma_max = self.PL_gamma_max)
 
                 if self.brute:
                     self.power_law_brute(MJD, MJD_df, A_min = self.PL_A_min, A_max = self.PL_A_max, gamma_min = self.PL_gamma_min, gamma_max = self.PL_gamma_max)
 
+        if len(batched_mjds) > 0:
+            self.batched_curvefit(np.array(batched_mjds))
+
+
+
+
+
+
+    def batched_curvefit(self, mjd_values):
+        """
+        Curve fits the SED to all of the MJDs in mjd_values at once using batched_levenberg_marquardt() (with the analytic Jacobian of the SED model), rather than calling 
+        BB_curvefit(), power_law_curvefit() or double_BB_curvefit() at each MJD. The results are written into the same cf_* columns of self.BB_fit_results as those functions, 
+        and any MJD whose fit doesn't converge is counted as a failed curve_fit. 
+
+        INPUTS
+        ---------------
+        mjd_values: (array) the MJDs to fit. These should all have enough bands for the SED model (>1 for single_BB and power_law, >=4 for double_BB)
+        """
+        if self.SED_type == 'single_BB':
+            SED_function, SED_jacobian, wavelength_units = blackbody, blackbody_jacobian, 'cm'
+            lower_bounds = np.array([self.BB_R_min_sc, self.BB_T_min])
+            upper_bounds = np.array([self.BB_R_max_sc, self.BB_T_max])
+            log_params = np.array([True, True]) # the fit steps through ln(R) and ln(T), since they can span several orders of magnitude
+
+        elif self.SED_type == 'double_BB':
+            SED_function, SED_jacobian, wavelength_units = double_blackbody, double_blackbody_jacobian, 'cm'
+            lower_bounds = np.array([self.DBB_R_min_sc, self.DBB_T1_min, self.DBB_R_min_sc, self.DBB_T2_min])
+            upper_bounds = np.array([self.DBB_R_max_sc, self.DBB_T1_max, self.DBB_R_max_sc, self.DBB_T2_max])
+            log_params = np.array([True, True, True, True])
+
+        elif self.SED_type == 'power_law':
+            SED_function, SED_jacobian, wavelength_units = power_law_SED, power_law_SED_jacobian, 'Angstrom'
+            lower_bounds = np.array([self.PL_sc_A_min, self.PL_gamma_min])
+            upper_bounds = np.array([self.PL_sc_A_max, self.PL_gamma_max])
+            log_params = np.array([True, False]) # A in log space, gamma in linear space
+
+        n_params = len(lower_bounds)
+
+        # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+        # pad each MJD's data out to the largest number of bands, copying the MJD's first wavelength into the padded entries so that the model stays finite there
+        epoch_arrays = [self.get_epoch_arrays(MJD, wavelength_units = wavelength_units) for MJD in mjd_values]
+        no_bands = np.array([len(wavelengths) for wavelengths, _, _ in epoch_arrays])
+        band_mask = np.arange(no_bands.max())[np.newaxis, :] < no_bands[:, np.newaxis]
+        wavelengths = np.empty(band_mask.shape)
+        L_rfs = np.zeros(band_mask.shape)
+        L_rf_errs = np.ones(band_mask.shape)
+        for i, (MJD_wavelengths, MJD_L_rfs, MJD_L_rf_errs) in enumerate(epoch_arrays):
+            wavelengths[i, :] = MJD_wavelengths[0]
+            wavelengths[i, :no_bands[i]] = MJD_wavelengths
+            L_rfs[i, :no_bands[i]] = MJD_L_rfs
+            L_rf_errs[i, :no_bands[i]] = MJD_L_rf_errs
+
+        # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+        # the first start of each fit is curve_fit's default start (the middle of the bounds). The SED models (especially the DBB) can have several local minima, and it's cheap to 
+        # run the batched fit a few more times, so the other self.batched_lm_starts - 1 starts are the points with the lowest chi squared at each MJD out of a coarse grid across the bounds
+        grid_axes = [np.linspace(np.log(lower_bounds[i]), np.log(upper_bounds[i]), 9)[1::2] if log_params[i] else np.linspace(lower_bounds[i], upper_bounds[i], 9)[1::2] 
+                     for i in range(n_params)] # 4 values along each parameter, in the middle of 4 equal width bins
+        grid_points = np.stack(np.meshgrid(*grid_axes, indexing = 'ij'), axis = -1).reshape(-1, n_params)
+        grid_points = np.where(log_params, np.exp(grid_points), grid_points)
+        with np.errstate(all = 'ignore'):
+            grid_model = SED_function(wavelengths[:, np.newaxis, :], *[grid_points[np.newaxis, :, [i]] for i in range(n_params)]) # shape (no. MJDs, no. grid points, max no. bands)
+            grid_chi = np.sum(np.where(band_mask[:, np.newaxis, :], ((L_rfs[:, np.newaxis, :] - grid_model) / L_rf_errs[:, np.newaxis, :])**2, 0.0), axis = 2)
+        grid_chi = np.where(np.isfinite(grid_chi), grid_chi, np.inf)
+        best_grid_idx = np.argsort(grid_chi, axis = 1)[:, :self.batched_lm_starts - 1]
+        starts = [np.tile(0.5 * (lower_bounds + upper_bounds), (len(mjd_values), 1))] + [grid_points[best_grid_idx[:, i]] for i in range(best_grid_idx.shape[1])]
+
+        best_chi = np.full(len(mjd_values), np.inf)
+        popt = np.full((len(mjd_values), n_params), np.nan)
+        pcov = np.full((len(mjd_values), n_params, n_params), np.nan)
+        converged = np.zeros(len(mjd_values), dtype = bool)
+        nfev = np.zeros(len(mjd_values), dtype = int)
+        for p0 in starts:
+            start_popt, start_pcov, start_converged, start_nfev = batched_levenberg_marquardt(SED_function, SED_jacobian, wavelengths, L_rfs, L_rf_errs, band_mask, lower_bounds, upper_bounds, 
+                                                                                              p0 = p0, log_params = log_params)
+            with np.errstate(all = 'ignore'):
+                start_model = SED_function(wavelengths, *[start_popt[:, [i]] for i in range(n_params)])
+                start_chi = np.sum(np.where(band_mask, ((L_rfs - start_model) / L_rf_errs)**2, 0.0), axis = 1)
+            better = start_converged & (start_chi < best_chi)
+            best_chi[better] = start_chi[better]
+            popt[better] = start_popt[better]
+            pcov[better] = start_pcov[better]
+            converged = converged | start_converged
+            nfev += start_nfev
+
+        # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+        # calculate the chi squared of the fits in the same way as chisq()
+        with np.errstate(all = 'ignore'):
+            param_errs = np.sqrt(np.diagonal(pcov, axis1 = 1, axis2 = 2))
+            model = SED_function(wavelengths, *[popt[:, [i]] for i in range(n_params)])
+            cf_chi = np.sum(np.where(band_mask, ((L_rfs - model) / L_rf_errs)**2, 0.0), axis = 1)
+            dof = no_bands - n_params
+            cf_red_chi = np.where(dof > 0, cf_chi / dof, np.nan)
+            red_chi_1sig = np.where(dof > 0, np.sqrt(2 / dof), np.nan)
+            cf_chi_sigma_dist = (cf_red_chi - 1)/red_chi_1sig
+
+            # --------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+            # put the results into the same columns as BB_curvefit(), double_BB_curvefit() and power_law_curvefit()
+            if self.SED_type == 'single_BB':
+                cf_correlation = pcov[:, 1, 0] / (param_errs[:, 1] * param_errs[:, 0]) # using the scaled R error here since the fit is not told about the fact that R has been scaled down
+                results = np.column_stack((popt[:, 1], param_errs[:, 1], popt[:, 0] / self.R_scalefactor, param_errs[:, 0] / self.R_scalefactor, cf_correlation, 
+                                           cf_red_chi, cf_chi_sigma_dist, red_chi_1sig))
+                result_columns = self.columns[3:11]
+
+            elif self.SED_type == 'double_BB':
+                results = np.column_stack((popt[:, 1], param_errs[:, 1], popt[:, 0] / self.R_scalefactor, param_errs[:, 0] / self.R_scalefactor, 
+                                           popt[:, 3], param_errs[:, 3], popt[:, 2] / self.R_scalefactor, param_errs[:, 2] / self.R_scalefactor, 
+                                           cf_red_chi, cf_chi_sigma_dist, red_chi_1sig, cf_chi))
+                result_columns = self.columns[3:15]
+
+            elif self.SED_type == 'power_law':
+                A_scalefactor = self.L_scalefactor # L = A(wavelength)^gamma . If we scale L down by 5, it would scale A down by 5
+                results = np.column_stack((popt[:, 0] / A_scalefactor, param_errs[:, 0] / A_scalefactor, popt[:, 1], param_errs[:, 1], 
+                                           cf_red_chi, cf_chi_sigma_dist, red_chi_1sig))
+                result_columns = self.columns[3:10]
+
+        results[~converged] = np.nan
+        self.BB_fit_results.loc[mjd_values, result_columns] = results
+
+        for MJD in mjd_values[~converged]:
+            print(f'{Fore.RED} WARNING - Curve fit failed for MJD = {MJD} {Style.RESET_ALL}')
+        self.no_failed_curvefits += int(np.sum(~converged)) # counting the number of failed curve fits
+        self.curvefit_nfev.update(zip(mjd_values[converged], nfev[converged]))
+        self.curvefit_start_type.update({MJD: 'cold' for MJD in mjd_values[converged]})
+
+
+
+
+
+
+    def MJD_chunk_copy(self, mjd_chunk):
+        """
+        Makes a copy of this class which only holds the data and results for the MJDs in mjd_chunk, so it's small enough to be sent to a worker process 
+        by run_BB_fit() when n_jobs != 1. 
+        """
+        chunk_fitter = copy.copy(self)
+        chunk_fitter.interp_df = self.interp_df[self.interp_df['MJD'].isin(mjd_chunk)].copy()
+        chunk_fitter.build_epoch_index()
+        chunk_fitter.mjd_values = mjd_chunk
+        chunk_fitter.BB_fit_results = self.BB_fit_results.loc[mjd_chunk].copy()
+        chunk_fitter.sample_store = self.sample_store.subset(mjd_chunk)
+        chunk_fitter.curvefit_nfev = {} # so the chunk doesn't share these dicts with this class
+        chunk_fitter.curvefit_start_type = {}
+
+        return chunk_fitter
+
+
+
+
+
+
+    def run_BB_fit(self):
+        """
+        Fits the SED to every MJD in the light curve independently. If self.n_jobs != 1, the MJDs are split up into chunks which are fit by n_jobs worker processes, 
+        then the results of each chunk are put back together into BB_fit_results and sample_store. 
+        """
+        if self.curvefit: # count the number of failed curve_fits
+            self.no_failed_curvefits = 0
+
+        # load any MJDs which have already been fit with the same inputs from the SED fit cache, so we only fit the rest
+        self.SED_fit_cache_hits = 0
+        self.SED_fit_cache_misses = 0
+        cache_keys = [self.epoch_fit_cache_key(MJD, 'independent') for MJD in self.mjd_values]
+        cached = self.load_cached_epoch_fits(self.mjd_values, cache_keys)
+        mjds_to_fit = self.mjd_values[~cached]
+
+        if (self.n_jobs == 1) or (len(mjds_to_fit) <= 1):
+            self.fit_MJD_epochs(mjds_to_fit)
+
+        else:
+            n_jobs = os.cpu_count() if self.n_jobs is None else self.n_jobs
+            mjd_chunks = [chunk for chunk in np.array_split(mjds_to_fit, 4*n_jobs) if len(chunk) > 0] # a few chunks per process so that the processes finish at around the same time
+            chunk_seeds = np.random.randint(0, 2**32 - 1, size = len(mjd_chunks)) # each chunk gets its own random seed for the parameter sampling, so the chunks don't all sample the same random numbers
+
+            cached_BB_fit_results = self.BB_fit_results # the chunks' results replace these, so keep hold of the MJDs loaded from the cache
+            cached_sample_store = self.sample_store
+            chunk_results = [None]*len(mjd_chunks)
+            with ProcessPoolExecutor(max_workers = n_jobs) as executor:
+                future_to_idx = {executor.submit(SED_fit_MJD_chunk, self.MJD_chunk_copy(chunk), chunk_seeds[i]): i for i, chunk in enumerate(mjd_chunks)}
+                for future in tqdm(as_completed(future_to_idx), desc = f'Progress {self.SED_type} SED fitting each chunk of MJD values', total = len(future_to_idx), leave = False):
+                    chunk_results[future_to_idx[future]] = future.result()
+
+            # put the chunks' results back together (along with any MJDs loaded from the SED fit cache), in the same order as self.mjd_values
+            self.BB_fit_results = pd.concat([chunk_BB_fit_results for chunk_BB_fit_results, _, _, _ in chunk_results], axis = 0)
+            self.sample_store = sampled_params_store.concat([chunk_sample_store for _, chunk_sample_store, _, _ in chunk_results])
+            if np.any(cached):
+                cached_mjds = self.mjd_values[cached]
+                self.BB_fit_results = pd.concat([self.BB_fit_results, cached_BB_fit_results.loc[cached_mjds]], axis = 0).loc[self.mjd_values]
+                self.sample_store = sampled_params_store.concat([self.sample_store, cached_sample_store.subset(cached_mjds)]).subset(self.mjd_values)
+            for _, _, _, (chunk_curvefit_nfev, chunk_curvefit_start_type) in chunk_results:
+                self.curvefit_nfev.update(chunk_curvefit_nfev)
+                self.curvefit_start_type.update(chunk_curvefit_start_type)
+
+            if self.curvefit:
+                self.no_failed_curvefits += sum([chunk_no_failed_curvefits for _, _, chunk_no_failed_curvefits, _ in chunk_results])
+
+        self.save_epoch_fits_to_cache(mjds_to_fit, [key for key, is_cached in zip(cache_keys, cached) if not is_cached], curvefit_used = self.curvefit)
 
         # print a message to indicate that the fitting was successful
         if self.curvefit:
-            print(f'{Fore.GREEN}SED fitting complete for {self.ant_name})  (# curve_fits failed = {self.no_failed_curvefits}) ============================================================================================= {Style.RESET_ALL}')
+            print(f'{Fore.GREEN}SED fitting complete for {self.ant_name})  (# curve_fits failed = {self.no_failed_curvefits}){self.SED_fit_cache_summary()} ============================================================================================= {Style.RESET_ALL}')
             print()
 
         else: 
-            print(f'{Fore.GREEN}SED fitting complete for {self.ant_name})   ============================================================================================= {Style.RESET_ALL}')
+            print(f'{Fore.GREEN}SED fitting complete for {self.ant_name}){self.SED_fit_cache_summary()}   ============================================================================================= {Style.RESET_ALL}')
             print()
 
         return self.BB_fit_results
@@ -3245,6 +5950,8 @@ class fit_SED_across_lightcurve:
 
         if (self.SED_type == 'double_BB') and (self.curvefit):
             self.no_failed_curvefits = 0
+        self.SED_fit_cache_hits = 0
+        self.SED_fit_cache_misses = 0
 
         # ---------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
         # adding new columns to the results dataframe to show the upper and lower parameter space limits that the fit was allowed to explore
@@ -3267,7 +5974,7 @@ class fit_SED_across_lightcurve:
         # ---------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
         # SED fitting the UVOT MJDs
         for UV_MJD in tqdm(self.all_UVOT_MJDs, desc = 'Progress SED fitting each UVOT MJD value', total = len(self.all_UVOT_MJDs), leave = False):
-            MJD_df = self.interp_df[self.interp_df['MJD'] == UV_MJD].copy() # THERE COULD BE FLOATING POINT ERRORS HERE!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+            MJD_df = self.get_MJD_df(UV_MJD) # the rows of interp_df at this MJD, taken from the epoch index
             MJD_d_since_peak = MJD_df['d_since_peak'].iloc[0]
             MJD_no_bands = len( MJD_df['band'].unique() ) # the number of bands (and therefore datapoints) we have available at this MJD for the BB fit
             self.BB_fit_results.loc[UV_MJD, :] = np.nan # set all values to nan for now, then overwrite them if we have data for thsi column, so that if (e.g.) brute = False, then the brute columns would contain nan values
@@ -3284,7 +5991,11 @@ class fit_SED_across_lightcurve:
                 #    self.BB_curvefit(UV_MJD, MJD_df, R_sc_min = self.BB_R_min_sc, R_sc_max = self.BB_R_max_sc, T_min = self.BB_T_min, T_max = self.BB_T_max)
                 #if self.brute:
                 self.BB_fit_results.loc[UV_MJD, ['R_param_lower_lim', 'R_param_upper_lim', 'T_param_lower_lim', 'T_param_upper_lim']] = [self.BB_R_min, self.BB_R_max, self.BB_T_min, self.BB_T_max]
+                cache_key = self.epoch_fit_cache_key(UV_MJD, 'UVOT')
+                if self.load_cached_epoch_fits([UV_MJD], [cache_key])[0]:
+                    continue
                 self.BB_brute(UV_MJD, MJD_df, R_sc_min = self.BB_R_min_sc, R_sc_max = self.BB_R_max_sc, T_min = self.BB_T_min, T_max = self.BB_T_max)
+                self.save_epoch_fits_to_cache([UV_MJD], [cache_key], curvefit_used = False)
                 note = 'brute'
 
             # for a double BB fit
@@ -3293,7 +6004,11 @@ class fit_SED_across_lightcurve:
                     continue
 
                 self.BB_fit_results.loc[UV_MJD, ['R1_param_lower_lim', 'R1_param_upper_lim', 'T1_param_lower_lim', 'T1_param_upper_lim', 'R2_param_lower_lim', 'R2_param_upper_lim', 'T2_param_lower_lim', 'T2_param_upper_lim']] = [self.DBB_R_min, self.DBB_R_max, self.DBB_T1_min, self.DBB_T1_max, self.DBB_R_min, self.DBB_R_max, self.DBB_T2_min, self.DBB_T2_max]
+                cache_key = self.epoch_fit_cache_key(UV_MJD, 'UVOT')
+                if self.load_cached_epoch_fits([UV_MJD], [cache_key])[0]:
+                    continue
                 self.double_BB_curvefit_then_brute(UV_MJD, MJD_df, R1_sc_min = self.DBB_R_min_sc, R1_sc_max = self.DBB_R_max_sc, T1_min = self.DBB_T1_min, T1_max = self.DBB_T1_max, R2_sc_min = self.DBB_R_min_sc, R2_sc_max = self.DBB_R_max_sc, T2_min = self.DBB_T2_min, T2_max = self.DBB_T2_max)
+                self.save_epoch_fits_to_cache([UV_MJD], [cache_key], curvefit_used = True)
                 #self.double_BB_curvefit(UV_MJD, MJD_df, R1_sc_min = self.DBB_R_min_sc, R1_sc_max = self.DBB_R_max_sc, T1_min = self.DBB_T1_min, T1_max = self.DBB_T1_max, R2_sc_min = self.DBB_R_min_sc, R2_sc_max = self.DBB_R_max_sc, T2_min = self.DBB_T2_min, T2_max = self.DBB_T2_max)
                 note = 'cf'
 
@@ -3303,16 +6018,20 @@ class fit_SED_across_lightcurve:
                 #    self.power_law_curvefit(UV_MJD, MJD_df, A_sc_min = self.PL_sc_A_min, A_sc_max = self.PL_sc_A_max, gamma_min = self.PL_gamma_min, gamma_max = self.PL_gamma_max)
                 #if self.brute:
                 self.BB_fit_results.loc[UV_MJD, ['A_param_lower_lim', 'A_param_upper_lim', 'gamma_param_lower_lim', 'gamma_param_upper_lim']] = [self.PL_A_min, self.PL_A_max, self.PL_gamma_min, self.PL_gamma_max]
+                cache_key = self.epoch_fit_cache_key(UV_MJD, 'UVOT')
+                if self.load_cached_epoch_fits([UV_MJD], [cache_key])[0]:
+                    continue
                 self.power_law_brute(UV_MJD, MJD_df, A_min = self.PL_A_min, A_max = self.PL_A_max, gamma_min = self.PL_gamma_min, gamma_max = self.PL_gamma_max)
+                self.save_epoch_fits_to_cache([UV_MJD], [cache_key], curvefit_used = False)
                 note = 'brute'
 
         # print a message to indicate that the fitting was successful
         if self.SED_type == 'double_BB': # since double BB is the only SED fit using curvefit anyways
-            print(f'{Fore.GREEN}UVOT SED fitting complete for {self.ant_name})  (# curve_fits failed = {self.no_failed_curvefits}) ============================================================================================= {Style.RESET_ALL}')
+            print(f'{Fore.GREEN}UVOT SED fitting complete for {self.ant_name})  (# curve_fits failed = {self.no_failed_curvefits}){self.SED_fit_cache_summary()} ============================================================================================= {Style.RESET_ALL}')
             print()
 
         else:
-            print(f'{Fore.GREEN}UVOT SED fitting complete for {self.ant_name}   ============================================================================================= {Style.RESET_ALL}')
+            print(f'{Fore.GREEN}UVOT SED fitting complete for {self.ant_name}{self.SED_fit_cache_summary()}   ============================================================================================= {Style.RESET_ALL}')
             print()
 
         note = 'cf' if self.SED_type == 'double_BB' else 'brute' # bug fix for PS1-10adi's SBB for some reason
@@ -3390,8 +6109,10 @@ class fit_SED_across_lightcurve:
         """
         
 
+        self.SED_fit_cache_hits = 0
+        self.SED_fit_cache_misses = 0
         for opt_MJD in tqdm(self.optical_MJDs, desc = f'Progress {self.SED_type} SED fitting each optical MJD value', total = len(self.optical_MJDs), leave = False):
-            MJD_df = self.interp_df[self.interp_df['MJD'] == opt_MJD].copy() # THERE COULD BE FLOATING POINT ERRORS HERE!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+            MJD_df = self.get_MJD_df(opt_MJD) # the rows of interp_df at this MJD, taken from the epoch index
             MJD_d_since_peak = MJD_df['d_since_peak'].iloc[0]
             MJD_no_bands = len( MJD_df['band'].unique() ) # the number of bands (and therefore datapoints) we have available at this MJD for the BB fit
             self.BB_fit_results.loc[opt_MJD, :] = np.nan # set all values to nan for now, then overwrite them if we have data for thsi column, so that if (e.g.) brute = False, then the brute columns would contain nan values
@@ -3431,8 +6152,12 @@ class fit_SED_across_lightcurve:
                 
                 # running the BB Brute SED fitting ---
                 self.BB_fit_results.loc[opt_MJD, ['R_param_lower_lim', 'R_param_upper_lim', 'T_param_lower_lim', 'T_param_upper_lim']] = [MJD_R_min, MJD_R_max, MJD_T_min, MJD_T_max] # documenting the parameter space which we searched
+                cache_key = self.epoch_fit_cache_key(opt_MJD, 'UVOT_guided', guided_limits = [MJD_R_min, MJD_R_max, MJD_T_min, MJD_T_max])
+                if self.load_cached_epoch_fits([opt_MJD], [cache_key])[0]:
+                    continue
                 self.BB_brute(opt_MJD, MJD_df, R_sc_min = self.BB_R_min_sc, R_sc_max = self.BB_R_max_sc, T_min = self.BB_T_min, T_max = self.BB_T_max, 
                                 UVOT_guided_params = [MJD_R_sc_min, MJD_R_sc_max, MJD_T_min, MJD_T_max]) 
+                self.save_epoch_fits_to_cache([opt_MJD], [cache_key], curvefit_used = False)
 
 
 
@@ -3476,9 +6201,13 @@ class fit_SED_across_lightcurve:
                 #                        R1_sc_min = MJD_R1_sc_min, R1_sc_max = MJD_R1_sc_max, T1_min = MJD_T1_min, T1_max = MJD_T1_max, 
                 #                        R2_sc_min = MJD_R2_sc_min, R2_sc_max = MJD_R2_sc_max, T2_min = MJD_T2_min, T2_max = MJD_T2_max)
                 
+                cache_key = self.epoch_fit_cache_key(opt_MJD, 'UVOT_guided', guided_limits = [MJD_R1_min, MJD_R1_max, MJD_T1_min, MJD_T1_max, MJD_R2_min, MJD_R2_max, MJD_T2_min, MJD_T2_max])
+                if self.load_cached_epoch_fits([opt_MJD], [cache_key])[0]:
+                    continue
                 self.double_BB_curvefit_then_brute(opt_MJD, MJD_df,
                                         R1_sc_min = MJD_R1_sc_min, R1_sc_max = MJD_R1_sc_max, T1_min = MJD_T1_min, T1_max = MJD_T1_max, 
                                         R2_sc_min = MJD_R2_sc_min, R2_sc_max = MJD_R2_sc_max, T2_min = MJD_T2_min, T2_max = MJD_T2_max)
+                self.save_epoch_fits_to_cache([opt_MJD], [cache_key], curvefit_used = True)
 
 
 
@@ -3500,18 +6229,22 @@ class fit_SED_across_lightcurve:
                 
                 # running the PL brute SED fitting ---
                 self.BB_fit_results.loc[opt_MJD, ['A_param_lower_lim', 'A_param_upper_lim', 'gamma_param_lower_lim', 'gamma_param_upper_lim']] = [MJD_A_min, MJD_A_max, MJD_gamma_min, MJD_gamma_max] # documenting the parameter space which we searched
+                cache_key = self.epoch_fit_cache_key(opt_MJD, 'UVOT_guided', guided_limits = [MJD_A_min, MJD_A_max, MJD_gamma_min, MJD_gamma_max])
+                if self.load_cached_epoch_fits([opt_MJD], [cache_key])[0]:
+                    continue
                 self.power_law_brute(opt_MJD, MJD_df, A_min = self.PL_A_min, A_max = self.PL_A_max, gamma_min = self.PL_gamma_min, gamma_max = self.PL_gamma_max, 
                                         UVOT_guided_params = [MJD_A_min, MJD_A_max, MJD_gamma_min, MJD_gamma_max])
+                self.save_epoch_fits_to_cache([opt_MJD], [cache_key], curvefit_used = False)
 
 
 
         # print a message to indicate that the fitting was successful
         if self.curvefit:
-            print(f'{Fore.GREEN}Optical SED fitting complete for {self.ant_name}  (# curve_fits failed = {self.no_failed_curvefits}) ============================================================================================= {Style.RESET_ALL}')
+            print(f'{Fore.GREEN}Optical SED fitting complete for {self.ant_name}  (# curve_fits failed = {self.no_failed_curvefits}){self.SED_fit_cache_summary()} ============================================================================================= {Style.RESET_ALL}')
             print()
 
         else:
-            print(f'{Fore.GREEN}Optical SED fitting complete for {self.ant_name}   ============================================================================================= {Style.RESET_ALL}')
+            print(f'{Fore.GREEN}Optical SED fitting complete for {self.ant_name}{self.SED_fit_cache_summary()}   ============================================================================================= {Style.RESET_ALL}')
             print()
 
         return self.BB_fit_results
@@ -3764,7 +6497,7 @@ class fit_SED_across_lightcurve:
                 exponent = int(np.floor(np.log10(abs(x))))
                 coeff = x / (10 ** exponent)
                 return rf"${coeff:.1f} \times 10^{{{exponent}}}$"
-            formatter = FuncFormatter(standard_form_tex)
+            formatter = ticker.FuncFormatter(standard_form_tex)
 
             # Set y-sharing per row
             for row in range(nrows):
@@ -3776,7 +6509,7 @@ class fit_SED_across_lightcurve:
                         ax.tick_params(labelleft=False)
                     ax.yaxis.set_major_formatter(formatter)  
                     ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds
-                    ax.yaxis.set_major_locator(MaxNLocator(nbins=4))
+                    ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins=4))
 
 
             axs = axs.flatten()
@@ -3784,12 +6517,12 @@ class fit_SED_across_lightcurve:
             #formatter.set_powerlimits((0, 0))  # Always show scientific notation
             for i, MJD in enumerate(self.indiv_plot_MJDs):
                 ax = axs[i]
-                MJD_df = self.interp_df[self.interp_df['MJD'] == MJD].copy()
+                MJD_df = self.get_MJD_df(MJD)
                 d_since_peak = MJD_df['d_since_peak'].iloc[0]
 
                 #ax.yaxis.set_major_formatter(formatter)  
                  
-                ax.xaxis.set_major_locator(MaxNLocator(nbins=4))
+                ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=4))
                 ax.tick_params(axis='both', labelsize=9.5)
 
 
@@ -3871,7 +6604,7 @@ class fit_SED_across_lightcurve:
                 exponent = int(np.floor(np.log10(abs(x))))
                 coeff = x / (10 ** exponent)
                 return rf"${coeff:.1f} \times 10^{{{exponent}}}$"
-            formatter = FuncFormatter(standard_form_tex)
+            formatter = ticker.FuncFormatter(standard_form_tex)
 
             # Set y-sharing per row
             for row in range(nrows):
@@ -3883,18 +6616,18 @@ class fit_SED_across_lightcurve:
                         ax.tick_params(labelleft=False)
                     ax.yaxis.set_major_formatter(formatter)  
                     ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds
-                    ax.yaxis.set_major_locator(MaxNLocator(nbins=4))
+                    ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins=4))
 
 
             axs = axs.flatten()
             legend_dict = {}
             for i, MJD in enumerate(self.indiv_plot_MJDs):
                 ax = axs[i]
-                MJD_df = self.interp_df[self.interp_df['MJD'] == MJD].copy()
+                MJD_df = self.get_MJD_df(MJD)
                 d_since_peak = MJD_df['d_since_peak'].iloc[0]
 
 
-                ax.xaxis.set_major_locator(MaxNLocator(nbins=4))
+                ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=4))
                 ax.tick_params(axis='both', labelsize=9.5)
                 #ax.yaxis.set_major_formatter(formatter)  
                 #ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds 
@@ -3992,7 +6725,7 @@ class fit_SED_across_lightcurve:
                 exponent = int(np.floor(np.log10(abs(x))))
                 coeff = x / (10 ** exponent)
                 return rf"${coeff:.1f} \times 10^{{{exponent}}}$"
-            formatter = FuncFormatter(standard_form_tex)
+            formatter = ticker.FuncFormatter(standard_form_tex)
 
             # Set y-sharing per row
             for row in range(nrows):
@@ -4004,20 +6737,20 @@ class fit_SED_across_lightcurve:
                         ax.tick_params(labelleft=False)
                     ax.yaxis.set_major_formatter(formatter)  
                     ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds
-                    ax.yaxis.set_major_locator(MaxNLocator(nbins=4))
+                    ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins=4))
 
 
             axs = axs.flatten()
             legend_dict = {}
             for i, MJD in enumerate(self.indiv_plot_MJDs):
                 ax = axs[i]
-                MJD_df = self.interp_df[self.interp_df['MJD'] == MJD].copy()
+                MJD_df = self.get_MJD_df(MJD)
                 d_since_peak = MJD_df['d_since_peak'].iloc[0]
 
                 #ax.yaxis.set_major_formatter(formatter)  
                 #ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds 
                 ax.tick_params(axis='both', labelsize=9.5)
-                ax.xaxis.set_major_locator(MaxNLocator(nbins=4))
+                ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=4))
 
                 subplot_title = f'Phase = {d_since_peak:.0f}'+ r'  $\mathbf{D_{\sigma_\chi}}$ = '+f'{self.BB_fit_results.loc[MJD, "brute_chi_sigma_dist"]:.1f}'
                 #title2 = fr"$ \mathbf{{ A = {self.BB_fit_results.loc[MJD, 'brute_A']:.1e}^{{+{self.BB_fit_results.loc[MJD, 'brute_A_err_upper']:.1e}}}_{{-{self.BB_fit_results.loc[MJD, 'brute_A_err_lower']:.1e}}} }}$"+'\n'
@@ -4183,7 +6916,7 @@ class fit_SED_across_lightcurve:
             exponent = int(np.floor(np.log10(abs(x))))
             coeff = x / (10 ** exponent)
             return rf"${coeff:.1f} \times 10^{{{exponent}}}$"
-        formatter = FuncFormatter(standard_form_tex)
+        formatter = ticker.FuncFormatter(standard_form_tex)
 
 
         legfontsize = 10.5
@@ -4253,7 +6986,7 @@ class fit_SED_across_lightcurve:
             ####################################################################################################################################################
              #
 
-            divider2 = make_axes_locatable(ax2)
+            divider2 = axes_grid1.make_axes_locatable(ax2)
             cax2 = divider2.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax2) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4287,7 +7020,7 @@ class fit_SED_across_lightcurve:
                         label = r'N > M and $D_{\sigma_\chi} \leq 3.0$', marker = 'o', edgecolors = 'k', linewidths = 0.5, zorder = 4)
             
 
-            divider4 = make_axes_locatable(ax4)
+            divider4 = axes_grid1.make_axes_locatable(ax4)
             cax4 = divider4.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax4) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4300,12 +7033,12 @@ class fit_SED_across_lightcurve:
                 ax.grid(True)
                 ax.yaxis.set_major_formatter(formatter)  
                 ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds 
-                ax.xaxis.set_major_locator(MaxNLocator(nbins=5))
+                ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=5))
                 ax.tick_params(axis='both', labelsize= tickfontsize)
                 if self.ant_name == 'ZTF20abodaps':
                     if ax == ax1:
                         continue
-                ax.yaxis.set_major_locator(MaxNLocator(nbins=6))
+                ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins=6))
 
                 
 
@@ -4402,7 +7135,7 @@ class fit_SED_across_lightcurve:
             #cbar = plt.colorbar(sc, ax = ax2)
             #cbar.set_label(label = cbar_label)
 
-            divider2 = make_axes_locatable(ax2)
+            divider2 = axes_grid1.make_axes_locatable(ax2)
             cax2 = divider2.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax2) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4436,7 +7169,7 @@ class fit_SED_across_lightcurve:
             
 
             
-            divider4 = make_axes_locatable(ax4)
+            divider4 = axes_grid1.make_axes_locatable(ax4)
             cax4 = divider4.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax4) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4449,13 +7182,13 @@ class fit_SED_across_lightcurve:
 
             for ax in [ax1, ax2, ax4]:
                 ax.grid(True)
-                ax.xaxis.set_major_locator(MaxNLocator(nbins=5))
+                ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=5))
                 ax.tick_params(axis='both', labelsize= tickfontsize)
                 if self.ant_name == 'ZTF20abodaps':
                     if ax == ax1:
                         continue
                 if ax != ax2:
-                    ax.yaxis.set_major_locator(MaxNLocator(nbins=6))
+                    ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins=6))
                 #ax.legend(fontsize = 8)
                 #ax.set_xlim(MJDs_for_fit[ANT_name])
 
@@ -4556,7 +7289,7 @@ class fit_SED_across_lightcurve:
             ax2.set_ylim(DBB_T1_plot_lims[self.ant_name])
 
 
-            divider2 = make_axes_locatable(ax2)
+            divider2 = axes_grid1.make_axes_locatable(ax2)
             cax2 = divider2.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax2) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4592,7 +7325,7 @@ class fit_SED_across_lightcurve:
 
             ax5.set_ylim(DBB_T2_plot_lims[self.ant_name])
 
-            divider5 = make_axes_locatable(ax5)
+            divider5 = axes_grid1.make_axes_locatable(ax5)
             cax5 = divider5.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax5) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4632,7 +7365,7 @@ class fit_SED_across_lightcurve:
             
             ax3.set_ylim(DBB_R1_plot_lims[self.ant_name])
 
-            divider3 = make_axes_locatable(ax3)
+            divider3 = axes_grid1.make_axes_locatable(ax3)
             cax3 = divider3.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax3) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4669,7 +7402,7 @@ class fit_SED_across_lightcurve:
             
             ax6.set_ylim(DBB_R2_plot_lims[self.ant_name])
 
-            divider6 = make_axes_locatable(ax6)
+            divider6 = axes_grid1.make_axes_locatable(ax6)
             cax6 = divider6.append_axes("right", size="2%", pad=0.15)  # Adjust position with `pad`
             cbar = plt.colorbar(sc, cax = cax6) 
             cbar_label = r'Goodness-of-fit, $\mathbf{D_{\sigma_\chi}}$'
@@ -4687,8 +7420,8 @@ class fit_SED_across_lightcurve:
                 ax.grid(True)
                 ax.yaxis.set_major_formatter(formatter)  
                 ax.get_yaxis().get_offset_text().set_visible(False) # Hide the offset that matplotlib adds 
-                ax.xaxis.set_major_locator(MaxNLocator(nbins=5))
-                ax.yaxis.set_major_locator(MaxNLocator(nbins=5))
+                ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=5))
+                ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins=5))
                 ax.tick_params(axis='both', labelsize= tickfontsize)
                 
                 #ax.set_xlim(MJDs_for_fit[ANT_name])
@@ -4766,6 +7499,8 @@ class fit_SED_across_lightcurve:
         guided: (bool) If True, this means that the SED fitting was done using the method in which we fit the UVOT MJD SEDs first then use these to fuide the nearby non-UVOT SEDs. 
                 If False, this emans each MJD SEd fit was taken independently from the last.
         """
+        self.BB_fit_samples = self.sample_store.to_dataframe() # convert the sampled parameters to a dataframe
+
         if self.save_SED_fit_file:
             if self.SED_type == 'single_BB':
                 note = 'SBB'
@@ -4777,14 +7512,102 @@ class fit_SED_across_lightcurve:
             if guided:
                 note = 'UVOT_guided_'+note
 
-            savepath = self.base_path + f"data/SED_fits/{self.ant_name}/{self.ant_name}_{note}_SED_fit_across_lc_new.csv"
-            self.BB_fit_results.to_csv(savepath, index = False)
+            savepath = self.base_path + f"data/SED_fits/{self.ant_name}/{self.ant_name}_{note}_SED_fit_across_lc_new"
+            save_dataframe(self.BB_fit_results, savepath, file_format = self.SED_fit_file_format)
 
             # ALSO SAVE THE SAMPLED SED PARAMETER DATAFRAME. CONTAINS PARAMETER VALUES SAMPLED FROM THE CHI SQUARED CONTOUR WHERE CHI<= MIN_CHI + 2.3
-            savepath = self.base_path + f"data/SED_fits/{self.ant_name}/{self.ant_name}_{note}_sampled_params.csv"
-            self.BB_fit_samples.to_csv(savepath, index = True)
+            savepath = self.base_path + f"data/SED_fits/{self.ant_name}/{self.ant_name}_{note}_sampled_params"
+            save_dataframe(self.BB_fit_samples, savepath, file_format = self.SED_fit_file_format, index = True)
+
+
 
 
 
 
+##################################################################################################################################################################
+##################################################################################################################################################################
+##################################################################################################################################################################
+##################################################################################################################################################################
+# STREAMING A WHOLE SAMPLE OF ANTS THROUGH THE PIPELINE, ONE ANT AT A TIME
+
+
+
+
+
+def stream_ANT_pipeline(ANT_stream, dict_ANT_z, dict_ANT_D_lum, dict_band_ZP, dict_band_obs_cent_wl, MJD_binsize, polyfit_config, SED_config = None, 
+                        save_interp_df = True, save_folder = None, file_format = None, failed_ANTs = None):
+    """
+    A generator which takes each ANT through the whole pipeline in turn: ANT_data_L_rf() -> bin_lc() -> polyfit_lightcurve -> fit_SED_across_lightcurve -> save, and yields 
+    its results before moving on to the next ANT. Nothing is kept hold of once an ANT has been yielded, so when ANT_stream is iter_ANT_light_curves(), the memory used stays
+    the same however many ANTs are in the sample (unlike load_ANT_data() followed by run_polyfit_sample(), which have every ANT's dataframes in memory at once). E.g.
+
+        for ANT_name, interp_df, SED_fit_results in stream_ANT_pipeline(iter_ANT_light_curves(root = lc_folder), ANT_redshift_dict, ...):
+            ...
+
+    If any stage fails for an ANT, the error is printed, the ANT is skipped and the rest of the sample carries on. The SED fits are done with run_BB_fit() (each MJD fit 
+    independently) and aren't plotted, since thousands of plots are no use when running over a large sample - use fit_SED_across_lightcurve on the saved interpolated light 
+    curves of the ANTs you want to look at.
+
+    INPUTS
+    ---------------
+    ANT_stream: (iterable) yields (ANT_name, ANT_df) for each ANT, where ANT_df has the columns MJD, mag, magerr, band, e.g. iter_ANT_light_curves()
+
+    dict_ANT_z, dict_ANT_D_lum, dict_band_ZP, dict_band_obs_cent_wl: (dict) the inputs to ANT_data_L_rf()
+
+    MJD_binsize: (int or float) the size of the MJD bins, see bin_lc()
+
+    polyfit_config: (dict) the inputs to polyfit_lightcurve (besides ant_name and df), in the same form as run_polyfit_sample()'s config (see polyfit_kwargs_for_ANT())
+
+    SED_config: (dict or None) the inputs to fit_SED_across_lightcurve (besides interp_df and ant_name), e.g. {'running_on_server': True, 'SED_type': 'single_BB', 
+                'brute_gridsize': 2000, ...}. The SED fit results are saved if SED_config has save_SED_fit_file = True. If None, the SED isn't fit and None is yielded 
+                for SED_fit_results
+
+    save_interp_df: (bool) whether to save each ANT's interpolated light curve
+
+    save_folder: (str or None) the folder in which to save the interpolated light curves, as {ANT_name}_interp_lc.feather (or .parquet/.csv). This must be given if 
+                 save_interp_df = True, like in run_polyfit_sample()
+
+    file_format: (str or None) the file format to save the interpolated light curves in. Options: 'feather', 'parquet', 'csv' or None, which uses feather if pyarrow is 
+                 installed and csv otherwise (see save_dataframe())
+
+    failed_ANTs: (dict or None) if given, the names of the ANTs which failed are added to this dictionary as they happen, with their error messages as the values
+
+
+    OUTPUTS
+    ---------------
+    yields (ANT_name, interp_df, SED_fit_results) for each ANT which made it through the pipeline
+    """
+    if save_interp_df and (save_folder is None):
+        raise ValueError("save_folder must be given if save_interp_df = True")
+    file_format = check_file_format(file_format)
+    failed_ANTs = {} if failed_ANTs is None else failed_ANTs
+
+    for ANT_name, ANT_df in ANT_stream:
+        open_figures = set(plt.get_fignums())
+        try:
+            ANT_df = ANT_data_L_rf([ANT_df], [ANT_name], dict_ANT_z, dict_ANT_D_lum, dict_band_ZP, dict_band_obs_cent_wl)[0]
+            binned_df = bin_lc([ANT_df], MJD_binsize)[0]
+
+            polyfit_kwargs = dict(polyfit_kwargs_for_ANT(ANT_name, binned_df, polyfit_config), save_interp_df = False) # saved below instead, so that it goes in save_folder
+            lightcurve = polyfit_lightcurve(ant_name = ANT_name, df = binned_df, **polyfit_kwargs)
+            lightcurve.run_fitting_pipeline()
+            interp_df = lightcurve.interp_df
+            if save_interp_df == True:
+                save_dataframe(interp_df, f"{save_folder}{ANT_name}_interp_lc", file_format = file_format)
+
+            SED_fit_results = None
+            if SED_config is not None:
+                SED_fitter = fit_SED_across_lightcurve(interp_df.copy(), ant_name = ANT_name, **SED_config) # the SED fitting adds columns to the dataframe it's given
+                SED_fit_results = SED_fitter.run_BB_fit()
+                SED_fitter.save_SED_fit_results(guided = False)
+
+        except Exception as e:
+            failed_ANTs[ANT_name] = f'{type(e).__name__}: {e}'
+            print(f'{Fore.RED} WARNING: {ANT_name} failed with {failed_ANTs[ANT_name]} {Style.RESET_ALL}')
+            continue
+
+        finally:
+            for fig_num in set(plt.get_fignums()) - open_figures: # don't let the figures from each ANT's plots pile up, but leave the caller's figures open
+                plt.close(fig_num)
 
+        yield ANT_name, interp_df, SED_fit_results
@@ -0,0 +1,10 @@
+# PHYSICAL CONSTANTS IN CGS UNITS, AS PLAIN FLOATS
+# these are the same values that astropy.constants gives (e.g. const.h.cgs.value == h_cgs), but getting them from astropy means a unit conversion every time they're looked up,
+# and importing astropy takes longer than importing everything else functions.py needs put together. c, h and k_B have had exact values in SI since 2019, so these don't
+# depend on which version of astropy (i.e. which CODATA release) you have installed
+
+
+
+c_cgs = 2.99792458e10 # speed of light in cm/s
+h_cgs = 6.62607015e-27 # planck constant in erg s
+k_cgs = 1.380649e-16 # boltzmann constant in erg/K
@@ -0,0 +1,258 @@
+# THE PLANCK FUNCTION, SHARED BY ALL OF THE BLACKBODY SED MODELS (blackbody(), vectorised_blackbody(), etc. IN functions.py AND THE LSST SIMULATION'S blackbody_F_lam())
+# THE CONSTANTS ARE WORKED OUT ONCE HERE, WHEN THIS FILE IS IMPORTED, RATHER THAN EVERY TIME ONE OF THE MODELS IS CALLED. curve_fit CALLS THE MODEL HUNDREDS OF TIMES FOR EACH
+# EPOCH, AND THE BRUTE FORCE GRIDS CALL IT FOR EVERY EPOCH, SO THIS ADDS UP
+# THE FUSED CHI SQUARED KERNELS AT THE BOTTOM ARE COMPILED WITH NUMBA IF IT'S INSTALLED, BUT NUMBA IS OPTIONAL - WITHOUT IT, THE SAME SUMS ARE DONE WITH NUMPY
+import importlib.util
+import numpy as np
+from physical_constants import c_cgs, h_cgs, k_cgs
+
+
+
+hc_over_k = (h_cgs * c_cgs) / k_cgs # cm K. The exponent in the planck function is x = hc / (wavelength * k * T) = hc_over_k / (wavelength * T)
+L_lam_coeff = 8 * (np.pi**2) * h_cgs * (c_cgs**2) * 1e-8 # the constant coefficient of the blackbody luminosity per unit wavelength (4 pi R^2 * pi B_lam). The 1e-8 converts per cm to per Angstrom
+F_lam_coeff = 2 * np.pi * h_cgs * (c_cgs**2) * 1e-8 # the constant coefficient of the blackbody flux density (pi B_lam * (R/D)^2). The 1e-8 converts per cm to per Angstrom
+max_planck_exponent = float(np.log(np.finfo(float).max)) # ~709.78. For larger exponents e^x overflows, and the planck function (~e^-x) is 0 to double precision anyway
+numba_installed = importlib.util.find_spec('numba') is not None
+
+
+
+
+def planck_exponent(lam_cm, T_K):
+    """
+    The exponent in the planck function, x = hc / (wavelength * k * T)
+
+    INPUTS
+    --------------
+    lam_cm: the wavelength in cm
+
+    T_K: the blackbody temperature in Kelvin
+
+    RETURNS
+    --------------
+    x: the exponent, with the broadcast shape of lam_cm and T_K
+    """
+    return hc_over_k / (lam_cm * T_K)
+
+
+
+
+def overflow_safe_expm1(x):
+    """
+    e^x - 1, but where x > max_planck_exponent (e.g. the cool blackbody at T1 = 1e2 K in the DBB fits), e^x overflows to inf without numpy warning about it every time. 
+    Dividing by it then gives exactly 0, which is the right answer to double precision. This is called on every curve_fit model evaluation (with only a handful of 
+    wavelengths), so it just silences the warning rather than masking out the large exponents, which took ~5x longer for small arrays.
+
+    INPUTS
+    --------------
+    x: (float or array) the exponent
+
+    RETURNS
+    --------------
+    denom: e^x - 1, with the same shape as x
+    """
+    with np.errstate(over = 'ignore'):
+        return np.expm1(x)
+
+
+
+
+def planck_L_lam(lam_cm, T_K):
+    """
+    The part of the blackbody luminosity which doesn't depend on the radius, so the blackbody luminosity per unit wavelength is R_cm**2 * planck_L_lam(lam_cm, T_K).
+    The inputs can be any broadcastable arrays (or floats), so this can be worked out for just the temperatures and then multiplied by a grid of radii.
+
+    INPUTS
+    --------------
+    lam_cm: the wavelength in cm
+
+    T_K: the blackbody temperature in Kelvin
+
+    RETURNS
+    --------------
+    L: blackbody luminosity per unit wavelength per unit radius^2. Units: ergs/s/Angstrom/cm^2
+    """
+    return L_lam_coeff / (lam_cm**5) / overflow_safe_expm1(hc_over_k / (lam_cm * T_K)) # expm1 is more accurate than np.exp() - 1 for small exponents
+
+
+
+
+def planck_F_lam(lam_cm, T_K):
+    """
+    The part of the blackbody flux density which doesn't depend on the radius or distance, so the flux density is (R_cm / D_cm)**2 * planck_F_lam(lam_cm, T_K).
+
+    INPUTS
+    --------------
+    lam_cm: the wavelength in cm
+
+    T_K: the blackbody temperature in Kelvin
+
+    RETURNS
+    --------------
+    F: blackbody flux density for (R/D)^2 = 1. Units: ergs/(s cm^2 Angstrom)
+    """
+    return F_lam_coeff / (lam_cm**5) / overflow_safe_expm1(hc_over_k / (lam_cm * T_K))
+
+
+
+
+
+
+#=================================================================================================================================================================
+#=================================================================================================================================================================
+# FUSED CHI SQUARED KERNELS FOR THE BRUTE FORCE GRIDS
+# the blackbody luminosity is R^2 * planck_L_lam(wavelength, T), so the planck function is only worked out once for each (wavelength, T). Then the chi squared of every grid point 
+# is summed up over the wavelengths in one go, without building the (N_wl, N_r, N_t) array of model luminosities (or its (N_r1, N_t1, N_r2, N_t2) blocks for the DBB)
+
+
+
+jit_kernels = {} # the numba compiled versions of the loops below, which are compiled the first time they're needed (importing numba and compiling takes a few seconds)
+
+
+
+
+def BB_chi_loops(planck, L_rf, L_rf_err_sq, R):
+    """
+    The single blackbody chi squared grid, written as loops for numba to compile (far too slow to run as plain python). See fused_BB_chi()
+    """
+    N_wl, N_t = planck.shape
+    chi = np.empty((len(R), N_t))
+    for r in range(len(R)):
+        R_sq = R[r] * R[r]
+        for t in range(N_t):
+            chi_sum = 0.0
+            for w in range(N_wl):
+                diff = L_rf[w] - R_sq * planck[w, t]
+                chi_sum += diff * diff / L_rf_err_sq[w]
+            chi[r, t] = chi_sum
+
+    return chi
+
+
+
+
+def DBB_chi_loops(planck1, planck2, L_rf, L_rf_err_sq, R1, R2):
+    """
+    The double blackbody chi squared grid, written as loops for numba to compile (far too slow to run as plain python). See fused_DBB_chi()
+    """
+    N_wl, N_t1 = planck1.shape
+    N_t2 = planck2.shape[1]
+    chi = np.empty((len(R1), N_t1, len(R2), N_t2))
+    BB1 = np.empty(N_wl)
+    for i in range(len(R1)):
+        R1_sq = R1[i] * R1[i]
+        for j in range(N_t1):
+            for w in range(N_wl):
+                BB1[w] = R1_sq * planck1[w, j] # the first blackbody is the same for the whole (R2, T2) plane
+            for k in range(len(R2)):
+                R2_sq = R2[k] * R2[k]
+                for l in range(N_t2):
+                    chi_sum = 0.0
+                    for w in range(N_wl):
+                        diff = L_rf[w] - (BB1[w] + R2_sq * planck2[w, l])
+                        chi_sum += diff * diff / L_rf_err_sq[w]
+                    chi[i, j, k, l] = chi_sum
+
+    return chi
+
+
+
+
+def get_jit_kernels():
+    """
+    Compiles BB_chi_loops() and DBB_chi_loops() with numba the first time they're needed (the compiled versions are also cached on disk by numba, so later python processes
+    only have to load them). Only call this if numba_installed == True.
+    """
+    if len(jit_kernels) == 0:
+        import numba
+        jit_kernels['BB'] = numba.njit(cache = True)(BB_chi_loops)
+        jit_kernels['DBB'] = numba.njit(cache = True)(DBB_chi_loops)
+
+    return jit_kernels
+
+
+
+
+def fused_BB_chi(lam_cm, L_rf, L_rf_err, R, T):
+    """
+    The chi squared of a single blackbody for every combination of R and T, i.e. the same as 
+    np.sum((L_rf[:, np.newaxis, np.newaxis] - blackbody(lam_cm[:, np.newaxis, np.newaxis], R[np.newaxis, :, np.newaxis], T[np.newaxis, np.newaxis, :]))**2 / L_rf_err[:, np.newaxis, np.newaxis]**2, axis = 0)
+    but the planck function is only worked out once per (wavelength, T), and the (N_wl, N_r, N_t) array of model luminosities is never built. If numba is installed, the sum is 
+    done by the compiled BB_chi_loops(), otherwise it's done with numpy, one wavelength at a time, in place in a buffer the size of the chi grid.
+
+    INPUTS
+    --------------
+    lam_cm: (N_wl, ) the wavelengths in cm
+
+    L_rf, L_rf_err: (N_wl, ) the (scaled) rest frame luminosities and their errors
+
+    R: (N_r, ) the (scaled) radii to try
+
+    T: (N_t, ) the temperatures to try
+
+    RETURNS
+    --------------
+    chi: (N_r, N_t) the chi squared for each combination of R and T
+    """
+    lam_cm, L_rf, R, T = [np.asarray(array, dtype = float) for array in [lam_cm, L_rf, R, T]]
+    L_rf_err_sq = np.asarray(L_rf_err, dtype = float)**2
+    planck = planck_L_lam(lam_cm[:, np.newaxis], T[np.newaxis, :]) # shape (N_wl, N_t)
+
+    if numba_installed:
+        return get_jit_kernels()['BB'](planck, L_rf, L_rf_err_sq, R)
+
+    R_sq = R**2
+    chi = np.zeros((len(R), len(T)))
+    buffer = np.empty((len(R), len(T)))
+    for w in range(len(lam_cm)):
+        np.multiply(R_sq[:, np.newaxis], planck[w][np.newaxis, :], out = buffer) # the blackbody at this wavelength
+        np.subtract(L_rf[w], buffer, out = buffer)
+        np.square(buffer, out = buffer)
+        np.divide(buffer, L_rf_err_sq[w], out = buffer)
+        np.add(chi, buffer, out = chi)
+
+    return chi
+
+
+
+
+def fused_DBB_chi(lam_cm, L_rf, L_rf_err, R1, T1, R2, T2):
+    """
+    The chi squared of a double blackbody for every combination of R1, T1, R2 and T2, i.e. the same as chunked_double_blackbody_chi() in functions.py, but the two blackbodies'
+    planck functions are only worked out once per (wavelength, T), and no blocks of model luminosities are built. If numba is installed, the sum is done by the compiled 
+    DBB_chi_loops(), otherwise it's done with numpy, one R1 value's (T1, R2, T2) block at a time. 
+
+    INPUTS
+    --------------
+    lam_cm: (N_wl, ) the wavelengths in cm
+
+    L_rf, L_rf_err: (N_wl, ) the (scaled) rest frame luminosities and their errors
+
+    R1, T1: (N_r1, ), (N_t1, ) the radii and temperatures of the first blackbody to try
+
+    R2, T2: (N_r2, ), (N_t2, ) the radii and temperatures of the second blackbody to try
+
+    RETURNS
+    --------------
+    chi: (N_r1, N_t1, N_r2, N_t2) the chi squared for each combination of R1, T1, R2, T2
+    """
+    lam_cm, L_rf, R1, T1, R2, T2 = [np.asarray(array, dtype = float) for array in [lam_cm, L_rf, R1, T1, R2, T2]]
+    L_rf_err_sq = np.asarray(L_rf_err, dtype = float)**2
+    planck1 = planck_L_lam(lam_cm[:, np.newaxis], T1[np.newaxis, :]) # shape (N_wl, N_t1)
+    planck2 = planck_L_lam(lam_cm[:, np.newaxis], T2[np.newaxis, :]) # shape (N_wl, N_t2)
+
+    if numba_installed:
+        return get_jit_kernels()['DBB'](planck1, planck2, L_rf, L_rf_err_sq, R1, R2)
+
+    BB2 = (R2[np.newaxis, :, np.newaxis]**2) * planck2[:, np.newaxis, :] # shape (N_wl, N_r2, N_t2), this is small compared to the chi grid
+    chi = np.zeros((len(R1), len(T1), len(R2), len(T2)))
+    buffer = np.empty((len(T1), len(R2), len(T2)))
+    for i in range(len(R1)):
+        chi_block = chi[i]
+        for w in range(len(lam_cm)):
+            np.add((R1[i]**2 * planck1[w])[:, np.newaxis, np.newaxis], BB2[w][np.newaxis, :, :], out = buffer) # the DBB model at this wavelength
+            np.subtract(L_rf[w], buffer, out = buffer)
+            np.square(buffer, out = buffer)
+            np.divide(buffer, L_rf_err_sq[w], out = buffer)
+            np.add(chi_block, buffer, out = chi_block)
+
+    return chi
@@ -1,5 +1,3 @@
-from astropy.cosmology import FlatLambdaCDM # THIS IS FOR THE LUMINOSITY DISTANCE DICTIONARY
-import astropy.units as u
 import pandas as pd
 import numpy as np
 
@@ -673,22 +671,52 @@ ANT_redshift_dict = {'ZTF18aczpgwm': 0.4279,
 # ASSUMPTIONS FOR LUMINOSITY DISTANCE ARE BELOW ----------------------------------------------
 H0 = 70 #km/s/Mpc
 om_M = 0.3 # non relativistic matter density fraction
-fcdm = FlatLambdaCDM(H0 = H0, Om0 = om_M)
 # ASSUMPTIONS FOR LUMINOSITY DISTANCE ARE ABOVE ----------------------------------------------
 
-ANT_d_cm_list = []
-for i, z in enumerate(list(ANT_redshift_dict.values())):
-    if i <= 15: 
-        d = fcdm.luminosity_distance(z).to(u.cm).value # this gives the luminosity distance in cm
 
-    else: # FOR PS1-10ADI AND PS1-13JW WE ARE GIVEN (VEGA) APPARENT MAG, SO z=~ 0.0 AND d = 10pc
-        d = 3.086e19 # distance in cm,  1pc = 3.086e16 m, so 1pc = 3.086e18cm, so 10pc = 3.086e19 cm
+# THE LUMINOSITY DISTANCES AREN'T CALCULATED UNTIL SOMETHING ASKS FOR THEM (e.g. from plotting_preferences import ANT_luminosity_dist_cm_dict), since importing astropy.cosmology
+# AND INTEGRATING FOR THE DISTANCES TAKES LONGER THAN THE REST OF THIS FILE PUT TOGETHER, AND MOST SCRIPTS WHICH IMPORT THIS FILE ONLY WANT THE BAND DICTIONARIES
+def calc_ANT_luminosity_distances():
+    """
+    calculates the luminosity distance of each ANT in ANT_redshift_dict, assuming a flat LambdaCDM cosmology with H0 and om_M given above
 
-    ANT_d_cm_list.append(d)
+    OUTPUTS
+    ---------------
+    fcdm: (FlatLambdaCDM) the cosmology
 
-ANT_names = list(ANT_redshift_dict.keys())
+    ANT_d_cm_list: (list) the luminosity distances in cm, in the same order as ANT_redshift_dict
 
-ANT_luminosity_dist_cm_dict = dict(zip(ANT_names, ANT_d_cm_list))
+    ANT_luminosity_dist_cm_dict: (dict) the keys are the ANT names, the values are their luminosity distances in cm
+    """
+    from astropy.cosmology import FlatLambdaCDM # THIS IS FOR THE LUMINOSITY DISTANCE DICTIONARY
+    import astropy.units as u
+
+    fcdm = FlatLambdaCDM(H0 = H0, Om0 = om_M)
+
+    ANT_d_cm_list = []
+    for i, z in enumerate(list(ANT_redshift_dict.values())):
+        if i <= 15: 
+            d = fcdm.luminosity_distance(z).to(u.cm).value # this gives the luminosity distance in cm
+
+        else: # FOR PS1-10ADI AND PS1-13JW WE ARE GIVEN (VEGA) APPARENT MAG, SO z=~ 0.0 AND d = 10pc
+            d = 3.086e19 # distance in cm,  1pc = 3.086e16 m, so 1pc = 3.086e18cm, so 10pc = 3.086e19 cm
+
+        ANT_d_cm_list.append(d)
+
+    ANT_names = list(ANT_redshift_dict.keys())
+
+    ANT_luminosity_dist_cm_dict = dict(zip(ANT_names, ANT_d_cm_list))
+
+    return fcdm, ANT_d_cm_list, ANT_luminosity_dist_cm_dict
+
+
+
+def __getattr__(name): # only called when name isn't defined in this file, i.e. for the luminosity distances before they've been calculated
+    if name in ['fcdm', 'ANT_d_cm_list', 'ANT_luminosity_dist_cm_dict']:
+        globals()['fcdm'], globals()['ANT_d_cm_list'], globals()['ANT_luminosity_dist_cm_dict'] = calc_ANT_luminosity_distances()
+        return globals()[name]
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 